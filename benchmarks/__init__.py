@@ -0,0 +1,4 @@
+"""Micro-benchmarks of the shelter hot path.
+
+Run them with `python -m benchmarks`, see `benchmarks.__main__`.
+"""
@@ -0,0 +1,126 @@
+"""Run the micro-benchmarks.
+
+Examples:
+    Run all benchmarks and save the results:
+
+        python -m benchmarks --output results.json
+
+    Run the `Shelter` benchmarks at 10k shelters and compare them with saved
+    results, failing on a slowdown of more than 10%:
+
+        python -m benchmarks --sizes 10000 --filter Shelter \\
+            --compare results.json --threshold 0.1
+
+The benchmarks use the cache of the Django settings, e.g. Redis in
+production settings, except the dummy cache of the development settings,
+which is replaced with a local memory cache.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+
+import django
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks", description="Run the micro-benchmarks."
+    )
+    parser.add_argument(
+        "--sizes",
+        type=lambda value: [int(size) for size in value.split(",")],
+        default=None,
+        help="Comma separated dataset sizes (default: 1000,10000,100000)",
+    )
+    parser.add_argument(
+        "--rounds", type=int, default=5, help="Timed rounds per size (default: 5)"
+    )
+    parser.add_argument(
+        "--filter",
+        action="append",
+        default=[],
+        help="Only run benchmarks whose name contains this, can be repeated",
+    )
+    parser.add_argument("--output", help="Save the results as JSON to this path")
+    parser.add_argument("--compare", help="Compare with results saved at this path")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="Relative slowdown reported as a regression (default: 0.1)",
+    )
+    parser.add_argument(
+        "--list", action="store_true", help="List the benchmarks and exit"
+    )
+    arguments = parser.parse_args()
+
+    os.environ.setdefault(
+        "DJANGO_SETTINGS_MODULE", "supercivilian.config.settings.development"
+    )
+    # No requests are made to the Maps Platform.
+    os.environ.setdefault("MAPS_PLATFORM_API_KEY", "benchmarks")
+    django.setup()
+
+    from django.conf import settings
+    from django.test import override_settings
+
+    from . import runner, shelters  # noqa: F401
+
+    selected = runner.benchmarks(arguments.filter)
+
+    if arguments.list:
+        for benchmark in selected:
+            print(benchmark.name)
+
+        return 0
+
+    baseline = runner.load(arguments.compare) if arguments.compare else None
+    caches = settings.CACHES
+
+    if caches["default"]["BACKEND"].endswith("DummyCache"):
+        caches = {
+            "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+        }
+
+    results = []
+
+    with override_settings(CACHES=caches):
+        for benchmark in selected:
+            for size in arguments.sizes or runner.SIZES:
+                result = runner.run(benchmark, size, rounds=arguments.rounds)
+                results.append(result)
+
+                print(
+                    f"{result.name:<48} {size:>7} {result.median * 1000:>10.3f} ms "
+                    f"{result.median / size * 1e6:>8.3f} µs/item",
+                    flush=True,
+                )
+
+    if arguments.output:
+        runner.save(results, arguments.output)
+
+    if baseline is None:
+        return 0
+
+    regressions = 0
+
+    print()
+
+    for result, change, regression in runner.compare(
+        results, baseline, arguments.threshold
+    ):
+        regressions += regression
+        print(
+            f"{result.name:<48} {result.size:>7} "
+            f"{'new' if change is None else f'{change:+.1%}':>8}"
+            f"{'  REGRESSION' if regression else ''}"
+        )
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
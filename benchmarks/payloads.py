@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import random
+import typing
+
+from supercivilian.arcgis.typing import ArcGISShelter
+
+# The recorded shelters of the example response in `docs/arcgis.md`, which
+# the generated shelters are variations of.
+RECORDED_FEATURES: list[ArcGISShelter] = [
+    {
+        "attributes": {
+            "ObjectID": 215542,
+            "Rodzaj_inw": "[1] - Ropoznanie operacyjne",
+            "Możliwoś": "[1] - droga pożarowa",
+            "Powierzchn": 5000,
+            "Pojemnoś_": 3333,
+            "Subiektywn": 8,
+            "Rodzaj_obi": "[3] - MDS",
+            "Przeznacze": "[1] - M",
+            "Województ": "MAZOWIECKIE",
+            "Powiat": "Warszawa",
+            "Adres": "Marszałkowska - Al. Jerozolimskie, 00-693 Warszawa",
+            "x": 21.0117278584427,
+            "y": 52.2298239083584,
+            "ObjectId2": 95948,
+        },
+        "geometry": {"x": 2339014.845888682, "y": 6841787.716929453},
+    },
+    {
+        "attributes": {
+            "ObjectID": 202001,
+            "Rodzaj_inw": "[1] - Ropoznanie operacyjne",
+            "Możliwoś": "[2] - inna droga utwardzona",
+            "Powierzchn": 3944,
+            "Pojemnoś_": 2629,
+            "Subiektywn": 5,
+            "Rodzaj_obi": "[3] - MDS",
+            "Przeznacze": "[1] - M",
+            "Województ": "MAZOWIECKIE",
+            "Powiat": "Warszawa",
+            "Adres": "Marszałkowska 94/98, 00-510 Warszawa",
+            "x": 21.0130293,
+            "y": 52.2294616,
+            "ObjectId2": 94846,
+        },
+        "geometry": {"x": 2339159.7217001375, "y": 6841721.868599337},
+    },
+]
+
+# The bounds of Poland, `(min longitude, min latitude, max longitude, max
+# latitude)`.
+_BOUNDS = (14.12, 49.0, 24.15, 54.84)
+_VOIVODESHIPS = (
+    "DOLNOŚLĄSKIE",
+    "KUJAWSKO-POMORSKIE",
+    "LUBELSKIE",
+    "LUBUSKIE",
+    "ŁÓDZKIE",
+    "MAŁOPOLSKIE",
+    "MAZOWIECKIE",
+    "OPOLSKIE",
+    "PODKARPACKIE",
+    "PODLASKIE",
+    "POMORSKIE",
+    "ŚLĄSKIE",
+    "ŚWIĘTOKRZYSKIE",
+    "WARMIŃSKO-MAZURSKIE",
+    "WIELKOPOLSKIE",
+    "ZACHODNIOPOMORSKIE",
+)
+_ACCESS_TYPES = ("[1] - droga pożarowa", "[2] - inna droga utwardzona", None)
+_CATEGORIES = ("[1] - Schron", "[2] - Ukrycie", "[3] - MDS")
+
+
+def features(count: int, seed: int = 0) -> list[ArcGISShelter]:
+    """Generate ArcGIS shelters like the recorded ones, spread over Poland.
+
+    Args:
+        count: The number of shelters.
+        seed: The seed of the generator, so runs benchmark the same shelters.
+            Defaults to 0.
+
+    Returns:
+        A list of ArcGIS shelters, as in the `features` of a query response.
+    """
+    generator = random.Random(seed)
+    min_longitude, min_latitude, max_longitude, max_latitude = _BOUNDS
+    generated = []
+
+    for index in range(count):
+        recorded = RECORDED_FEATURES[index % len(RECORDED_FEATURES)]
+        attributes: dict[str, typing.Any] = dict(recorded["attributes"])
+
+        attributes.update(
+            {
+                "ObjectID": 200000 + index,
+                "ObjectId2": index + 1,
+                "x": generator.uniform(min_longitude, max_longitude),
+                "y": generator.uniform(min_latitude, max_latitude),
+                "Powierzchn": generator.randint(10, 5000),
+                "Pojemnoś_": generator.randint(5, 3500),
+                "Subiektywn": generator.randint(1, 10),
+                "Możliwoś": generator.choice(_ACCESS_TYPES),
+                "Rodzaj_obi": generator.choice(_CATEGORIES),
+                "Województ": generator.choice(_VOIVODESHIPS),
+                "Adres": f"{attributes['Adres']} {index}",
+            }
+        )
+        generated.append(
+            {"attributes": attributes, "geometry": dict(recorded["geometry"])}
+        )
+
+    return generated
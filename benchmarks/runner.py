@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+import dataclasses
+import datetime
+import gc
+import json
+import platform
+import statistics
+import subprocess
+import time
+import typing
+
+# The format of the results, bumped on incompatible changes.
+FORMAT = 1
+# The dataset sizes benchmarks are run at by default.
+SIZES = (1000, 10_000, 100_000)
+
+_benchmarks: dict[str, Benchmark] = {}
+
+
+@dataclasses.dataclass(frozen=True)
+class Benchmark:
+    """A benchmark of a function at different dataset sizes.
+
+    Attributes:
+        name: The name of the benchmark.
+        setup: Called with the dataset size to prepare the data, returning the
+            function to time. The function is called without arguments and
+            processes the whole dataset.
+    """
+
+    name: str
+    setup: typing.Callable[[int], typing.Callable[[], typing.Any]]
+
+
+@dataclasses.dataclass(frozen=True)
+class Result:
+    """The timings of a benchmark at a dataset size.
+
+    Attributes:
+        name: The name of the benchmark.
+        size: The dataset size.
+        loops: The number of calls per round.
+        times: The time of a call in every round (in seconds).
+    """
+
+    name: str
+    size: int
+    loops: int
+    times: list[float]
+
+    @property
+    def median(self) -> float:
+        """The median time of a call (in seconds)."""
+        return statistics.median(self.times)
+
+    def dict(self) -> dict[str, typing.Any]:
+        """Convert the `Result` object to a dictionary.
+
+        Returns:
+            A dictionary representation of the `Result` object, with summary
+            statistics of the times.
+        """
+        return {
+            "name": self.name,
+            "size": self.size,
+            "loops": self.loops,
+            "times": self.times,
+            "min": min(self.times),
+            "median": self.median,
+            "mean": statistics.fmean(self.times),
+            "stdev": statistics.stdev(self.times) if len(self.times) > 1 else 0.0,
+            "per_item": self.median / self.size,
+        }
+
+
+def benchmark(
+    name: str,
+) -> typing.Callable[
+    [typing.Callable[[int], typing.Callable[[], typing.Any]]],
+    typing.Callable[[int], typing.Callable[[], typing.Any]],
+]:
+    """Register a benchmark.
+
+    Args:
+        name: The name of the benchmark, usually the benchmarked function.
+
+    Returns:
+        A decorator registering the setup function of the benchmark.
+    """
+
+    def decorator(
+        setup: typing.Callable[[int], typing.Callable[[], typing.Any]],
+    ) -> typing.Callable[[int], typing.Callable[[], typing.Any]]:
+        _benchmarks[name] = Benchmark(name=name, setup=setup)
+
+        return setup
+
+    return decorator
+
+
+def benchmarks(names: typing.Collection[str] | None = None) -> list[Benchmark]:
+    """Get the registered benchmarks.
+
+    Args:
+        names: Substrings of the names of the benchmarks to get. Defaults to
+            `None`, which means all benchmarks.
+
+    Returns:
+        A list of benchmarks, in the order they were registered.
+    """
+    return [
+        benchmark
+        for name, benchmark in _benchmarks.items()
+        if not names or any(part in name for part in names)
+    ]
+
+
+def run(
+    benchmark: Benchmark, size: int, rounds: int = 5, min_time: float = 0.2
+) -> Result:
+    """Time a benchmark at a dataset size.
+
+    Like `timeit`, the function is called in loops long enough to time
+    reliably, and the garbage collector is disabled while timing.
+
+    Args:
+        benchmark: The benchmark.
+        size: The dataset size.
+        rounds: The number of rounds to time. Defaults to 5.
+        min_time: The minimum time of a round (in seconds). Defaults to 0.2.
+
+    Returns:
+        The `Result`.
+    """
+    function = benchmark.setup(size)
+    # The first call warms up caches and is used to pick the number of loops.
+    loops = max(1, int(min_time / max(_time(function, 1), 1e-9)))
+    times = []
+
+    for _ in range(rounds):
+        times.append(_time(function, loops) / loops)
+
+    return Result(name=benchmark.name, size=size, loops=loops, times=times)
+
+
+def _time(function: typing.Callable[[], typing.Any], loops: int) -> float:
+    """Time calls of a function with the garbage collector disabled."""
+    enabled = gc.isenabled()
+    gc.disable()
+
+    try:
+        start = time.perf_counter()
+
+        for _ in range(loops):
+            function()
+
+        return time.perf_counter() - start
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def save(results: typing.Iterable[Result], path: str) -> None:
+    """Save results as JSON, with the environment they were measured in.
+
+    Args:
+        results: The results.
+        path: The path of the file.
+    """
+    document = {
+        "format": FORMAT,
+        "created": datetime.datetime.now(datetime.UTC).isoformat(),
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "results": [result.dict() for result in results],
+    }
+
+    with open(path, "w") as file:
+        json.dump(document, file, indent=2)
+        file.write("\n")
+
+
+def load(path: str) -> dict[tuple[str, int], dict[str, typing.Any]]:
+    """Load saved results.
+
+    Args:
+        path: The path of the file.
+
+    Returns:
+        The results, keyed by their name and size.
+
+    Raises:
+        ValueError: If the file is of another format.
+    """
+    with open(path) as file:
+        document = json.load(file)
+
+    if document.get("format") != FORMAT:
+        raise ValueError(f"{path} isn't of results format {FORMAT}")
+
+    return {(result["name"], result["size"]): result for result in document["results"]}
+
+
+def compare(
+    results: typing.Iterable[Result],
+    baseline: dict[tuple[str, int], dict[str, typing.Any]],
+    threshold: float,
+) -> list[tuple[Result, float | None, bool]]:
+    """Compare results with a baseline by their median times.
+
+    Args:
+        results: The results.
+        baseline: The baseline results, as returned by `load`.
+        threshold: The relative slowdown above which a result is a regression,
+            e.g. `0.1` for 10%.
+
+    Returns:
+        A list of tuples of every result, its relative change, or `None` if it
+        isn't in the baseline, and whether it is a regression.
+    """
+    comparison = []
+
+    for result in results:
+        if (base := baseline.get((result.name, result.size))) is None:
+            comparison.append((result, None, False))
+            continue
+
+        change = result.median / base["median"] - 1
+        comparison.append((result, change, change > threshold))
+
+    return comparison
+
+
+def _commit() -> str | None:
+    """Get the commit of the working tree, if it is a git repository."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import functools
+import random
+import typing
+
+from rest_framework.renderers import JSONRenderer
+
+from supercivilian.arcgis.batching import ShelterBatcher, _Search
+from supercivilian.arcgis.dataclasses import Shelter
+from supercivilian.arcgis.dataset import ShelterDataset
+from supercivilian.arcgis.utilities import (
+    _geodesic_sort,
+    get_shelters_from_cache,
+    set_shelters_in_cache,
+)
+from supercivilian.core.dataclasses import Point
+from supercivilian.core.responses import APISuccessResponse
+
+from .payloads import features
+from .runner import benchmark
+
+# The point distances are measured from, the center of Warsaw.
+POINT = Point(longitude=21.0122287, latitude=52.2296756)
+# Concurrent searches around the center of Warsaw, as batched at peak.
+SEARCHES = [
+    Point(
+        longitude=POINT.longitude + generator.gauss(0, 0.03),
+        latitude=POINT.latitude + generator.gauss(0, 0.015),
+    )
+    for generator in [random.Random(0)]
+    for _ in range(16)
+]
+SEARCH_RANGE = 30 * 1000
+
+
+@functools.lru_cache(maxsize=None)
+def _shelters(size: int) -> tuple[Shelter, ...]:
+    """Get the generated shelters of a dataset size, created once."""
+    return tuple(Shelter.from_api_data(feature) for feature in features(size))
+
+
+@functools.lru_cache(maxsize=None)
+def _dataset(size: int) -> ShelterDataset:
+    """Get the dataset of the generated shelters of a size, built once."""
+    return ShelterDataset.from_shelters(_shelters(size), version="benchmark")
+
+
+@benchmark("Shelter.from_api_data")
+def from_api_data(size: int) -> typing.Callable[[], typing.Any]:
+    payload = features(size)
+
+    return lambda: [Shelter.from_api_data(feature) for feature in payload]
+
+
+@benchmark("Point.distance")
+def distance(size: int) -> typing.Callable[[], typing.Any]:
+    points = [shelter.point for shelter in _shelters(size)]
+
+    return lambda: [POINT.distance(point) for point in points]
+
+
+@benchmark("_geodesic_sort")
+def geodesic_sort(size: int) -> typing.Callable[[], typing.Any]:
+    shelters = _shelters(size)
+
+    return lambda: sorted(shelters, key=_geodesic_sort(POINT))
+
+
+@benchmark("Shelter.dict")
+def shelter_dict(size: int) -> typing.Callable[[], typing.Any]:
+    shelters = _shelters(size)
+
+    return lambda: [shelter.dict() for shelter in shelters]
+
+
+@benchmark("Shelter.dict(point)")
+def shelter_dict_with_distance(size: int) -> typing.Callable[[], typing.Any]:
+    shelters = _shelters(size)
+
+    return lambda: [shelter.dict(POINT) for shelter in shelters]
+
+
+@benchmark("ShelterDataset.nearby x16")
+def nearby(size: int) -> typing.Callable[[], typing.Any]:
+    dataset = _dataset(size)
+
+    return lambda: [dataset.nearby(point, SEARCH_RANGE) for point in SEARCHES]
+
+
+@benchmark("ShelterBatcher x16")
+def batched_nearby(size: int) -> typing.Callable[[], typing.Any]:
+    batcher = ShelterBatcher(_dataset(size))
+
+    def resolve() -> list[list[tuple[float, int]] | None]:
+        batch = [_Search(point, SEARCH_RANGE) for point in SEARCHES]
+        batcher._resolve(batch)
+
+        return [search.result for search in batch]
+
+    return resolve
+
+
+@benchmark("set_shelters_in_cache+get_shelters_from_cache")
+def cache_round_trip(size: int) -> typing.Callable[[], typing.Any]:
+    shelters = list(_shelters(size))
+
+    def round_trip() -> list[Shelter] | None:
+        set_shelters_in_cache(POINT, shelters, sort=False, version="benchmark")
+
+        return get_shelters_from_cache(POINT, version="benchmark")
+
+    return round_trip
+
+
+@benchmark("APIResponse.render")
+def render(size: int) -> typing.Callable[[], typing.Any]:
+    payload = [shelter.dict() for shelter in _shelters(size)]
+
+    def render() -> bytes:
+        response = APISuccessResponse(payload=payload)
+        response.accepted_renderer = JSONRenderer()
+        response.accepted_media_type = "application/json"
+        response.renderer_context = {}
+
+        return response.render().content
+
+    return render
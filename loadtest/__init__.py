@@ -0,0 +1,4 @@
+"""End-to-end load tests against local stand-ins of the upstreams.
+
+See `loadtest.__main__` for how to run them.
+"""
@@ -0,0 +1,137 @@
+"""Run a load test.
+
+Start the stand-in of the upstreams, with the latency and error rate of
+every upstream family:
+
+    python -m loadtest standin --port 8081 \\
+        --latency arcgis=lognormal:120:0.6 --latency places=lognormal:60:0.4 \\
+        --error-rate arcgis=0.01
+
+Start the app against it, e.g. with gunicorn and the production settings:
+
+    ARCGIS_SHELTER_API_URL=http://127.0.0.1:8081/arcgis/rest/services/schrony_csv/FeatureServer/0/query \\
+    MAPS_PLATFORM_API_URL=http://127.0.0.1:8081/maps/api \\
+    gunicorn supercivilian.config.wsgi -w 4 -b 127.0.0.1:8000
+
+Then send it traffic and report the throughput, latencies and upstream calls:
+
+    python -m loadtest run --target http://127.0.0.1:8000 \\
+        --stand-in http://127.0.0.1:8081 --duration 60 --concurrency 32
+
+Note that the Maps Platform quota budgets (`GOOGLE_QUOTA`) apply to the
+stand-in too, raise them to measure the app rather than the budgets.
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import sys
+import typing
+
+
+def _family_values(
+    values: list[str], parse: typing.Callable[[str], typing.Any]
+) -> dict[str, typing.Any]:
+    """Parse repeated `<family>=<value>` arguments."""
+    parsed = {}
+
+    for value in values:
+        family, separator, setting = value.partition("=")
+
+        if not separator:
+            raise argparse.ArgumentTypeError(f"Expected <family>=<value>: {value}")
+
+        parsed[family] = parse(setting)
+
+    return parsed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m loadtest", description="Run a load test."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    standin = commands.add_parser("standin", help="Serve the stand-in upstreams")
+    standin.add_argument("--host", default="127.0.0.1")
+    standin.add_argument("--port", type=int, default=8081)
+    standin.add_argument(
+        "--shelters", type=int, default=100_000, help="Shelters of the layer"
+    )
+    standin.add_argument(
+        "--latency",
+        action="append",
+        default=[],
+        help="<family>=<distribution>, e.g. arcgis=lognormal:120:0.6, with "
+        "fixed:<ms>, uniform:<min ms>:<max ms>, lognormal:<median ms>:<sigma> "
+        "or exponential:<mean ms>; families are arcgis, places, geocoding and "
+        "photos",
+    )
+    standin.add_argument(
+        "--error-rate",
+        action="append",
+        default=[],
+        help="<family>=<rate> of 503 responses, e.g. arcgis=0.01",
+    )
+    standin.add_argument("--seed", type=int, default=0)
+
+    run = commands.add_parser("run", help="Send traffic to the app")
+    run.add_argument("--target", default="http://127.0.0.1:8000")
+    run.add_argument("--stand-in", help="The stand-in, to count upstream calls")
+    run.add_argument("--duration", type=float, default=60, help="Seconds")
+    run.add_argument("--concurrency", type=int, default=16)
+    run.add_argument("--rate", type=float, help="Requests per second in total")
+    run.add_argument(
+        "--shelters", type=int, default=100_000, help="Shelters of the stand-in"
+    )
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--output", help="Save the report as JSON to this path")
+
+    arguments = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    if arguments.command == "standin":
+        from .standin import StandIn, parse_latency, serve
+
+        try:
+            latency = _family_values(arguments.latency, parse_latency)
+            error_rate = _family_values(arguments.error_rate, float)
+        except (argparse.ArgumentTypeError, ValueError) as exception:
+            parser.error(str(exception))
+
+        serve(
+            StandIn(
+                shelters=arguments.shelters,
+                latency=latency,
+                error_rate=error_rate,
+                seed=arguments.seed,
+            ),
+            host=arguments.host,
+            port=arguments.port,
+        )
+
+        return 0
+
+    from . import traffic
+
+    report = traffic.run(
+        arguments.target.rstrip("/"),
+        duration=arguments.duration,
+        concurrency=arguments.concurrency,
+        rate=arguments.rate,
+        shelters=arguments.shelters,
+        stand_in=arguments.stand_in.rstrip("/") if arguments.stand_in else None,
+        seed=arguments.seed,
+    )
+
+    print(traffic.format_report(report))
+
+    if arguments.output:
+        traffic.save(report, arguments.output)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
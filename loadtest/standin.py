@@ -0,0 +1,406 @@
+from __future__ import annotations
+
+import collections
+import http.server
+import json
+import logging
+import math
+import random
+import re
+import struct
+import threading
+import time
+import typing
+import urllib.parse
+import zlib
+
+from benchmarks.payloads import features
+
+logger = logging.getLogger(__name__)
+
+# The upstream families of the stand-in, as named in the `UPSTREAMS` setting.
+FAMILIES = ("arcgis", "places", "geocoding", "photos")
+
+# The path of the shelter layer query, as in `BASE_ARCGIS_SHELTER_API_URL`.
+ARCGIS_PATH = "/arcgis/rest/services/schrony_csv/FeatureServer/0/query"
+# The prefix of the Maps Platform paths, as in `BASE_PLACES_API_URL` and
+# `BASE_GEOCODING_API_URL`.
+MAPS_PLATFORM_PATH = "/maps/api"
+
+_ROUTES = {
+    ARCGIS_PATH: "arcgis",
+    f"{MAPS_PLATFORM_PATH}/place/autocomplete/json": "places",
+    f"{MAPS_PLATFORM_PATH}/place/details/json": "places",
+    f"{MAPS_PLATFORM_PATH}/place/photo": "photos",
+    f"{MAPS_PLATFORM_PATH}/geocode/json": "geocoding",
+}
+# The size of the cells shelters are indexed by for distance queries.
+_CELL_SIZE = 0.1
+_METERS_PER_DEGREE = 111_320
+
+Latency = typing.Callable[[random.Random], float]
+
+
+def parse_latency(spec: str) -> Latency:
+    """Parse a latency distribution.
+
+    Args:
+        spec: The distribution, one of `fixed:<ms>`, `uniform:<min ms>:<max
+            ms>`, `lognormal:<median ms>:<sigma>` and `exponential:<mean ms>`.
+
+    Returns:
+        A function sampling a latency (in seconds) with a random generator.
+
+    Raises:
+        ValueError: If the distribution is invalid.
+    """
+    kind, *parameters = spec.split(":")
+
+    try:
+        values = [float(parameter) / 1000 for parameter in parameters]
+    except ValueError:
+        raise ValueError(f"Invalid latency: {spec}") from None
+
+    if kind == "fixed" and len(values) == 1:
+        return lambda generator: values[0]
+
+    if kind == "uniform" and len(values) == 2:
+        return lambda generator: generator.uniform(*values)
+
+    if kind == "lognormal" and len(values) == 2:
+        # The sigma isn't a duration.
+        median, sigma = values[0], values[1] * 1000
+
+        return lambda generator: generator.lognormvariate(math.log(median), sigma)
+
+    if kind == "exponential" and len(values) == 1:
+        return lambda generator: generator.expovariate(1 / values[0])
+
+    raise ValueError(f"Invalid latency: {spec}")
+
+
+class StandIn:
+    """A local stand-in for the ArcGIS shelter layer and the Maps Platform.
+
+    Shelter queries are answered from shelters generated from the recorded
+    ArcGIS response in `docs/arcgis.md` (see `benchmarks.payloads`) and Maps
+    Platform requests with recorded responses. Every upstream family has its
+    own latency distribution and error rate, and calls are counted per family
+    and status. `GET /__stats` returns the counts and `POST /__reset` resets
+    them.
+    """
+
+    def __init__(
+        self,
+        shelters: int = 100_000,
+        latency: dict[str, Latency] | None = None,
+        error_rate: dict[str, float] | None = None,
+        seed: int = 0,
+    ) -> None:
+        """Initialize the stand-in.
+
+        Args:
+            shelters: The number of shelters of the layer. Defaults to 100k.
+            latency: The latency distribution of every family. Defaults to
+                none, which means no added latency.
+            error_rate: The rate of `503 Service Unavailable` responses of
+                every family. Defaults to none.
+            seed: The seed of the shelters and the random latencies and
+                errors. Defaults to 0.
+        """
+        self.features = features(shelters, seed=seed)
+        self.latency = latency or {}
+        self.error_rate = error_rate or {}
+
+        self._ids = {
+            feature["attributes"]["ObjectId2"]: feature for feature in self.features
+        }
+        self._cells: dict[tuple[int, int], list] = collections.defaultdict(list)
+
+        for feature in self.features:
+            attributes = feature["attributes"]
+            self._cells[_cell(attributes["x"], attributes["y"])].append(feature)
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._calls: collections.Counter[tuple[str, int]] = collections.Counter()
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """Get the call counts.
+
+        Returns:
+            The number of calls of every family, by status and in total.
+        """
+        with self._lock:
+            calls = dict(self._calls)
+
+        stats: dict[str, dict[str, int]] = {family: {"total": 0} for family in FAMILIES}
+
+        for (family, status), count in calls.items():
+            stats[family][str(status)] = count
+            stats[family]["total"] += count
+
+        return stats
+
+    def reset(self) -> None:
+        """Reset the call counts."""
+        with self._lock:
+            self._calls.clear()
+
+    def handle(self, path: str, query: dict[str, str]) -> tuple[int, str, bytes] | None:
+        """Answer a request.
+
+        Args:
+            path: The path of the request.
+            query: The query parameters of the request.
+
+        Returns:
+            A tuple of the status, content type and body of the response, or
+            `None` if the path isn't of an upstream.
+        """
+        if (family := _ROUTES.get(path)) is None:
+            return None
+
+        with self._lock:
+            delay = (
+                latency(self._random)
+                if (latency := self.latency.get(family)) is not None
+                else 0.0
+            )
+            failed = self._random.random() < self.error_rate.get(family, 0.0)
+
+        time.sleep(delay)
+
+        if failed:
+            response = 503, "application/json", b'{"error": "Service Unavailable"}'
+        elif family == "arcgis":
+            response = 200, "application/json", _json(self._query(query))
+        elif family == "photos":
+            response = 200, "image/png", _PHOTO
+        else:
+            response = 200, "application/json", _json(_maps_platform(path, query))
+
+        with self._lock:
+            self._calls[family, response[0]] += 1
+
+        return response
+
+    def _query(self, query: dict[str, str]) -> dict[str, typing.Any]:
+        """Answer a query of the shelter layer.
+
+        Supports the `where` clauses the app sends (`1=1`, `ObjectId2 = <id>`
+        and `ObjectId2 IN (<ids>)`, any other clause matches all shelters), a
+        point `geometry` with a `distance` in meters, `outFields`,
+        `returnCountOnly` and paging with `resultOffset` and
+        `resultRecordCount`.
+        """
+        where = query.get("where", "1=1")
+
+        if match := re.fullmatch(r"\s*ObjectId2\s*=\s*(\d+)\s*", where):
+            matched = [self._ids[id] for id in [int(match[1])] if id in self._ids]
+        elif match := re.fullmatch(r"\s*ObjectId2\s+IN\s*\(([\d,\s]*)\)\s*", where):
+            matched = [
+                self._ids[int(id)]
+                for id in match[1].split(",")
+                if id.strip() and int(id) in self._ids
+            ]
+        else:
+            matched = self.features
+
+        if geometry := query.get("geometry"):
+            longitude, latitude = map(float, geometry.split(","))
+            matched = self._within(
+                longitude, latitude, float(query.get("distance") or 0), matched
+            )
+
+        if query.get("returnCountOnly") == "true":
+            return {"count": len(matched)}
+
+        offset = int(query.get("resultOffset") or 0)
+        count = query.get("resultRecordCount")
+        matched = matched[offset : offset + int(count) if count else None]
+
+        if (out_fields := query.get("outFields", "*")) != "*":
+            fields = out_fields.split(",")
+            matched = [
+                {
+                    "attributes": {
+                        field: feature["attributes"][field] for field in fields
+                    }
+                }
+                for feature in matched
+            ]
+
+        return {"objectIdFieldName": "ObjectId2", "features": matched}
+
+    def _within(
+        self, longitude: float, latitude: float, distance: float, matched: list
+    ) -> list:
+        """Filter shelters within a distance of a point, by ascending id."""
+        scale = math.cos(math.radians(latitude))
+        latitude_range = distance / _METERS_PER_DEGREE
+        longitude_range = latitude_range / max(scale, 1e-6)
+        min_x, min_y = _cell(longitude - longitude_range, latitude - latitude_range)
+        max_x, max_y = _cell(longitude + longitude_range, latitude + latitude_range)
+        candidates = (
+            feature
+            for x in range(min_x, max_x + 1)
+            for y in range(min_y, max_y + 1)
+            for feature in self._cells.get((x, y), ())
+        )
+
+        if matched is not self.features:
+            ids = {id(feature) for feature in matched}
+            candidates = (feature for feature in candidates if id(feature) in ids)
+
+        return sorted(
+            (
+                feature
+                for feature in candidates
+                if math.hypot(
+                    (feature["attributes"]["x"] - longitude) * scale,
+                    feature["attributes"]["y"] - latitude,
+                )
+                * _METERS_PER_DEGREE
+                <= distance
+            ),
+            key=lambda feature: feature["attributes"]["ObjectId2"],
+        )
+
+
+def serve(stand_in: StandIn, host: str = "127.0.0.1", port: int = 8081) -> None:
+    """Serve a stand-in until interrupted.
+
+    Args:
+        stand_in: The stand-in.
+        host: The host to listen on. Defaults to `127.0.0.1`.
+        port: The port to listen on. Defaults to 8081.
+    """
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self) -> None:
+            url = urllib.parse.urlsplit(self.path)
+
+            if url.path == "/__stats":
+                self._respond(200, "application/json", _json(stand_in.stats()))
+                return
+
+            query = dict(urllib.parse.parse_qsl(url.query, keep_blank_values=True))
+
+            if (response := stand_in.handle(url.path, query)) is None:
+                self._respond(404, "application/json", b'{"error": "Not Found"}')
+                return
+
+            self._respond(*response)
+
+        def do_POST(self) -> None:
+            if self.path == "/__reset":
+                stand_in.reset()
+                self._respond(204, "application/json", b"")
+            else:
+                self._respond(404, "application/json", b'{"error": "Not Found"}')
+
+        def _respond(self, status: int, content_type: str, body: bytes) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: typing.Any) -> None:
+            logger.debug(format, *args)
+
+    server = http.server.ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+
+    logger.info("Serving the stand-in at http://%s:%d", host, port)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def _maps_platform(path: str, query: dict[str, str]) -> dict[str, typing.Any]:
+    """Answer a Maps Platform request with a recorded response."""
+    if path.endswith("/autocomplete/json"):
+        text = query.get("input", "")
+
+        return {
+            "status": "OK",
+            "predictions": [
+                {
+                    "place_id": f"standin-{index}-{text}",
+                    "description": f"{text} {index}, Warszawa, Polska",
+                    "types": ["route", "geocode"],
+                }
+                for index in range(5)
+            ],
+        }
+
+    if path.endswith("/details/json"):
+        place_id = query.get("place_id", "")
+
+        return {
+            "status": "OK",
+            "result": {
+                "place_id": place_id,
+                "name": "Marszałkowska",
+                "url": f"https://maps.google.com/?q={urllib.parse.quote(place_id)}",
+                "formatted_address": "Marszałkowska, 00-693 Warszawa, Polska",
+                "website": None,
+                "geometry": {"location": {"lat": 52.2296756, "lng": 21.0122287}},
+                "photos": [
+                    {"photo_reference": "standin", "height": 1000, "width": 1500}
+                ],
+            },
+        }
+
+    latitude, longitude = query.get("latlng", "52.2296756,21.0122287").split(",")
+
+    return {
+        "status": "OK",
+        "results": [
+            {
+                "place_id": f"standin-{latitude}-{longitude}",
+                "formatted_address": "Marszałkowska 94/98, 00-510 Warszawa, Polska",
+                "geometry": {
+                    "location": {"lat": float(latitude), "lng": float(longitude)}
+                },
+            }
+        ],
+    }
+
+
+def _png() -> bytes:
+    """Encode a 1x1 PNG, returned as the photo of every place."""
+
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return (
+            struct.pack(">I", len(data))
+            + kind
+            + data
+            + struct.pack(">I", zlib.crc32(kind + data))
+        )
+
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", 1, 1, 8, 2, 0, 0, 0))
+        + chunk(b"IDAT", zlib.compress(b"\x00\x80\x80\x80"))
+        + chunk(b"IEND", b"")
+    )
+
+
+_PHOTO = _png()
+
+
+def _cell(longitude: float, latitude: float) -> tuple[int, int]:
+    return math.floor(longitude / _CELL_SIZE), math.floor(latitude / _CELL_SIZE)
+
+
+def _json(document: typing.Any) -> bytes:
+    return json.dumps(document, ensure_ascii=False).encode()
@@ -0,0 +1,381 @@
+from __future__ import annotations
+
+import collections
+import dataclasses
+import json
+import math
+import random
+import threading
+import time
+import typing
+import urllib.parse
+
+import requests
+
+from supercivilian.arcgis.constants import HOT_POINTS
+
+# The bounds of Poland, `(min longitude, min latitude, max longitude, max
+# latitude)`.
+_BOUNDS = (14.12, 49.0, 24.15, 54.84)
+# The share of requests from anywhere in Poland rather than around a city.
+_RURAL_SHARE = 0.2
+# How far requests are spread around a city (in degrees, about 5 km).
+_CITY_SPREAD = 0.05
+_QUERIES = (
+    "Marszałkowska",
+    "Dworzec Centralny",
+    "Rynek Główny",
+    "szpital",
+    "ul. Długa",
+)
+# The number of distinct places whose details are requested, the places
+# returned by autocomplete for popular queries.
+_PLACES = 50
+
+
+@dataclasses.dataclass(frozen=True)
+class Endpoint:
+    """An endpoint of the request mix.
+
+    Attributes:
+        name: The name of the endpoint in the report.
+        weight: The relative frequency of requests to the endpoint.
+        path: Called with a random generator, a point and the number of
+            shelters to get the path and query of a request.
+    """
+
+    name: str
+    weight: float
+    path: typing.Callable[[random.Random, tuple[float, float], int], str]
+
+
+def _query(**parameters: typing.Any) -> str:
+    return urllib.parse.urlencode(parameters)
+
+
+def _box(point: tuple[float, float], size: float) -> str:
+    longitude, latitude = point
+
+    return (
+        f"{longitude - size:.6f},{latitude - size / 2:.6f},"
+        f"{longitude + size:.6f},{latitude + size / 2:.6f}"
+    )
+
+
+# The default request mix, roughly that of the mobile app: shelter searches
+# around the user, then details of a few of them, and place searches.
+ENDPOINTS = (
+    Endpoint(
+        "shelters",
+        35,
+        lambda generator, point, shelters: "/arcgis/shelters?"
+        + _query(longitude=point[0], latitude=point[1], limit=10, range=30 * 1000),
+    ),
+    Endpoint(
+        "nearest",
+        15,
+        lambda generator, point, shelters: "/arcgis/shelters/nearest?"
+        + _query(longitude=point[0], latitude=point[1], limit=3),
+    ),
+    Endpoint(
+        "clusters",
+        8,
+        lambda generator, point, shelters: "/arcgis/shelters/clusters?"
+        + _query(bbox=_box(point, 0.2), zoom=generator.randint(10, 14)),
+    ),
+    Endpoint(
+        "details",
+        10,
+        lambda generator, point, shelters: f"/arcgis/shelters/"
+        f"{generator.randint(1, shelters)}",
+    ),
+    Endpoint(
+        "autocomplete",
+        12,
+        lambda generator, point, shelters: "/google/search/autocomplete?"
+        + _query(query=generator.choice(_QUERIES)),
+    ),
+    Endpoint(
+        "place",
+        10,
+        lambda generator, point, shelters: f"/google/places/"
+        f"standin-{generator.randint(1, _PLACES)}",
+    ),
+    Endpoint(
+        "reverse_geocode",
+        8,
+        lambda generator, point, shelters: "/google/geocode/reverse?"
+        + _query(longitude=point[0], latitude=point[1]),
+    ),
+    Endpoint(
+        "photo",
+        2,
+        lambda generator, point, shelters: "/google/photos/standin",
+    ),
+)
+
+
+def random_point(generator: random.Random) -> tuple[float, float]:
+    """Pick the location of a request.
+
+    Most requests come from around the largest cities, more often the larger
+    the city, and the rest from anywhere in Poland. Coordinates have the
+    precision of a phone's location, so nearby users rarely share them.
+
+    Args:
+        generator: The random generator.
+
+    Returns:
+        A `(longitude, latitude)` tuple.
+    """
+    if generator.random() < _RURAL_SHARE:
+        min_longitude, min_latitude, max_longitude, max_latitude = _BOUNDS
+        longitude = generator.uniform(min_longitude, max_longitude)
+        latitude = generator.uniform(min_latitude, max_latitude)
+    else:
+        # `HOT_POINTS` are ordered by population, weighted like Zipf's law.
+        longitude, latitude = generator.choices(
+            HOT_POINTS, weights=[1 / rank for rank in range(1, len(HOT_POINTS) + 1)]
+        )[0]
+        longitude += generator.gauss(0, _CITY_SPREAD)
+        latitude += generator.gauss(0, _CITY_SPREAD / 2)
+
+    return round(longitude, 6), round(latitude, 6)
+
+
+@dataclasses.dataclass
+class _Timings:
+    """The timings of the requests to an endpoint."""
+
+    durations: list[float] = dataclasses.field(default_factory=list)
+    statuses: collections.Counter = dataclasses.field(
+        default_factory=collections.Counter
+    )
+    errors: int = 0
+
+
+def run(
+    target: str,
+    duration: float,
+    concurrency: int = 16,
+    rate: float | None = None,
+    shelters: int = 100_000,
+    endpoints: typing.Sequence[Endpoint] = ENDPOINTS,
+    stand_in: str | None = None,
+    seed: int = 0,
+    timeout: float = 30,
+) -> dict[str, typing.Any]:
+    """Send a request mix to the app and measure it.
+
+    Args:
+        target: The base URL of the app, e.g. `http://127.0.0.1:8000`.
+        duration: How long to send requests for (in seconds).
+        concurrency: The number of concurrent clients. Defaults to 16.
+        rate: The total rate of requests (per second). Defaults to `None`,
+            which means every client sends its next request as soon as it is
+            answered.
+        shelters: The number of shelters of the stand-in, which shelter ids
+            are picked from. Defaults to 100k.
+        endpoints: The request mix. Defaults to `ENDPOINTS`.
+        stand_in: The base URL of the stand-in of the upstreams, to count the
+            upstream calls. Defaults to `None`, which means they aren't
+            counted.
+        seed: The seed of the request mix. Defaults to 0.
+        timeout: The timeout of a request (in seconds). Defaults to 30.
+
+    Returns:
+        The report, see `report`.
+    """
+    if stand_in is not None:
+        requests.post(f"{stand_in}/__reset", timeout=timeout).raise_for_status()
+
+    timings = {endpoint.name: _Timings() for endpoint in endpoints}
+    lock = threading.Lock()
+    start = time.perf_counter()
+    deadline = start + duration
+    schedule = [start]
+
+    def client(index: int) -> None:
+        generator = random.Random(f"{seed}-{index}")
+        session = requests.Session()
+        weights = [endpoint.weight for endpoint in endpoints]
+
+        while True:
+            if rate is not None:
+                with lock:
+                    send_at = schedule[0]
+                    schedule[0] += 1 / rate
+
+                if (delay := send_at - time.perf_counter()) > 0:
+                    time.sleep(delay)
+
+            if time.perf_counter() >= deadline:
+                return
+
+            endpoint = generator.choices(endpoints, weights=weights)[0]
+            path = endpoint.path(generator, random_point(generator), shelters)
+            sent = time.perf_counter()
+
+            try:
+                response = session.get(
+                    f"{target}{path}",
+                    headers={"Accept-Encoding": "br, gzip"},
+                    timeout=timeout,
+                )
+                status = response.status_code
+            except requests.RequestException:
+                status = None
+
+            elapsed = time.perf_counter() - sent
+
+            with lock:
+                endpoint_timings = timings[endpoint.name]
+                endpoint_timings.durations.append(elapsed)
+                endpoint_timings.statuses[status or "failed"] += 1
+                endpoint_timings.errors += status is None or status >= 500
+
+    threads = [
+        threading.Thread(target=client, args=(index,), daemon=True)
+        for index in range(concurrency)
+    ]
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    elapsed = time.perf_counter() - start
+    upstream = (
+        requests.get(f"{stand_in}/__stats", timeout=timeout).json()
+        if stand_in is not None
+        else None
+    )
+
+    return report(timings, elapsed, upstream)
+
+
+def report(
+    timings: dict[str, _Timings],
+    elapsed: float,
+    upstream: dict[str, dict[str, int]] | None,
+) -> dict[str, typing.Any]:
+    """Summarize the timings of a run.
+
+    Args:
+        timings: The timings of every endpoint.
+        elapsed: The duration of the run (in seconds).
+        upstream: The upstream call counts of the stand-in, if any.
+
+    Returns:
+        A dictionary with the `duration` of the run, the `endpoints` and
+        `total` with their number of `requests`, `errors` (5xx statuses and
+        failed requests), `statuses`, `throughput` (per second) and `p50`,
+        `p95` and `p99` latencies (in milliseconds), and the `upstream` call
+        counts per family, with the calls per request.
+    """
+    summaries = {
+        name: _summary(endpoint.durations, endpoint.statuses, endpoint.errors, elapsed)
+        for name, endpoint in timings.items()
+        if endpoint.durations
+    }
+    total = _summary(
+        [duration for endpoint in timings.values() for duration in endpoint.durations],
+        sum(
+            (endpoint.statuses for endpoint in timings.values()), collections.Counter()
+        ),
+        sum(endpoint.errors for endpoint in timings.values()),
+        elapsed,
+    )
+
+    if upstream is not None:
+        for counts in upstream.values():
+            counts["per_request"] = round(
+                counts["total"] / max(total["requests"], 1), 4
+            )
+
+    return {
+        "duration": round(elapsed, 3),
+        "endpoints": summaries,
+        "total": total,
+        "upstream": upstream,
+    }
+
+
+def format_report(report: dict[str, typing.Any]) -> str:
+    """Format a report as a table.
+
+    Args:
+        report: The report, see `report`.
+
+    Returns:
+        The table.
+    """
+    lines = [
+        f"{'endpoint':<16} {'requests':>8} {'errors':>6} {'req/s':>8} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    ]
+
+    for name, summary in [*report["endpoints"].items(), ("total", report["total"])]:
+        lines.append(
+            f"{name:<16} {summary['requests']:>8} {summary['errors']:>6} "
+            f"{summary['throughput']:>8.1f} {summary['p50']:>8.1f} "
+            f"{summary['p95']:>8.1f} {summary['p99']:>8.1f}"
+        )
+
+    if (upstream := report["upstream"]) is not None:
+        lines += ["", f"{'upstream':<16} {'calls':>8} {'per req':>8}  statuses"]
+
+        for family, counts in upstream.items():
+            statuses = ", ".join(
+                f"{status}: {count}"
+                for status, count in counts.items()
+                if status not in ("total", "per_request")
+            )
+            lines.append(
+                f"{family:<16} {counts['total']:>8} {counts['per_request']:>8.3f}  "
+                f"{statuses}"
+            )
+
+    return "\n".join(lines)
+
+
+def _summary(
+    durations: list[float],
+    statuses: collections.Counter,
+    errors: int,
+    elapsed: float,
+) -> dict[str, typing.Any]:
+    """Summarize the timings of an endpoint."""
+    durations = sorted(durations)
+
+    return {
+        "requests": len(durations),
+        "errors": errors,
+        "statuses": {str(status): count for status, count in statuses.items()},
+        "throughput": round(len(durations) / elapsed, 3),
+        **{
+            f"p{percentile}": round(_percentile(durations, percentile) * 1000, 3)
+            for percentile in (50, 95, 99)
+        },
+    }
+
+
+def _percentile(durations: list[float], percentile: float) -> float:
+    """Get a percentile of sorted durations, by the nearest rank."""
+    if not durations:
+        return 0.0
+
+    return durations[max(math.ceil(percentile / 100 * len(durations)) - 1, 0)]
+
+
+def save(report: dict[str, typing.Any], path: str) -> None:
+    """Save a report as JSON.
+
+    Args:
+        report: The report.
+        path: The path of the file.
+    """
+    with open(path, "w") as file:
+        json.dump(report, file, indent=2)
+        file.write("\n")
@@ -0,0 +1,222 @@
+from __future__ import annotations
+
+import dataclasses
+import threading
+import typing
+
+from .dataset import MISSING_INTEGER, ShelterDataset
+
+
+@dataclasses.dataclass(frozen=True)
+class AreaAggregate:
+    """The shelters of an administrative area, rolled up.
+
+    Attributes:
+        voivodeship: The voivodeship, or `None` for the whole country or
+            shelters with an unknown voivodeship.
+        province: The province (powiat) within the voivodeship, or `None` for
+            a whole voivodeship.
+        count: The number of shelters.
+        capacity: The total capacity of the shelters with a known capacity.
+        area: The total area of the shelters with a known area.
+        quality: The number of shelters of every quality, with the shelters of
+            unknown quality under `"unknown"`.
+    """
+
+    voivodeship: str | None
+    province: str | None
+    count: int
+    capacity: int
+    area: int
+    quality: dict[str, int]
+
+    def dict(self) -> dict[str, typing.Any]:
+        """Convert the `AreaAggregate` object to a dictionary.
+
+        Returns:
+            A dictionary representation of the `AreaAggregate` object.
+        """
+        return dataclasses.asdict(self)
+
+
+class ShelterAggregates:
+    """Rollups of the shelters of a dataset per voivodeship and province.
+
+    All rollups are computed in one pass over the dataset, so looking one up
+    afterwards is a dictionary access.
+    """
+
+    def __init__(self, dataset: ShelterDataset) -> None:
+        """Compute the rollups.
+
+        Args:
+            dataset: The dataset.
+        """
+        self.version = dataset.version
+
+        columns = dataset.columns
+        capacities, areas, qualities = (
+            columns["capacity"],
+            columns["area"],
+            columns["quality"],
+        )
+        voivodeships, provinces = columns["voivodeship"], columns["province"]
+
+        # Provinces are keyed by the indices of their names in the string
+        # table, which are decoded once per province rather than per shelter.
+        sums: dict[tuple[int, int], list] = {}
+
+        for row in range(len(dataset)):
+            key = (voivodeships[row], provinces[row])
+
+            if (rollup := sums.get(key)) is None:
+                rollup = sums[key] = [0, 0, 0, {}]
+
+            rollup[0] += 1
+
+            if (capacity := capacities[row]) != MISSING_INTEGER:
+                rollup[1] += capacity
+
+            if (area := areas[row]) != MISSING_INTEGER:
+                rollup[2] += area
+
+            quality = qualities[row]
+            rollup[3][quality] = rollup[3].get(quality, 0) + 1
+
+        total = _Rollup()
+        by_voivodeship: dict[str | None, _Rollup] = {}
+        self._provinces: dict[str | None, list[AreaAggregate]] = {}
+
+        for (voivodeship_index, province_index), rollup in sums.items():
+            voivodeship = dataset.strings[voivodeship_index]
+            province = dataset.strings[province_index]
+
+            total.add(rollup)
+            by_voivodeship.setdefault(voivodeship, _Rollup()).add(rollup)
+            self._provinces.setdefault(voivodeship, []).append(
+                _Rollup().add(rollup).aggregate(voivodeship, province)
+            )
+
+        self.total = total.aggregate(None, None)
+        self._voivodeships = {
+            voivodeship: by_voivodeship[voivodeship].aggregate(voivodeship, None)
+            for voivodeship in sorted(by_voivodeship, key=_name_key)
+        }
+
+        self._provinces = {
+            voivodeship: sorted(
+                self._provinces[voivodeship],
+                key=lambda aggregate: _name_key(aggregate.province),
+            )
+            for voivodeship in self._voivodeships
+        }
+
+    def voivodeships(self) -> list[AreaAggregate]:
+        """Get the rollups of all voivodeships.
+
+        Returns:
+            A list of rollups sorted by voivodeship.
+        """
+        return list(self._voivodeships.values())
+
+    def voivodeship(self, voivodeship: str) -> AreaAggregate | None:
+        """Get the rollup of a voivodeship.
+
+        Args:
+            voivodeship: The voivodeship.
+
+        Returns:
+            The rollup if the voivodeship has shelters, else `None`.
+        """
+        return self._voivodeships.get(voivodeship)
+
+    def provinces(self, voivodeship: str | None = None) -> list[AreaAggregate]:
+        """Get the rollups of the provinces of a voivodeship, or of all.
+
+        Args:
+            voivodeship: The voivodeship. Defaults to `None`, which means all
+                provinces.
+
+        Returns:
+            A list of rollups sorted by voivodeship and province.
+        """
+        if voivodeship is not None:
+            return self._provinces.get(voivodeship, [])
+
+        return [
+            aggregate
+            for aggregates in self._provinces.values()
+            for aggregate in aggregates
+        ]
+
+
+class _Rollup:
+    """Sums of the shelters of an area, while rolling up."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.capacity = 0
+        self.area = 0
+        self.quality: dict[int, int] = {}
+
+    def add(self, rollup: list) -> _Rollup:
+        count, capacity, area, quality = rollup
+
+        self.count += count
+        self.capacity += capacity
+        self.area += area
+
+        for value, count in quality.items():
+            self.quality[value] = self.quality.get(value, 0) + count
+
+        return self
+
+    def aggregate(self, voivodeship: str | None, province: str | None) -> AreaAggregate:
+        return AreaAggregate(
+            voivodeship=voivodeship,
+            province=province,
+            count=self.count,
+            capacity=self.capacity,
+            area=self.area,
+            quality={
+                "unknown" if value == MISSING_INTEGER else str(value): count
+                for value, count in sorted(self.quality.items())
+            },
+        )
+
+
+def _name_key(name: str | None) -> tuple[bool, str]:
+    """Sort names alphabetically, with unknown names last."""
+    return name is None, name or ""
+
+
+_aggregates: ShelterAggregates | None = None
+_aggregates_lock = threading.Lock()
+
+
+def get_shelter_aggregates(dataset: ShelterDataset) -> ShelterAggregates:
+    """Get the rollups of a dataset.
+
+    The rollups are computed on first use for every dataset version, i.e.
+    when the dataset is loaded by `warm_up` or synced, or else by the first
+    request after a new version is swapped in. Only the computation is
+    locked; once computed, the rollups are read without locking.
+
+    Args:
+        dataset: The dataset.
+
+    Returns:
+        The `ShelterAggregates`.
+    """
+    global _aggregates
+
+    if (
+        aggregates := _aggregates
+    ) is not None and aggregates.version == dataset.version:
+        return aggregates
+
+    with _aggregates_lock:
+        if _aggregates is None or _aggregates.version != dataset.version:
+            _aggregates = ShelterAggregates(dataset)
+
+        return _aggregates
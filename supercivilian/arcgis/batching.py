@@ -0,0 +1,291 @@
+from __future__ import annotations
+
+import logging
+import math
+import threading
+
+from django.conf import settings
+
+from supercivilian.core.dataclasses import Point
+from supercivilian.core.metrics import Histogram
+
+from .dataclasses import Shelter
+from .dataset import ShelterDataset, _box_around
+from .geometry import EARTH_RADIUS
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = Histogram(
+    "supercivilian_arcgis_batch_size",
+    "Number of shelter searches resolved together by the micro-batcher",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+
+# Searches are resolved together if the box of the group grows by at most this
+# factor, so a search never scans many more candidates than on its own.
+_MAX_GROWTH = 1.5
+
+
+class _Search:
+    """A shelter search waiting for its batch to be resolved."""
+
+    __slots__ = ("point", "range_", "box", "done", "result", "error")
+
+    def __init__(self, point: Point, range_: float) -> None:
+        self.point = point
+        self.range_ = range_
+        self.box = _box_around(point, range_)
+        self.done = threading.Event()
+        self.result: list[tuple[float, int]] | None = None
+        self.error: BaseException | None = None
+
+
+class ShelterBatcher:
+    """Resolve concurrent shelter searches of a dataset together.
+
+    At peak, a worker handles many searches around nearby points at once,
+    whose candidate shelters largely overlap. A search that arrives while
+    other searches are running waits up to `window` seconds for more searches
+    to join it, then the searches are grouped by proximity and every group is
+    resolved in one pass: the candidates in the box around the whole group
+    are found once, their coordinates converted for the distance formula once
+    and the distances of every search of the group computed from them.
+
+    A search with no other search running is resolved at once, so batching
+    only adds latency under concurrency. The results are those of
+    `ShelterDataset.nearby`.
+    """
+
+    def __init__(
+        self, dataset: ShelterDataset, window: float = 0.002, max_size: int = 32
+    ) -> None:
+        """Initialize the batcher.
+
+        Args:
+            dataset: The dataset to search.
+            window: How long the first search of a batch waits for others to
+                join it, in seconds. Defaults to 2 ms.
+            max_size: The number of searches that resolves a batch without
+                waiting for the end of the window. Defaults to 32.
+        """
+        self.dataset = dataset
+        self.version = dataset.version
+        self.window = window
+        self.max_size = max_size
+
+        self._lock = threading.Lock()
+        self._pending: list[_Search] = []
+        self._full = threading.Event()
+        self._running = 0
+
+    def nearby(self, point: Point, range_: float) -> list[tuple[float, int]]:
+        """Find the rows of the shelters within a given range of a point.
+
+        Args:
+            point: The point to search around.
+            range_: The range in meters.
+
+        Returns:
+            A list of `(distance, row)` tuples sorted by distance, see
+            `ShelterDataset.nearby`.
+        """
+        search = _Search(point, range_)
+
+        with self._lock:
+            self._running += 1
+            alone = self._running == 1
+
+            if not alone:
+                self._pending.append(search)
+                leader = len(self._pending) == 1
+                full = self._full
+
+                if len(self._pending) >= self.max_size:
+                    full.set()
+
+        try:
+            if alone:
+                BATCH_SIZE.observe(1)
+
+                return self.dataset.nearby(point, range_)
+
+            if leader:
+                full.wait(self.window)
+
+                with self._lock:
+                    batch, self._pending = self._pending, []
+                    self._full = threading.Event()
+
+                self._resolve(batch)
+            else:
+                search.done.wait()
+        finally:
+            with self._lock:
+                self._running -= 1
+
+        if search.error is not None:
+            raise search.error
+
+        return search.result
+
+    def within(self, point: Point, range_: float) -> list[Shelter]:
+        """Get the shelters within a given range of a point.
+
+        Args:
+            point: The point to search around.
+            range_: The range in meters.
+
+        Returns:
+            A list of shelters sorted by distance from the point.
+        """
+        return [self.dataset.shelter(row) for _, row in self.nearby(point, range_)]
+
+    def _resolve(self, batch: list[_Search]) -> None:
+        """Resolve a batch of searches and wake up their threads."""
+        BATCH_SIZE.observe(len(batch))
+
+        try:
+            for group, box in _groups(batch):
+                if len(group) == 1:
+                    group[0].result = self.dataset.nearby(
+                        group[0].point, group[0].range_
+                    )
+                else:
+                    self._resolve_group(group, box)
+        except BaseException as error:
+            logger.exception("Failed to resolve a batch of %d searches", len(batch))
+
+            for search in batch:
+                if search.result is None:
+                    search.error = error
+        finally:
+            for search in batch:
+                search.done.set()
+
+    def _resolve_group(
+        self, group: list[_Search], box: tuple[float, float, float, float]
+    ) -> None:
+        """Resolve nearby searches from the candidates of their shared box.
+
+        The distances are those of `haversine`, with the latitude of every
+        candidate converted once for the group rather than once per search.
+        """
+        longitudes, latitudes = self.dataset.longitudes, self.dataset.latitudes
+        minimum_longitude, minimum_latitude, maximum_longitude, maximum_latitude = box
+        candidates = []
+
+        for row in self.dataset.rows_in_box(*box):
+            longitude, latitude = longitudes[row], latitudes[row]
+
+            if (
+                minimum_longitude <= longitude <= maximum_longitude
+                and minimum_latitude <= latitude <= maximum_latitude
+            ):
+                phi = math.radians(latitude)
+                candidates.append((row, longitude, latitude, phi, math.cos(phi)))
+
+        sin, radians, sqrt, asin = math.sin, math.radians, math.sqrt, math.asin
+        diameter = 2 * EARTH_RADIUS
+
+        for search in group:
+            longitude1, latitude1 = search.point.longitude, search.point.latitude
+            phi1 = radians(latitude1)
+            cos1 = math.cos(phi1)
+            west, south, east, north = search.box
+            range_ = search.range_
+            matches = []
+
+            for row, longitude2, latitude2, phi2, cos2 in candidates:
+                if not (west <= longitude2 <= east and south <= latitude2 <= north):
+                    continue
+
+                a = (
+                    sin((phi2 - phi1) / 2) ** 2
+                    + cos1 * cos2 * sin(radians(longitude2 - longitude1) / 2) ** 2
+                )
+                distance = diameter * asin(min(1.0, sqrt(a)))
+
+                if distance <= range_:
+                    matches.append((distance, row))
+
+            matches.sort()
+            search.result = matches
+
+
+def _area(box: tuple[float, float, float, float]) -> float:
+    return (box[2] - box[0]) * (box[3] - box[1])
+
+
+def _union(
+    first: tuple[float, float, float, float],
+    second: tuple[float, float, float, float],
+) -> tuple[float, float, float, float]:
+    return (
+        min(first[0], second[0]),
+        min(first[1], second[1]),
+        max(first[2], second[2]),
+        max(first[3], second[3]),
+    )
+
+
+def _groups(
+    batch: list[_Search],
+) -> list[tuple[list[_Search], tuple[float, float, float, float]]]:
+    """Group the searches of a batch whose boxes largely overlap.
+
+    Args:
+        batch: The searches.
+
+    Returns:
+        A list of `(searches, box)` tuples, with the box around the searches.
+    """
+    groups: list[tuple[list[_Search], tuple[float, float, float, float]]] = []
+
+    for search in batch:
+        for index, (group, box) in enumerate(groups):
+            union = _union(box, search.box)
+
+            if _area(union) <= _MAX_GROWTH * min(
+                _area(group[0].box), _area(search.box)
+            ):
+                group.append(search)
+                groups[index] = (group, union)
+                break
+        else:
+            groups.append(([search], search.box))
+
+    return groups
+
+
+_batcher: ShelterBatcher | None = None
+_batcher_lock = threading.Lock()
+
+
+def get_batcher(dataset: ShelterDataset) -> ShelterBatcher | None:
+    """Get the batcher of a dataset, if enabled by `ARCGIS_BATCHING`.
+
+    A batcher is created on first use for every dataset version.
+
+    Args:
+        dataset: The dataset.
+
+    Returns:
+        The `ShelterBatcher`, or `None` if batching is disabled.
+    """
+    global _batcher
+
+    if not settings.ARCGIS_BATCHING["enabled"]:
+        return None
+
+    if (batcher := _batcher) is not None and batcher.version == dataset.version:
+        return batcher
+
+    with _batcher_lock:
+        if _batcher is None or _batcher.version != dataset.version:
+            _batcher = ShelterBatcher(
+                dataset,
+                window=settings.ARCGIS_BATCHING["window"],
+                max_size=settings.ARCGIS_BATCHING["max_size"],
+            )
+
+        return _batcher
@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import array
+import bisect
+import dataclasses
+import math
+import threading
+import typing
+
+from .dataset import MISSING_INTEGER, ShelterDataset
+
+# Clusters are built from square cells of this many pixels on 256 pixel web map
+# tiles, so at zoom `z` there are `2 ** (z + _CELL_SHIFT)` cells per axis.
+CELL_PIXELS = 64
+_CELL_SHIFT = 2
+
+# The latitude limit of the web Mercator projection.
+_MAX_LATITUDE = 85.05112878
+
+
+@dataclasses.dataclass(frozen=True)
+class Cluster:
+    """A cluster of shelters.
+
+    Attributes:
+        longitude: The longitude of the centroid of the shelters.
+        latitude: The latitude of the centroid of the shelters.
+        count: The number of shelters.
+        capacity: The total capacity of the shelters with a known capacity.
+        id: The id of the shelter if the cluster has only one, else `None`.
+    """
+
+    longitude: float
+    latitude: float
+    count: int
+    capacity: int
+    id: int | None = None
+
+    def dict(self) -> dict[str, typing.Any]:
+        """Convert the `Cluster` object to a dictionary.
+
+        Returns:
+            A dictionary representation of the `Cluster` object.
+        """
+        return dataclasses.asdict(self)
+
+
+class BoxTooLargeError(ValueError):
+    """Raised when a bounding box covers too many cells at a zoom level."""
+
+
+class ClusterHierarchy:
+    """Clusters of the shelters of a dataset at every zoom level.
+
+    Shelters are clustered by the web Mercator cell they fall in, with
+    `CELL_PIXELS` pixel cells. The cells of a zoom level are the cells of the
+    next level merged in groups of four, so the whole hierarchy is built in
+    one pass over the shelters. Every level stores its non-empty cells in
+    columns sorted by key, with the cells of a row of the grid contiguous.
+    """
+
+    def __init__(self, dataset: ShelterDataset, max_zoom: int = 16) -> None:
+        """Build the hierarchy.
+
+        Args:
+            dataset: The dataset.
+            max_zoom: The highest zoom level with clusters. Defaults to 16.
+        """
+        self.version = dataset.version
+        self.max_zoom = max_zoom
+        self.levels: list[dict[str, array.array]] = [{}] * (max_zoom + 1)
+
+        capacities = dataset.columns["capacity"]
+        cells: dict[tuple[int, int], list] = {}
+
+        for row in range(len(dataset)):
+            longitude, latitude = dataset.longitudes[row], dataset.latitudes[row]
+            capacity = capacities[row]
+            key = _cell(longitude, latitude, max_zoom)
+
+            if (cell := cells.get(key)) is None:
+                cell = cells[key] = [1, 0, longitude, latitude, dataset.ids[row]]
+            else:
+                cell[0] += 1
+                cell[2] += longitude
+                cell[3] += latitude
+
+            if capacity != MISSING_INTEGER:
+                cell[1] += capacity
+
+        for zoom in range(max_zoom, -1, -1):
+            self.levels[zoom] = _level(cells, zoom)
+
+            parents: dict[tuple[int, int], list] = {}
+
+            for (x, y), (count, capacity, longitude, latitude, id) in cells.items():
+                if (parent := parents.get((x >> 1, y >> 1))) is None:
+                    parents[(x >> 1, y >> 1)] = [
+                        count,
+                        capacity,
+                        longitude,
+                        latitude,
+                        id,
+                    ]
+                else:
+                    parent[0] += count
+                    parent[1] += capacity
+                    parent[2] += longitude
+                    parent[3] += latitude
+
+            cells = parents
+
+    def clusters(
+        self,
+        box: tuple[float, float, float, float],
+        zoom: int,
+        max_cells: int = 4096,
+    ) -> list[Cluster]:
+        """Get the clusters in a bounding box.
+
+        Args:
+            box: The `(minimum_longitude, minimum_latitude, maximum_longitude,
+                maximum_latitude)` of the box.
+            zoom: The zoom level, capped at `max_zoom`.
+            max_cells: The maximum number of cells the box may cover, which
+                bounds the number of clusters returned. Defaults to 4096.
+
+        Returns:
+            A list of clusters.
+
+        Raises:
+            BoxTooLargeError: If the box covers more than `max_cells` cells.
+        """
+        zoom = max(0, min(zoom, self.max_zoom))
+        level = self.levels[zoom]
+
+        minimum_x, maximum_y = _cell(box[0], box[1], zoom)
+        maximum_x, minimum_y = _cell(box[2], box[3], zoom)
+
+        if (maximum_x - minimum_x + 1) * (maximum_y - minimum_y + 1) > max_cells:
+            raise BoxTooLargeError(
+                f"The bounding box covers more than {max_cells} cells at zoom {zoom}"
+            )
+
+        keys = level["keys"]
+        size = 1 << (zoom + _CELL_SHIFT)
+        clusters = []
+
+        for y in range(minimum_y, maximum_y + 1):
+            first = bisect.bisect_left(keys, y * size + minimum_x)
+            last = bisect.bisect_right(keys, y * size + maximum_x)
+
+            for index in range(first, last):
+                count = level["counts"][index]
+                clusters.append(
+                    Cluster(
+                        longitude=level["longitudes"][index] / count,
+                        latitude=level["latitudes"][index] / count,
+                        count=count,
+                        capacity=level["capacities"][index],
+                        id=level["ids"][index] if count == 1 else None,
+                    )
+                )
+
+        return clusters
+
+
+def _cell(longitude: float, latitude: float, zoom: int) -> tuple[int, int]:
+    """Get the web Mercator cell of a point at a zoom level."""
+    size = 1 << (zoom + _CELL_SHIFT)
+    latitude = math.radians(max(-_MAX_LATITUDE, min(_MAX_LATITUDE, latitude)))
+
+    x = (longitude + 180) / 360 * size
+    y = (1 - math.asinh(math.tan(latitude)) / math.pi) / 2 * size
+
+    return min(size - 1, max(0, int(x))), min(size - 1, max(0, int(y)))
+
+
+def _level(cells: dict[tuple[int, int], list], zoom: int) -> dict[str, array.array]:
+    """Store the cells of a zoom level in columns sorted by key."""
+    size = 1 << (zoom + _CELL_SHIFT)
+    items = sorted((y * size + x, cell) for (x, y), cell in cells.items())
+
+    return {
+        "keys": array.array("q", (key for key, _ in items)),
+        "counts": array.array("I", (cell[0] for _, cell in items)),
+        "capacities": array.array("q", (cell[1] for _, cell in items)),
+        "longitudes": array.array("d", (cell[2] for _, cell in items)),
+        "latitudes": array.array("d", (cell[3] for _, cell in items)),
+        "ids": array.array("q", (cell[4] for _, cell in items)),
+    }
+
+
+_hierarchy: ClusterHierarchy | None = None
+_hierarchy_lock = threading.Lock()
+
+
+def get_cluster_hierarchy(dataset: ShelterDataset) -> ClusterHierarchy:
+    """Get the cluster hierarchy of a dataset.
+
+    The hierarchy is built on first use for every dataset version. Only the
+    build is locked; once built, the hierarchy is read without locking.
+
+    Args:
+        dataset: The dataset.
+
+    Returns:
+        The `ClusterHierarchy`.
+    """
+    global _hierarchy
+
+    if (hierarchy := _hierarchy) is not None and hierarchy.version == dataset.version:
+        return hierarchy
+
+    with _hierarchy_lock:
+        if _hierarchy is None or _hierarchy.version != dataset.version:
+            _hierarchy = ClusterHierarchy(dataset)
+
+        return _hierarchy
@@ -1 +1,45 @@
 BASE_ARCGIS_SHELTER_API_URL = "https://services-eu1.arcgis.com/HE4WRthd9CIPj0R8/ArcGIS/rest/services/schrony_csv/FeatureServer/0/query"
+
+# Points to warm the shelter caches for: the largest Polish cities, at the
+# coordinates the Google Places API returns for them, as the clients search
+# for shelters around the place details they got from `/google/places/<id>`.
+HOT_POINTS = [
+    (21.0122287, 52.2296756),  # Warszawa
+    (19.9449799, 50.0646501),  # Kraków
+    (17.0385376, 51.1078852),  # Wrocław
+    (19.4559833, 51.7592485),  # Łódź
+    (16.9251681, 52.406374),  # Poznań
+    (18.6466384, 54.3520252),  # Gdańsk
+    (14.5528116, 53.4285438),  # Szczecin
+    (18.0084378, 53.1234804),  # Bydgoszcz
+    (22.5684463, 51.2464536),  # Lublin
+    (23.1688403, 53.1324886),  # Białystok
+    (19.0237815, 50.2648919),  # Katowice
+    (18.5305409, 54.5188898),  # Gdynia
+    (19.1203094, 50.811823),  # Częstochowa
+    (21.1471333, 51.4027236),  # Radom
+    (21.9991196, 50.0411867),  # Rzeszów
+    (18.5984437, 53.0137902),  # Toruń
+    (19.1040791, 50.2862638),  # Sosnowiec
+    (20.6285677, 50.8660773),  # Kielce
+    (18.6713802, 50.2944923),  # Gliwice
+    (20.4801093, 53.778422),  # Olsztyn
+]
+
+# The `Shelter` field of every attribute of the ArcGIS shelter layer, see
+# `supercivilian.arcgis.typing.ArcGISShelterAttributes`.
+SHELTER_FIELDS = {
+    "ObjectId2": "id",
+    "x": "longitude",
+    "y": "latitude",
+    "Rodzaj_inw": "inventory_type",
+    "Możliwoś": "access_type",
+    "Powierzchn": "area",
+    "Pojemnoś_": "capacity",
+    "Subiektywn": "quality",
+    "Rodzaj_obi": "category",
+    "Przeznacze": "purpose",
+    "Województ": "voivodeship",
+    "Powiat": "province",
+    "Adres": "address",
+}
@@ -76,9 +76,12 @@ class Shelter:
         Returns:
             A dictionary representation of the `Shelter` object.
         """
-        _dict = dataclasses.asdict(self)
+        _dict = {field: getattr(self, field) for field in _FIELDS}
 
         if point is not None:
             _dict["distance"] = point.distance(self.point)
 
         return _dict
+
+
+_FIELDS = tuple(field.name for field in dataclasses.fields(Shelter))
@@ -0,0 +1,827 @@
+from __future__ import annotations
+
+import array
+import bisect
+import datetime
+import heapq
+import logging
+import math
+import os
+import sys
+import threading
+import time
+import typing
+
+from django.conf import settings
+
+from supercivilian.core.dataclasses import Point
+
+from .dataclasses import Shelter
+from .geometry import degrees_around, haversine
+from .nearest import SECTION_TYPES as NEAREST_SECTION_TYPES
+from .nearest import NearestGrid
+from .snapshot import SnapshotError, open_snapshot, write_snapshot
+
+logger = logging.getLogger(__name__)
+
+INTEGER_FIELDS = ("area", "capacity", "quality")
+STRING_FIELDS = (
+    "inventory_type",
+    "access_type",
+    "category",
+    "purpose",
+    "voivodeship",
+    "province",
+    "address",
+)
+
+# The `array` typecodes of the columns of a dataset.
+COLUMN_TYPES = {
+    "id": "q",
+    "longitude": "d",
+    "latitude": "d",
+    **{field: "q" for field in INTEGER_FIELDS},
+    **{field: "I" for field in STRING_FIELDS},
+    "string_offsets": "Q",
+    "cell_keys": "q",
+    "cell_starts": "I",
+    "cell_rows": "I",
+}
+
+# Values standing for `None` in the integer and string columns.
+MISSING_INTEGER = -(2**63)
+MISSING_STRING = 2**32 - 1
+
+# Cell coordinates are offset to be positive and packed into one integer key,
+# so the cells of one row of the grid have consecutive keys.
+_CELL_OFFSET = 2**20
+_CELL_STRIDE = 2**21
+
+# The nearest shelters are searched for at most this far without a grid.
+_MAX_NEAREST_RANGE = 4000 * 1000
+
+# Strings with an index below this are decoded once and kept, which covers
+# the categorical values as the most frequent strings come first.
+_DECODED_STRINGS = 1024
+
+
+class StringTable:
+    """The strings of a dataset, stored as UTF-8 in one buffer.
+
+    Strings are decoded from the buffer on access.
+    """
+
+    def __init__(self, offsets: typing.Sequence[int], data: bytes | memoryview):
+        """Initialize the string table.
+
+        Args:
+            offsets: The start offset of every string in `data`, followed by
+                the length of `data`.
+            data: The UTF-8 encoded strings.
+        """
+        self.offsets = offsets
+        self.data = data
+
+        self._decoded: dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> str | None:
+        if index == MISSING_STRING:
+            return None
+
+        if (string := self._decoded.get(index)) is not None:
+            return string
+
+        string = str(self.data[self.offsets[index] : self.offsets[index + 1]], "utf-8")
+
+        if index < _DECODED_STRINGS:
+            self._decoded[index] = string
+
+        return string
+
+    @staticmethod
+    def build(strings: typing.Iterable[str]) -> tuple[array.array, bytes]:
+        """Build the buffers of a string table.
+
+        Args:
+            strings: The strings, in index order.
+
+        Returns:
+            An `(offsets, data)` tuple.
+        """
+        offsets = array.array(COLUMN_TYPES["string_offsets"], [0])
+        data = bytearray()
+
+        for string in strings:
+            data += string.encode()
+            offsets.append(len(data))
+
+        return offsets, bytes(data)
+
+
+class ShelterDataset:
+    """A local copy of the ArcGIS shelter layer.
+
+    Shelters are stored in columns sorted by id, with strings in a shared
+    `StringTable`, and are only turned into `Shelter` objects when accessed.
+    The columns are either arrays built in memory or zero-copy views of a
+    snapshot file (see `supercivilian.arcgis.snapshot`), so workers opening
+    the same snapshot share one copy of it.
+
+    Shelters are indexed by a grid of `cell_size` degree cells, stored as the
+    sorted keys of the non-empty cells, the start of every cell in
+    `cell_rows` and the rows of the shelters grouped by cell.
+    """
+
+    def __init__(
+        self,
+        version: str,
+        columns: dict[str, typing.Any],
+        cell_size: float,
+        synced_at: str | None = None,
+        nearest_grid: NearestGrid | None = None,
+    ) -> None:
+        """Initialize the dataset.
+
+        Use `from_shelters` or `open` rather than calling this directly.
+
+        Args:
+            version: The version of the dataset.
+            columns: The columns of the dataset, see `COLUMN_TYPES`, and the
+                `string_data` buffer.
+            cell_size: The size of the index cells in degrees.
+            synced_at: When the shelters were last fetched from their source,
+                as an ISO 8601 UTC timestamp, if known.
+            nearest_grid: The precomputed `NearestGrid` of the dataset, if
+                any.
+        """
+        self.version = version
+        self.cell_size = cell_size
+        self.synced_at = synced_at
+        self.nearest_grid = nearest_grid
+        self.columns = columns
+        self.strings = StringTable(columns["string_offsets"], columns["string_data"])
+
+        self.ids = columns["id"]
+        self.longitudes = columns["longitude"]
+        self.latitudes = columns["latitude"]
+
+    @classmethod
+    def from_shelters(
+        cls,
+        shelters: typing.Iterable[Shelter],
+        version: str | None = None,
+        cell_size: float = 0.1,
+        synced_at: str | None = None,
+    ) -> ShelterDataset:
+        """Build a dataset in memory.
+
+        Args:
+            shelters: The shelters.
+            version: The version of the dataset. Defaults to the current time.
+            cell_size: The size of the index cells in degrees. Defaults to 0.1.
+            synced_at: When the shelters were fetched from their source.
+
+        Returns:
+            The `ShelterDataset`.
+        """
+        builder = DatasetBuilder()
+
+        for shelter in shelters:
+            builder.add(shelter)
+
+        return builder.build(version=version, cell_size=cell_size, synced_at=synced_at)
+
+    @classmethod
+    def open(cls, path: str | os.PathLike) -> ShelterDataset:
+        """Open a dataset from a snapshot file.
+
+        Args:
+            path: The path of the snapshot.
+
+        Returns:
+            The `ShelterDataset`.
+
+        Raises:
+            OSError: If the file can't be opened.
+            SnapshotError: If the file is not a valid dataset snapshot.
+        """
+        snapshot = open_snapshot(path)
+        metadata = snapshot.metadata
+
+        if metadata.get("byteorder") != sys.byteorder:
+            raise SnapshotError(f"{path} was written on a different architecture")
+
+        try:
+            columns = {
+                name: snapshot.sections[name].cast(typecode)
+                for name, typecode in COLUMN_TYPES.items()
+            }
+            columns["string_data"] = snapshot.sections["string_data"]
+
+            nearest_grid = None
+
+            if metadata.get("nearest") is not None:
+                nearest_grid = NearestGrid(
+                    metadata["nearest"],
+                    {
+                        name: snapshot.sections[name].cast(typecode)
+                        for name, typecode in NEAREST_SECTION_TYPES.items()
+                    },
+                )
+        except KeyError as exception:
+            raise SnapshotError(f"{path} is missing the {exception} section")
+
+        return cls(
+            version=metadata["version"],
+            columns=columns,
+            cell_size=metadata["cell_size"],
+            synced_at=metadata.get("synced_at"),
+            nearest_grid=nearest_grid,
+        )
+
+    def save(self, path: str | os.PathLike) -> None:
+        """Write the dataset to a snapshot file.
+
+        Snapshots are built offline, so unless the `ARCGIS_NEAREST_GRID`
+        setting is `None`, the `NearestGrid` of the dataset is built first if
+        it has none and stored with it.
+
+        Args:
+            path: The path of the snapshot.
+        """
+        if self.nearest_grid is None and settings.ARCGIS_NEAREST_GRID is not None:
+            self.nearest_grid = NearestGrid.build(self, **settings.ARCGIS_NEAREST_GRID)
+
+        sections = dict(self.columns)
+
+        if self.nearest_grid is not None:
+            sections.update(self.nearest_grid.sections)
+
+        write_snapshot(
+            path,
+            metadata={
+                "version": self.version,
+                "cell_size": self.cell_size,
+                "count": len(self),
+                "byteorder": sys.byteorder,
+                "synced_at": self.synced_at,
+                "nearest": (
+                    self.nearest_grid.metadata
+                    if self.nearest_grid is not None
+                    else None
+                ),
+            },
+            sections=sections,
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __iter__(self) -> typing.Iterator[Shelter]:
+        return (self.shelter(row) for row in range(len(self)))
+
+    def shelter(self, row: int) -> Shelter:
+        """Decode the shelter in a row.
+
+        Args:
+            row: The row.
+
+        Returns:
+            The `Shelter` object.
+        """
+        columns = self.columns
+
+        return Shelter(
+            id=self.ids[row],
+            longitude=self.longitudes[row],
+            latitude=self.latitudes[row],
+            **{field: _integer(columns[field][row]) for field in INTEGER_FIELDS},
+            **{field: self.strings[columns[field][row]] for field in STRING_FIELDS},
+        )
+
+    def row(self, id: int) -> int | None:
+        """Find the row of a shelter.
+
+        Args:
+            id: The `ObjectId2` of the shelter.
+
+        Returns:
+            The row if the shelter exists, else `None`.
+        """
+        row = bisect.bisect_left(self.ids, id)
+
+        if row < len(self.ids) and self.ids[row] == id:
+            return row
+
+        return None
+
+    def get(self, id: int) -> Shelter | None:
+        """Get a shelter by id.
+
+        Args:
+            id: The `ObjectId2` of the shelter.
+
+        Returns:
+            The `Shelter` object if it exists, else `None`.
+        """
+        if (row := self.row(id)) is None:
+            return None
+
+        return self.shelter(row)
+
+    def nearby(self, point: Point, range_: float) -> list[tuple[float, int]]:
+        """Find the rows of the shelters within a given range of a point.
+
+        Args:
+            point: The point to search around.
+            range_: The range in meters.
+
+        Returns:
+            A list of `(distance, row)` tuples sorted by distance.
+        """
+        longitude, latitude = point.longitude, point.latitude
+        longitudes, latitudes = self.longitudes, self.latitudes
+
+        matches = []
+
+        for row in self.rows_in_box(*_box_around(point, range_)):
+            distance = haversine(longitude, latitude, longitudes[row], latitudes[row])
+
+            if distance <= range_:
+                matches.append((distance, row))
+
+        matches.sort()
+
+        return matches
+
+    def within(self, point: Point, range_: float) -> list[Shelter]:
+        """Get the shelters within a given range of a point.
+
+        Args:
+            point: The point to search around.
+            range_: The range in meters.
+
+        Returns:
+            A list of shelters sorted by distance from the point.
+        """
+        return [self.shelter(row) for _, row in self.nearby(point, range_)]
+
+    def nearest(self, point: Point, k: int = 1) -> list[tuple[float, int]]:
+        """Find the rows of the shelters nearest to a point.
+
+        Uses the `NearestGrid` if the dataset has one that covers the point,
+        else searches increasing ranges around the point.
+
+        Args:
+            point: The point.
+            k: The number of shelters to find. Defaults to 1.
+
+        Returns:
+            A list of up to `k` `(distance, row)` tuples sorted by distance.
+        """
+        longitude, latitude = point.longitude, point.latitude
+
+        if (
+            self.nearest_grid is not None
+            and k <= self.nearest_grid.k
+            and (rows := self.nearest_grid.candidates(longitude, latitude)) is not None
+        ):
+            longitudes, latitudes = self.longitudes, self.latitudes
+
+            return heapq.nsmallest(
+                k,
+                (
+                    (
+                        haversine(longitude, latitude, longitudes[row], latitudes[row]),
+                        row,
+                    )
+                    for row in rows
+                ),
+            )
+
+        range_ = 1000
+
+        while True:
+            matches = self.nearby(point, range_)
+
+            if len(matches) >= k or range_ >= _MAX_NEAREST_RANGE:
+                return matches[:k]
+
+            range_ *= 4
+
+    def by_distance(
+        self, point: Point, max_range: float = _MAX_NEAREST_RANGE
+    ) -> typing.Iterator[tuple[float, int]]:
+        """Find the rows of the shelters around a point, nearest first.
+
+        The rows are found lazily, in rings of doubling range around the
+        point, so a caller that stops early only pays for the rings it used.
+
+        Args:
+            point: The point.
+            max_range: The range in meters to stop at. Defaults to 4000 km.
+
+        Yields:
+            `(distance, row)` tuples sorted by distance.
+        """
+        inner, range_ = -1.0, min(1000, max_range)
+
+        while True:
+            for distance, row in self.nearby(point, range_):
+                if distance > inner:
+                    yield distance, row
+
+            if range_ >= max_range:
+                return
+
+            inner, range_ = range_, min(range_ * 2, max_range)
+
+    def in_box(
+        self,
+        minimum_longitude: float,
+        minimum_latitude: float,
+        maximum_longitude: float,
+        maximum_latitude: float,
+    ) -> list[int]:
+        """Find the rows of the shelters in a box.
+
+        Args:
+            minimum_longitude: The western edge of the box.
+            minimum_latitude: The southern edge of the box.
+            maximum_longitude: The eastern edge of the box.
+            maximum_latitude: The northern edge of the box.
+
+        Returns:
+            A list of rows, in no particular order.
+        """
+        longitudes, latitudes = self.longitudes, self.latitudes
+
+        return [
+            row
+            for row in self.rows_in_box(
+                minimum_longitude, minimum_latitude, maximum_longitude, maximum_latitude
+            )
+            if minimum_longitude <= longitudes[row] <= maximum_longitude
+            and minimum_latitude <= latitudes[row] <= maximum_latitude
+        ]
+
+    def rows_in_box(
+        self,
+        minimum_longitude: float,
+        minimum_latitude: float,
+        maximum_longitude: float,
+        maximum_latitude: float,
+    ) -> typing.Iterator[int]:
+        """Find the rows of the shelters in the index cells overlapping a box.
+
+        The shelters are only pruned by cell, so some may lie outside the box.
+
+        Args:
+            minimum_longitude: The western edge of the box.
+            minimum_latitude: The southern edge of the box.
+            maximum_longitude: The eastern edge of the box.
+            maximum_latitude: The northern edge of the box.
+
+        Yields:
+            The rows.
+        """
+        cell_keys = self.columns["cell_keys"]
+        cell_starts = self.columns["cell_starts"]
+        cell_rows = self.columns["cell_rows"]
+
+        minimum_x = math.floor(minimum_longitude / self.cell_size)
+        maximum_x = math.floor(maximum_longitude / self.cell_size)
+
+        for y in range(
+            math.floor(minimum_latitude / self.cell_size),
+            math.floor(maximum_latitude / self.cell_size) + 1,
+        ):
+            first = bisect.bisect_left(cell_keys, _cell_key(minimum_x, y))
+            last = bisect.bisect_right(cell_keys, _cell_key(maximum_x, y))
+
+            yield from cell_rows[cell_starts[first] : cell_starts[last]]
+
+
+class DatasetBuilder:
+    """Builds a `ShelterDataset` from shelters added one by one.
+
+    Shelters are appended to the columns as they are added, so a dataset can
+    be built from a stream without holding `Shelter` objects for all of them.
+    If a shelter id is added more than once, the last one wins.
+    """
+
+    def __init__(self) -> None:
+        self._columns: dict[str, array.array] = {
+            field: array.array(COLUMN_TYPES[field])
+            for field in ("id", "longitude", "latitude", *INTEGER_FIELDS)
+        }
+        self._string_columns: dict[str, array.array] = {
+            field: array.array("L") for field in STRING_FIELDS
+        }
+        self._string_indices: dict[str, int] = {}
+        self._string_frequencies: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self._columns["id"])
+
+    def add(self, shelter: Shelter) -> None:
+        """Add a shelter.
+
+        Args:
+            shelter: The shelter.
+        """
+        columns = self._columns
+
+        columns["id"].append(int(shelter.id))
+        columns["longitude"].append(shelter.longitude)
+        columns["latitude"].append(shelter.latitude)
+
+        for field in INTEGER_FIELDS:
+            value = getattr(shelter, field)
+            columns[field].append(MISSING_INTEGER if value is None else value)
+
+        for field in STRING_FIELDS:
+            self._string_columns[field].append(self._intern(getattr(shelter, field)))
+
+    def build(
+        self,
+        version: str | None = None,
+        cell_size: float = 0.1,
+        synced_at: str | None = None,
+    ) -> ShelterDataset:
+        """Build the dataset.
+
+        Args:
+            version: The version of the dataset. Defaults to the current time.
+            cell_size: The size of the index cells in degrees. Defaults to 0.1.
+            synced_at: When the shelters were fetched from their source.
+
+        Returns:
+            The `ShelterDataset`.
+        """
+        ids = self._columns["id"]
+        rows = sorted(range(len(ids)), key=ids.__getitem__)
+        rows = [
+            row
+            for position, row in enumerate(rows)
+            if position + 1 == len(rows) or ids[rows[position + 1]] != ids[row]
+        ]
+
+        # Renumber the strings so the most frequent ones come first.
+        strings = sorted(
+            self._string_indices,
+            key=lambda string: (
+                -self._string_frequencies[self._string_indices[string]],
+                string,
+            ),
+        )
+        renumbered = [0] * len(strings)
+
+        for index, string in enumerate(strings):
+            renumbered[self._string_indices[string]] = index
+
+        columns: dict[str, typing.Any] = {
+            field: array.array(COLUMN_TYPES[field], (column[row] for row in rows))
+            for field, column in self._columns.items()
+        }
+
+        for field, column in self._string_columns.items():
+            columns[field] = array.array(
+                COLUMN_TYPES[field],
+                (
+                    (
+                        MISSING_STRING
+                        if column[row] == MISSING_STRING
+                        else renumbered[column[row]]
+                    )
+                    for row in rows
+                ),
+            )
+
+        columns["string_offsets"], columns["string_data"] = StringTable.build(strings)
+        columns.update(
+            _build_index(columns["longitude"], columns["latitude"], cell_size)
+        )
+
+        return ShelterDataset(
+            version=version or _new_version(),
+            columns=columns,
+            cell_size=cell_size,
+            synced_at=synced_at,
+        )
+
+    def _intern(self, string: str | None) -> int:
+        """Get the index of a string, adding it if it's new."""
+        if string is None:
+            return MISSING_STRING
+
+        if (index := self._string_indices.get(string)) is None:
+            index = self._string_indices[string] = len(self._string_frequencies)
+            self._string_frequencies.append(0)
+
+        self._string_frequencies[index] += 1
+
+        return index
+
+
+def _integer(value: int) -> int | None:
+    """Decode a value of an integer column."""
+    return None if value == MISSING_INTEGER else value
+
+
+def _box_around(point: Point, range_: float) -> tuple[float, float, float, float]:
+    """Get the box around a point that contains every point within a range."""
+    longitude_span, latitude_span = degrees_around(point.latitude, range_)
+
+    return (
+        point.longitude - longitude_span,
+        point.latitude - latitude_span,
+        point.longitude + longitude_span,
+        point.latitude + latitude_span,
+    )
+
+
+def _cell_key(x: int, y: int) -> int:
+    """Pack the coordinates of an index cell into its key."""
+    return (y + _CELL_OFFSET) * _CELL_STRIDE + x + _CELL_OFFSET
+
+
+def _build_index(
+    longitudes: typing.Sequence[float],
+    latitudes: typing.Sequence[float],
+    cell_size: float,
+) -> dict[str, array.array]:
+    """Build the grid index columns of a dataset.
+
+    Args:
+        longitudes: The longitude column.
+        latitudes: The latitude column.
+        cell_size: The size of the cells in degrees.
+
+    Returns:
+        The `cell_keys`, `cell_starts` and `cell_rows` columns.
+    """
+    keys = [
+        _cell_key(math.floor(longitude / cell_size), math.floor(latitude / cell_size))
+        for longitude, latitude in zip(longitudes, latitudes)
+    ]
+    rows = sorted(range(len(keys)), key=keys.__getitem__)
+
+    cell_keys = array.array(COLUMN_TYPES["cell_keys"])
+    cell_starts = array.array(COLUMN_TYPES["cell_starts"])
+
+    for position, row in enumerate(rows):
+        if not cell_keys or cell_keys[-1] != keys[row]:
+            cell_keys.append(keys[row])
+            cell_starts.append(position)
+
+    cell_starts.append(len(rows))
+
+    return {
+        "cell_keys": cell_keys,
+        "cell_starts": cell_starts,
+        "cell_rows": array.array(COLUMN_TYPES["cell_rows"], rows),
+    }
+
+
+def _new_version() -> str:
+    """Generate a version for a new dataset from the current time."""
+    return datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+
+
+_dataset: ShelterDataset | None = None
+_opened = False
+# Held while the dataset is loaded or the snapshot checked, so concurrent
+# requests never load it more than once.
+_load_lock = threading.Lock()
+# The identity of the snapshot file the dataset was opened from, and when to
+# check it for a new version next.
+_snapshot_stat: tuple[int, int] | None = None
+_next_reload_check = 0.0
+
+
+def get_dataset() -> ShelterDataset | None:
+    """Get the shelter dataset of this process.
+
+    The dataset should be loaded at startup, see `ARCGIS_WARMUP_ON_STARTUP`.
+    If it isn't, it is opened from the snapshot at `ARCGIS_DATASET_PATH` on
+    first use, or the dump at `ARCGIS_DATASET_SOURCE` is read in the
+    background, as reading it takes far longer than a request. Until then,
+    `None` is returned.
+
+    The snapshot is checked for a new version every
+    `ARCGIS_DATASET_RELOAD_INTERVAL` seconds, e.g. after `sync_shelters`
+    replaced it, and swapped in if it changed. Only one request checks it,
+    the others keep using the current dataset. Callers should get the dataset
+    once per request: a swap never changes a dataset already handed out.
+
+    Returns:
+        The `ShelterDataset` if one is loaded, else `None`.
+    """
+    if _dataset is None and not _opened:
+        _open_dataset()
+    elif settings.ARCGIS_DATASET_PATH and time.monotonic() >= _next_reload_check:
+        if _load_lock.acquire(blocking=False):
+            try:
+                if time.monotonic() >= _next_reload_check:
+                    _reload_snapshot(settings.ARCGIS_DATASET_PATH)
+            finally:
+                _load_lock.release()
+
+    return _dataset
+
+
+def set_dataset(dataset: ShelterDataset | None) -> None:
+    """Set the shelter dataset of this process.
+
+    Replacing the dataset is a single reference assignment, so readers never
+    need a lock: they keep using the dataset they got until they are done.
+
+    Args:
+        dataset: The dataset, or `None` to unload it.
+    """
+    global _dataset
+
+    _dataset = dataset
+
+
+def _open_dataset() -> None:
+    """Open the dataset on first use, unless another request already did."""
+    global _opened
+
+    with _load_lock:
+        if _dataset is not None or _opened:
+            return
+
+        if settings.ARCGIS_DATASET_PATH:
+            _open_snapshot(settings.ARCGIS_DATASET_PATH)
+        elif settings.ARCGIS_DATASET_SOURCE:
+            logger.warning(
+                "The shelter dataset wasn't loaded at startup, reading the dump "
+                "in the background"
+            )
+            threading.Thread(
+                target=_read_dump,
+                args=(settings.ARCGIS_DATASET_SOURCE,),
+                name="shelter-dataset",
+                daemon=True,
+            ).start()
+
+        # Only set once the snapshot is opened, so concurrent requests wait for
+        # it rather than get no dataset.
+        _opened = True
+
+
+def _read_dump(source: str) -> None:
+    """Read the dataset from a dump, unless it was loaded in the meantime."""
+    from .ingest import IngestError, ShelterReader
+
+    with _load_lock:
+        if _dataset is not None:
+            return
+
+        try:
+            set_dataset(ShelterDataset.from_shelters(ShelterReader(source)))
+        except (OSError, IngestError):
+            logger.exception("Couldn't read the shelter dataset dump")
+
+
+def _open_snapshot(path: str) -> None:
+    """Open the dataset from a snapshot and remember which file it was."""
+    global _snapshot_stat, _next_reload_check
+
+    _next_reload_check = time.monotonic() + settings.ARCGIS_DATASET_RELOAD_INTERVAL
+
+    try:
+        stat = os.stat(path)
+        dataset = ShelterDataset.open(path)
+    except (OSError, SnapshotError):
+        logger.exception("Couldn't open the shelter dataset snapshot")
+        return
+
+    _snapshot_stat = (stat.st_ino, stat.st_mtime_ns)
+    set_dataset(dataset)
+
+
+def _reload_snapshot(path: str) -> None:
+    """Swap in the snapshot if it was replaced since it was opened."""
+    global _next_reload_check
+
+    _next_reload_check = time.monotonic() + settings.ARCGIS_DATASET_RELOAD_INTERVAL
+
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return
+
+    if (stat.st_ino, stat.st_mtime_ns) == _snapshot_stat:
+        return
+
+    previous = _dataset
+    _open_snapshot(path)
+
+    if _dataset is not previous:
+        logger.info("Swapped in shelter dataset version %s", _dataset.version)
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import json
+import typing
+
+from .dataclasses import Shelter
+
+# Encoded shelters are sent in chunks of about this many bytes, so the
+# response starts right away without a write per shelter.
+_CHUNK_SIZE = 64 * 1024
+
+
+def ndjson_chunks(shelters: typing.Iterable[Shelter]) -> typing.Iterator[bytes]:
+    """Encode shelters as newline delimited JSON, one shelter per line.
+
+    Args:
+        shelters: The shelters.
+
+    Returns:
+        An iterator over the chunks of the document.
+    """
+    return _chunks(
+        json.dumps(shelter.dict(), ensure_ascii=False, separators=(",", ":")) + "\n"
+        for shelter in shelters
+    )
+
+
+def geojson_chunks(shelters: typing.Iterable[Shelter]) -> typing.Iterator[bytes]:
+    """Encode shelters as a GeoJSON `FeatureCollection` of points.
+
+    Args:
+        shelters: The shelters.
+
+    Returns:
+        An iterator over the chunks of the document.
+    """
+
+    def parts() -> typing.Iterator[str]:
+        yield '{"type":"FeatureCollection","features":['
+
+        separator = ""
+
+        for shelter in shelters:
+            properties = shelter.dict()
+            feature = {
+                "type": "Feature",
+                "id": shelter.id,
+                "geometry": {
+                    "type": "Point",
+                    "coordinates": [
+                        properties.pop("longitude"),
+                        properties.pop("latitude"),
+                    ],
+                },
+                "properties": properties,
+            }
+
+            yield separator + json.dumps(
+                feature, ensure_ascii=False, separators=(",", ":")
+            )
+            separator = ","
+
+        yield "]}\n"
+
+    return _chunks(parts())
+
+
+# The export formats, with their content type, file extension and encoder.
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson", ndjson_chunks),
+    "geojson": ("application/geo+json", "geojson", geojson_chunks),
+}
+
+
+def _chunks(parts: typing.Iterable[str]) -> typing.Iterator[bytes]:
+    """Join encoded parts into chunks of about `_CHUNK_SIZE` bytes."""
+    chunk: list[str] = []
+    size = 0
+
+    for part in parts:
+        chunk.append(part)
+        size += len(part)
+
+        if size >= _CHUNK_SIZE:
+            yield "".join(chunk).encode()
+            chunk, size = [], 0
+
+    if chunk:
+        yield "".join(chunk).encode()
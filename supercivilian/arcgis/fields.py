@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import dataclasses
+import threading
+import typing
+
+from supercivilian.core.dataclasses import Point
+from supercivilian.core.params import ParameterError, SearchParameters
+
+from .dataclasses import Shelter
+from .dataset import MISSING_STRING, ShelterDataset
+
+# The fields of a shelter, in the order they are serialized.
+FIELDS = tuple(field.name for field in dataclasses.fields(Shelter))
+# The fields with few distinct values, which can be serialized as codes.
+CATEGORICAL_FIELDS = (
+    "inventory_type",
+    "access_type",
+    "category",
+    "purpose",
+    "voivodeship",
+    "province",
+)
+# The maximum number of decimals of the coordinates.
+MAX_PRECISION = 8
+
+
+class ShelterCodes:
+    """The codes of the values of the categorical fields of a dataset.
+
+    The code of a value is its index in the sorted values of its field, so
+    the codes only change when the dataset version does.
+    """
+
+    def __init__(self, dataset: ShelterDataset) -> None:
+        """Collect the values of the categorical fields.
+
+        Args:
+            dataset: The dataset.
+        """
+        self.version = dataset.version
+        self.values: dict[str, list[str]] = {}
+        self.codes: dict[str, dict[str, int]] = {}
+
+        for field in CATEGORICAL_FIELDS:
+            indices = set(dataset.columns[field])
+            indices.discard(MISSING_STRING)
+
+            self.values[field] = sorted(dataset.strings[index] for index in indices)
+            self.codes[field] = {
+                value: code for code, value in enumerate(self.values[field])
+            }
+
+
+class ShelterFields:
+    """How shelters are serialized in responses.
+
+    Only the requested fields are read from the shelters, coordinates can be
+    rounded and the values of the categorical fields can be replaced with
+    their codes (see `ShelterCodes`). Values without a code, e.g. of shelters
+    that aren't in the dataset, are kept as is.
+    """
+
+    def __init__(
+        self,
+        fields: typing.Collection[str] | None = None,
+        precision: int | None = None,
+        codes: ShelterCodes | None = None,
+    ) -> None:
+        """Initialize the serialization.
+
+        Args:
+            fields: The fields to serialize, of `FIELDS` and the extra fields
+                of the endpoint, e.g. `distance`. Defaults to `None`, which
+                means all of them.
+            precision: The number of decimals of the coordinates. Defaults to
+                `None`, which means they aren't rounded.
+            codes: The codes to serialize the categorical fields as. Defaults
+                to `None`, which means the values are serialized.
+        """
+        self.fields = fields
+        self.precision = precision
+        self.codes = codes
+
+        self._fields = tuple(field for field in FIELDS if self.includes(field))
+        # Scaling, rounding to an integer and scaling back is twice as fast as
+        # `round(value, precision)`, and gives the nearest float all the same.
+        self._scale = 10**precision if precision is not None else 1
+        self._rounded = (
+            tuple(field for field in ("longitude", "latitude") if field in self._fields)
+            if precision is not None
+            else ()
+        )
+        self._coded = (
+            tuple(field for field in CATEGORICAL_FIELDS if field in self._fields)
+            if codes is not None
+            else ()
+        )
+
+    @classmethod
+    def from_parameters(
+        cls,
+        parameters: SearchParameters,
+        extra: typing.Collection[str] = (),
+        codes: typing.Callable[[], ShelterCodes] | None = None,
+    ) -> ShelterFields:
+        """Get the serialization from the `fields`, `precision` and `codes`
+        parameters of a request.
+
+        Args:
+            parameters: The parameters of the request.
+            extra: The extra fields of the endpoint. Defaults to none.
+            codes: Called to get the codes if they are requested. Defaults to
+                `None`, which means codes aren't supported.
+
+        Returns:
+            The `ShelterFields`.
+
+        Raises:
+            ParameterError: If a parameter is invalid.
+        """
+        fields = parameters.string("fields")
+        precision = parameters.integer("precision")
+        use_codes = parameters.boolean("codes", default=False)
+
+        if fields is not None:
+            fields = {field.strip() for field in fields.split(",")}
+
+            if unknown := fields - {*FIELDS, *extra}:
+                raise ParameterError(
+                    "fields", f"Unknown fields: {', '.join(sorted(unknown))}"
+                )
+
+        if precision is not None and not 0 <= precision <= MAX_PRECISION:
+            raise ParameterError(
+                "precision", f"Precision must be between 0 and {MAX_PRECISION}"
+            )
+
+        return cls(
+            fields=fields,
+            precision=precision,
+            codes=codes() if use_codes and codes is not None else None,
+        )
+
+    def includes(self, field: str) -> bool:
+        """Check whether a field is serialized.
+
+        Args:
+            field: The field.
+
+        Returns:
+            Whether the field is serialized.
+        """
+        return self.fields is None or field in self.fields
+
+    def dict(
+        self, shelter: Shelter, point: Point | None = None, **extra: typing.Any
+    ) -> dict[str, typing.Any]:
+        """Serialize a shelter.
+
+        Args:
+            shelter: The shelter.
+            point: If provided, the distance to the point is added under the
+                key `distance`, if it is serialized.
+            **extra: Extra fields to add, if they are serialized.
+
+        Returns:
+            A dictionary representation of the shelter.
+        """
+        # Values are replaced in place, which keeps the order of the fields.
+        _dict = {field: getattr(shelter, field) for field in self._fields}
+
+        for field in self._rounded:
+            _dict[field] = round(_dict[field] * self._scale) / self._scale
+
+        for field in self._coded:
+            value = _dict[field]
+            _dict[field] = self.codes.codes[field].get(value, value)
+
+        if point is not None and self.includes("distance"):
+            _dict["distance"] = point.distance(shelter.point)
+
+        for field, value in extra.items():
+            if self.includes(field):
+                _dict[field] = value
+
+        return _dict
+
+
+_codes: ShelterCodes | None = None
+_codes_lock = threading.Lock()
+
+
+def get_shelter_codes(dataset: ShelterDataset) -> ShelterCodes:
+    """Get the codes of the categorical fields of a dataset.
+
+    The codes are collected on first use for every dataset version.
+
+    Args:
+        dataset: The dataset.
+
+    Returns:
+        The `ShelterCodes`.
+    """
+    global _codes
+
+    if (codes := _codes) is not None and codes.version == dataset.version:
+        return codes
+
+    with _codes_lock:
+        if _codes is None or _codes.version != dataset.version:
+            _codes = ShelterCodes(dataset)
+
+        return _codes
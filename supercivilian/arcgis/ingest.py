@@ -0,0 +1,319 @@
+from __future__ import annotations
+
+import csv
+import gzip
+import json
+import logging
+import math
+import os
+import typing
+import unicodedata
+
+from .constants import SHELTER_FIELDS
+from .dataclasses import Shelter
+from .dataset import INTEGER_FIELDS, STRING_FIELDS
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("csv", "json", "ndjson")
+
+# File extensions of the formats, after an optional `.gz`.
+_EXTENSIONS = {
+    ".csv": "csv",
+    ".json": "json",
+    ".pjson": "json",
+    ".geojson": "json",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+    ".geojsonl": "ndjson",
+}
+_CHUNK_SIZE = 64 * 1024
+_FIELDS = {"id", "longitude", "latitude", *INTEGER_FIELDS, *STRING_FIELDS}
+
+
+class IngestError(ValueError):
+    """Raised when a shelter dump or one of its records is invalid."""
+
+
+class ShelterReader:
+    """Reads shelters from a dump of the ArcGIS shelter layer, one at a time.
+
+    Supported formats are:
+
+    - `csv`: The CSV export of the layer, with the ArcGIS attribute names or
+      the `Shelter` field names as columns. The delimiter is detected.
+    - `json`: A FeatureServer query response (`f=json` or `f=pjson`) or a
+      GeoJSON `FeatureCollection`.
+    - `ndjson`: One FeatureServer feature, GeoJSON feature or flat record per
+      line.
+
+    Files ending with `.gz` are decompressed on the fly. Records are validated
+    and normalized (see `normalize`); invalid records are logged, counted in
+    `skipped` and left out.
+    """
+
+    def __init__(self, path: str | os.PathLike, format: str | None = None) -> None:
+        """Initialize the reader.
+
+        Args:
+            path: The path of the dump.
+            format: The format of the dump, one of `FORMATS`. Defaults to
+                detecting it from the file extension.
+
+        Raises:
+            IngestError: If the format is unknown.
+        """
+        self.path = path
+        self.format = format or detect_format(path)
+
+        if self.format not in FORMATS:
+            raise IngestError(f"Unknown shelter dump format: {self.format}")
+
+        self.read = 0
+        self.skipped = 0
+
+    def __iter__(self) -> typing.Iterator[Shelter]:
+        records = {
+            "csv": _read_csv,
+            "json": _read_json,
+            "ndjson": _read_ndjson,
+        }[self.format]
+
+        with _open(self.path) as file:
+            for number, record in enumerate(records(file), 1):
+                self.read += 1
+
+                try:
+                    yield normalize(record)
+                except IngestError as exception:
+                    self.skipped += 1
+                    logger.warning(
+                        "Skipping record %d of %s: %s", number, self.path, exception
+                    )
+
+
+def detect_format(path: str | os.PathLike) -> str:
+    """Detect the format of a shelter dump from its file extension.
+
+    Args:
+        path: The path of the dump.
+
+    Returns:
+        The format, one of `FORMATS`.
+
+    Raises:
+        IngestError: If the extension is unknown.
+    """
+    name = os.fspath(path).lower().removesuffix(".gz")
+
+    for extension, format in _EXTENSIONS.items():
+        if name.endswith(extension):
+            return format
+
+    raise IngestError(f"Can't detect the format of {path}, pass it explicitly")
+
+
+def normalize(record: dict[str, typing.Any]) -> Shelter:
+    """Validate and normalize a record of a shelter dump.
+
+    The record is either a FeatureServer feature (`attributes` and `geometry`
+    with `x` and `y`), a GeoJSON feature (`properties` and a `Point`
+    geometry) or a flat mapping of attributes. Attributes may use the ArcGIS
+    names (see `SHELTER_FIELDS`) or the `Shelter` field names.
+
+    Numbers may be strings, with a decimal comma; empty strings are missing
+    values. The coordinates are taken from the attributes if present, else
+    from the geometry.
+
+    Args:
+        record: The record.
+
+    Returns:
+        The `Shelter` object.
+
+    Raises:
+        IngestError: If the record is invalid.
+    """
+    if not isinstance(record, dict):
+        raise IngestError("Record is not an object")
+
+    attributes = record.get("attributes", record.get("properties", record))
+
+    if not isinstance(attributes, dict):
+        raise IngestError("Attributes are not an object")
+
+    values: dict[str, typing.Any] = {}
+
+    for name, value in attributes.items():
+        if (field := _field(name)) is not None:
+            values[field] = value
+
+    geometry = record.get("geometry")
+
+    if isinstance(geometry, dict):
+        if "coordinates" in geometry:
+            if geometry.get("type") != "Point" or len(geometry["coordinates"]) < 2:
+                raise IngestError("Geometry is not a point")
+
+            longitude, latitude = geometry["coordinates"][:2]
+        else:
+            longitude, latitude = geometry.get("x"), geometry.get("y")
+
+        if _string(values.get("longitude")) is None:
+            values["longitude"] = longitude
+
+        if _string(values.get("latitude")) is None:
+            values["latitude"] = latitude
+
+    id = _integer("id", values.get("id"))
+    longitude = _float("longitude", values.get("longitude"))
+    latitude = _float("latitude", values.get("latitude"))
+
+    if id is None:
+        raise IngestError("Missing ObjectId2")
+
+    if longitude is None or not -180 <= longitude <= 180:
+        raise IngestError(f"Invalid longitude: {values.get('longitude')!r}")
+
+    if latitude is None or not -90 <= latitude <= 90:
+        raise IngestError(f"Invalid latitude: {values.get('latitude')!r}")
+
+    return Shelter(
+        id=id,
+        longitude=longitude,
+        latitude=latitude,
+        **{field: _integer(field, values.get(field)) for field in INTEGER_FIELDS},
+        **{field: _string(values.get(field)) for field in STRING_FIELDS},
+    )
+
+
+def _field(name: str) -> str | None:
+    """Get the `Shelter` field of an attribute name, if any."""
+    if name in _FIELDS:
+        return name
+
+    if (field := SHELTER_FIELDS.get(name)) is not None:
+        return field
+
+    # Exports don't always use the same Unicode normalization for the Polish
+    # characters in the attribute names.
+    return SHELTER_FIELDS.get(unicodedata.normalize("NFC", name))
+
+
+def _string(value: typing.Any) -> str | None:
+    """Normalize a string value."""
+    if value is None:
+        return None
+
+    value = str(value).strip()
+
+    return value or None
+
+
+def _float(field: str, value: typing.Any) -> float | None:
+    """Normalize a float value."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        number = float(value)
+    elif (value := _string(value)) is None:
+        return None
+    else:
+        try:
+            number = float(value.replace(",", "."))
+        except ValueError:
+            raise IngestError(f"Invalid {field}: {value!r}")
+
+    if not math.isfinite(number):
+        raise IngestError(f"Invalid {field}: {value!r}")
+
+    return number
+
+
+def _integer(field: str, value: typing.Any) -> int | None:
+    """Normalize an integer value."""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+
+    if (number := _float(field, value)) is None:
+        return None
+
+    if not number.is_integer():
+        raise IngestError(f"Invalid {field}: {value!r}")
+
+    return int(number)
+
+
+def _open(path: str | os.PathLike) -> typing.TextIO:
+    """Open a dump as text, decompressing it if it ends with `.gz`."""
+    if os.fspath(path).lower().endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8-sig", newline="")
+
+    return open(path, encoding="utf-8-sig", newline="")
+
+
+def _read_csv(file: typing.TextIO) -> typing.Iterator[dict[str, typing.Any]]:
+    """Read the records of a CSV dump."""
+    sample = file.read(_CHUNK_SIZE)
+    file.seek(0)
+
+    try:
+        dialect = csv.Sniffer().sniff(sample.partition("\n")[0], delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+
+    yield from csv.DictReader(file, dialect=dialect)
+
+
+def _read_ndjson(file: typing.TextIO) -> typing.Iterator[dict[str, typing.Any]]:
+    """Read the records of a newline delimited JSON dump."""
+    for line in file:
+        if not (line := line.strip()):
+            continue
+
+        try:
+            yield json.loads(line)
+        except ValueError as exception:
+            raise IngestError(f"Invalid JSON line: {exception}")
+
+
+def _read_json(file: typing.TextIO) -> typing.Iterator[dict[str, typing.Any]]:
+    """Read the features of a FeatureServer or GeoJSON dump.
+
+    Only the `features` array is parsed, one feature at a time, so the whole
+    document is never held in memory.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+
+    # Skip to the start of the features array. Everything before it (the
+    # fields, the spatial reference...) is small.
+    while True:
+        if (start := buffer.find('"features"')) != -1 and (
+            bracket := buffer.find("[", start)
+        ) != -1:
+            buffer = buffer[bracket + 1 :]
+            break
+
+        if not (chunk := file.read(_CHUNK_SIZE)):
+            raise IngestError("No features array in the dump")
+
+        buffer += chunk
+
+    while True:
+        buffer = buffer.lstrip(" \t\r\n,")
+
+        if buffer.startswith("]"):
+            return
+
+        try:
+            feature, end = decoder.raw_decode(buffer)
+        except ValueError:
+            # The feature is cut off at the end of the buffer.
+            if not (chunk := file.read(_CHUNK_SIZE)):
+                raise IngestError("The features array is truncated")
+
+            buffer += chunk
+            continue
+
+        yield feature
+
+        buffer = buffer[end:]
@@ -0,0 +1,49 @@
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+from supercivilian.arcgis.utilities import download_shelter_dataset
+from supercivilian.core.upstream import UpstreamUnavailableError
+
+
+class Command(BaseCommand):
+    help = (
+        "Download the shelter layer from ArcGIS and write it to a snapshot file "
+        "that workers open with `mmap` (see the `ARCGIS_DATASET_PATH` setting)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="The path of the snapshot file.")
+        parser.add_argument(
+            "--page-size",
+            type=int,
+            default=2000,
+            help="The number of shelters per request.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=4,
+            help="The number of pages downloaded in parallel.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            dataset = download_shelter_dataset(
+                page_size=options["page_size"], workers=options["workers"]
+            )
+        except (
+            requests.RequestException,
+            UpstreamUnavailableError,
+            KeyError,
+            ValueError,
+        ) as exception:
+            raise CommandError(f"Couldn't download the shelters: {exception}")
+
+        dataset.save(options["path"])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Wrote {len(dataset)} shelters, version {dataset.version}, "
+                f"to {options['path']}"
+            )
+        )
@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from supercivilian.arcgis.dataset import ShelterDataset
+from supercivilian.arcgis.ingest import FORMATS, IngestError, ShelterReader
+
+
+class Command(BaseCommand):
+    help = (
+        "Read a CSV or JSON dump of the shelter layer and write it to a snapshot "
+        "file (see the `ARCGIS_DATASET_PATH` setting), without calling ArcGIS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("source", help="The path of the dump.")
+        parser.add_argument("path", help="The path of the snapshot file.")
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            help="The format of the dump. Detected from the extension by default.",
+        )
+        parser.add_argument(
+            "--cell-size",
+            type=float,
+            default=0.1,
+            help="The size of the index cells in degrees.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            reader = ShelterReader(options["source"], format=options["format"])
+            dataset = ShelterDataset.from_shelters(
+                reader, cell_size=options["cell_size"]
+            )
+        except (OSError, IngestError) as exception:
+            raise CommandError(f"Couldn't read the shelters: {exception}")
+
+        dataset.save(options["path"])
+
+        if reader.skipped:
+            self.stderr.write(f"Skipped {reader.skipped} invalid records")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Wrote {len(dataset)} of {reader.read} shelters, version "
+                f"{dataset.version}, to {options['path']}"
+            )
+        )
@@ -0,0 +1,54 @@
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from supercivilian.arcgis.ingest import FORMATS
+from supercivilian.arcgis.sync import FileSource, sync_shelter_dataset
+from supercivilian.core.upstream import UpstreamUnavailableError
+
+
+class Command(BaseCommand):
+    help = (
+        "Apply the shelters added, updated and removed since the last sync to "
+        "the snapshot at `ARCGIS_DATASET_PATH`. Workers swap in the new version "
+        "without a restart."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--source",
+            help="Sync from a dump of the shelter layer instead of ArcGIS.",
+        )
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            help="The format of the dump. Detected from the extension by default.",
+        )
+
+    def handle(self, *args, **options):
+        if not settings.ARCGIS_DATASET_PATH:
+            raise CommandError("ARCGIS_DATASET_PATH is not set")
+
+        source = None
+
+        if options["source"]:
+            source = FileSource(options["source"], format=options["format"])
+
+        try:
+            dataset, delta = sync_shelter_dataset(source)
+        except (
+            requests.RequestException,
+            UpstreamUnavailableError,
+            OSError,
+            KeyError,
+            ValueError,
+        ) as exception:
+            raise CommandError(f"Couldn't sync the shelters: {exception}")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Shelter dataset version {dataset.version} has {len(dataset)} "
+                f"shelters, {len(delta.upserted)} upserted, "
+                f"{len(delta.removed)} removed"
+            )
+        )
@@ -0,0 +1,107 @@
+import requests
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+
+from supercivilian.arcgis.constants import HOT_POINTS
+from supercivilian.arcgis.warmup import (
+    hot_points_from_access_log,
+    hot_points_from_file,
+    warm_up,
+)
+from supercivilian.core.dataclasses import Point
+from supercivilian.core.upstream import UpstreamUnavailableError
+
+
+class Command(BaseCommand):
+    help = (
+        "Load the shelter dataset and fill the shelter cache for hot points. "
+        "The cache is only shared with the server if the cache backend is "
+        "shared between processes; for the per-process LocMemCache, enable the "
+        "`ARCGIS_WARMUP` startup hook instead."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--points",
+            help="A CSV file with `longitude` and `latitude` columns to warm up.",
+        )
+        parser.add_argument(
+            "--access-log",
+            help="An access log to replay the most requested points from.",
+        )
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=100,
+            help="The number of points taken from the access log.",
+        )
+        parser.add_argument(
+            "--range",
+            type=int,
+            default=30 * 1000,
+            help="The range in meters to search around the points.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=8,
+            help="The number of points warmed up in parallel.",
+        )
+        parser.add_argument(
+            "--no-dataset",
+            action="store_true",
+            help="Don't load the shelter dataset first.",
+        )
+
+    def handle(self, *args, **options):
+        points = []
+
+        try:
+            if options["points"]:
+                points += hot_points_from_file(options["points"])
+
+            if options["access_log"]:
+                points += hot_points_from_access_log(
+                    options["access_log"], top=options["top"]
+                )
+        except (OSError, KeyError, ValueError) as exception:
+            raise CommandError(f"Couldn't read the points: {exception}")
+
+        if not options["points"] and not options["access_log"]:
+            points = [
+                Point(longitude=longitude, latitude=latitude)
+                for longitude, latitude in HOT_POINTS
+            ]
+
+        def progress(done, total, point, error):
+            if error is not None:
+                self.stderr.write(f"[{done}/{total}] {point}: {error}")
+            elif done == total or done % 10 == 0:
+                self.stdout.write(f"[{done}/{total}] {point}")
+
+        if not options["no_dataset"]:
+            self.stdout.write("Loading the shelter dataset...")
+
+        try:
+            failures = warm_up(
+                points,
+                range_=options["range"],
+                load_dataset=not options["no_dataset"],
+                workers=options["workers"],
+                progress=progress,
+            )
+        except (
+            requests.RequestException,
+            UpstreamUnavailableError,
+            ImproperlyConfigured,
+            OSError,
+            KeyError,
+            ValueError,
+        ) as exception:
+            raise CommandError(f"Couldn't load the shelter dataset: {exception}")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Warmed up {len(points) - failures} of {len(points)} points"
+            )
+        )
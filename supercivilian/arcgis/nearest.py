@@ -0,0 +1,294 @@
+from __future__ import annotations
+
+import array
+import math
+import typing
+
+from .geometry import box_distances, degrees_around
+
+if typing.TYPE_CHECKING:
+    from .dataset import ShelterDataset
+
+# The `array` typecodes of the sections of a grid.
+SECTION_TYPES = {
+    "nearest_nodes": "q",
+    "nearest_starts": "I",
+    "nearest_rows": "I",
+}
+
+# Candidates are kept if they are within this factor of the bound, to make up
+# for the approximations of `box_distances`.
+_TOLERANCE = 1.005
+# The search for the shelters around a cell gives up at this margin in meters.
+_MAX_MARGIN = 2000 * 1000
+
+
+class NearestGrid:
+    """A precomputed grid of the shelters that can be nearest to a point.
+
+    The extent of a dataset is covered by square cells of `cell_size` degrees.
+    For every cell, the grid stores the candidates: the rows of the shelters
+    that can be among the `k` nearest shelters to some point in the cell,
+    i.e. whose Voronoi cells of order `k` overlap the cell. Cells with more
+    than `max_candidates` candidates are split into quadrants, up to
+    `max_depth` times, so dense cities still have few candidates per cell.
+
+    Finding the `k` nearest shelters to a point then takes one lookup and a
+    distance check per candidate.
+
+    The cells are stored as a quadtree in `nearest_nodes`, with one root per
+    cell in row-major order. A node is either a split node, holding the index
+    of the first of its four children (south-west, south-east, north-west,
+    north-east), or a leaf, holding `-(leaf + 1)`. The candidates of a leaf are
+    `nearest_rows[nearest_starts[leaf] : nearest_starts[leaf + 1]]`.
+    """
+
+    def __init__(
+        self, metadata: dict[str, typing.Any], sections: dict[str, typing.Any]
+    ) -> None:
+        """Initialize the grid.
+
+        Use `build` rather than calling this directly.
+
+        Args:
+            metadata: The parameters of the grid, see `build`, and the
+                `longitude`, `latitude`, `width` and `height` of the cells.
+            sections: The sections of the grid, see `SECTION_TYPES`.
+        """
+        self.metadata = metadata
+        self.sections = sections
+
+        self.cell_size = metadata["cell_size"]
+        self.k = metadata["k"]
+        self.longitude = metadata["longitude"]
+        self.latitude = metadata["latitude"]
+        self.width = metadata["width"]
+        self.height = metadata["height"]
+
+        self._nodes = sections["nearest_nodes"]
+        self._starts = sections["nearest_starts"]
+        self._rows = sections["nearest_rows"]
+
+    @classmethod
+    def build(
+        cls,
+        dataset: ShelterDataset,
+        cell_size: float = 0.05,
+        k: int = 5,
+        max_candidates: int = 16,
+        max_depth: int = 6,
+    ) -> NearestGrid:
+        """Build the grid of a dataset.
+
+        Args:
+            dataset: The dataset.
+            cell_size: The size of the cells in degrees. Defaults to 0.05.
+            k: The maximum number of nearest shelters the grid answers for.
+                Defaults to 5.
+            max_candidates: The number of candidates above which a cell is
+                split. Defaults to 16.
+            max_depth: The maximum number of times a cell is split. Defaults
+                to 6.
+
+        Returns:
+            The `NearestGrid`.
+        """
+        if len(dataset):
+            left = math.floor(min(dataset.longitudes) / cell_size)
+            bottom = math.floor(min(dataset.latitudes) / cell_size)
+            width = math.floor(max(dataset.longitudes) / cell_size) - left + 1
+            height = math.floor(max(dataset.latitudes) / cell_size) - bottom + 1
+        else:
+            left = bottom = width = height = 0
+
+        builder = _GridBuilder(dataset, k, max_candidates, max_depth, width * height)
+
+        for y in range(height):
+            for x in range(width):
+                box = (
+                    (left + x) * cell_size,
+                    (bottom + y) * cell_size,
+                    (left + x + 1) * cell_size,
+                    (bottom + y + 1) * cell_size,
+                )
+                builder.fill(y * width + x, box, builder.rows_around(box), 0)
+
+        return cls(
+            metadata={
+                "cell_size": cell_size,
+                "k": k,
+                "max_candidates": max_candidates,
+                "max_depth": max_depth,
+                "longitude": left * cell_size,
+                "latitude": bottom * cell_size,
+                "width": width,
+                "height": height,
+            },
+            sections={
+                "nearest_nodes": builder.nodes,
+                "nearest_starts": builder.starts,
+                "nearest_rows": builder.rows,
+            },
+        )
+
+    def candidates(
+        self, longitude: float, latitude: float
+    ) -> typing.Sequence[int] | None:
+        """Get the candidates for a point.
+
+        Args:
+            longitude: The longitude of the point.
+            latitude: The latitude of the point.
+
+        Returns:
+            The rows of the shelters that can be among the `k` nearest to the
+            point, or `None` if the point is outside the grid.
+        """
+        x = (longitude - self.longitude) / self.cell_size
+        y = (latitude - self.latitude) / self.cell_size
+
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+
+        column, row = int(x), int(y)
+        x, y = x - column, y - row
+        node = self._nodes[row * self.width + column]
+
+        while node >= 0:
+            x, y = x * 2, y * 2
+            quadrant_x, quadrant_y = int(x), int(y)
+            x, y = x - quadrant_x, y - quadrant_y
+            node = self._nodes[node + quadrant_y * 2 + quadrant_x]
+
+        leaf = -node - 1
+
+        return self._rows[self._starts[leaf] : self._starts[leaf + 1]]
+
+
+class _GridBuilder:
+    """Builds the sections of a `NearestGrid`."""
+
+    def __init__(
+        self,
+        dataset: ShelterDataset,
+        k: int,
+        max_candidates: int,
+        max_depth: int,
+        roots: int,
+    ) -> None:
+        self.dataset = dataset
+        self.k = k
+        self.max_candidates = max_candidates
+        self.max_depth = max_depth
+
+        self.nodes = array.array(SECTION_TYPES["nearest_nodes"], bytes(8 * roots))
+        self.starts = array.array(SECTION_TYPES["nearest_starts"], [0])
+        self.rows = array.array(SECTION_TYPES["nearest_rows"])
+
+    def rows_around(self, box: tuple[float, float, float, float]) -> list[int]:
+        """Find the candidates of a box among all shelters."""
+        dataset = self.dataset
+        margin = max(box[2] - box[0], box[3] - box[1]) * 111 * 1000
+
+        while True:
+            longitude_span, latitude_span = degrees_around(
+                max(abs(box[1]), abs(box[3])), margin
+            )
+            rows = list(
+                dataset.rows_in_box(
+                    box[0] - longitude_span,
+                    box[1] - latitude_span,
+                    box[2] + longitude_span,
+                    box[3] + latitude_span,
+                )
+            )
+            candidates, bound = self.candidates(box, rows)
+
+            # Every shelter that can be a candidate is within `bound` of the
+            # box, so if that is within the margin, none was missed.
+            if bound <= margin or margin >= _MAX_MARGIN:
+                return candidates
+
+            margin = min(_MAX_MARGIN, max(margin * 2, bound))
+
+    def candidates(
+        self, box: tuple[float, float, float, float], rows: typing.Sequence[int]
+    ) -> tuple[list[int], float]:
+        """Find the candidates of a box among some shelters.
+
+        A shelter can't be among the `k` nearest to any point in the box if
+        `k` other shelters are closer to every point in the box, i.e. if its
+        distance to the box is more than the `k`-th smallest distance from a
+        shelter to the farthest point of the box.
+
+        Returns:
+            A `(candidates, bound)` tuple of the candidate rows and the bound
+            on their distance to the box in meters.
+        """
+        longitudes, latitudes = self.dataset.longitudes, self.dataset.latitudes
+        distances = [
+            box_distances(longitudes[row], latitudes[row], box) for row in rows
+        ]
+
+        if len(rows) < self.k:
+            return list(rows), math.inf
+
+        bound = sorted(maximum for _, maximum in distances)[self.k - 1] * _TOLERANCE
+
+        return [
+            row for row, (minimum, _) in zip(rows, distances) if minimum <= bound
+        ], bound
+
+    def fill(
+        self,
+        node: int,
+        box: tuple[float, float, float, float],
+        rows: list[int],
+        depth: int,
+    ) -> None:
+        """Store a node, splitting it if it has too many candidates."""
+        if len(rows) <= self.max_candidates or depth >= self.max_depth:
+            self.nodes[node] = -len(self.starts)
+            self.rows.extend(sorted(rows))
+            self.starts.append(len(self.rows))
+            return
+
+        first = len(self.nodes)
+        self.nodes[node] = first
+        self.nodes.extend([0, 0, 0, 0])
+
+        minimum_longitude, minimum_latitude, maximum_longitude, maximum_latitude = box
+        middle_longitude = (minimum_longitude + maximum_longitude) / 2
+        middle_latitude = (minimum_latitude + maximum_latitude) / 2
+
+        for quadrant, quadrant_box in enumerate(
+            [
+                (
+                    minimum_longitude,
+                    minimum_latitude,
+                    middle_longitude,
+                    middle_latitude,
+                ),
+                (
+                    middle_longitude,
+                    minimum_latitude,
+                    maximum_longitude,
+                    middle_latitude,
+                ),
+                (
+                    minimum_longitude,
+                    middle_latitude,
+                    middle_longitude,
+                    maximum_latitude,
+                ),
+                (
+                    middle_longitude,
+                    middle_latitude,
+                    maximum_longitude,
+                    maximum_latitude,
+                ),
+            ]
+        ):
+            # Candidates of the quadrant are candidates of the whole box.
+            candidates, _ = self.candidates(quadrant_box, rows)
+            self.fill(first + quadrant, quadrant_box, candidates, depth + 1)
@@ -0,0 +1,476 @@
+from __future__ import annotations
+
+import collections
+import dataclasses
+import functools
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import typing
+import urllib.parse
+
+from django.conf import settings
+
+from supercivilian.core.compression import CompressedBody
+
+from .dataset import (
+    INTEGER_FIELDS,
+    MISSING_INTEGER,
+    MISSING_STRING,
+    STRING_FIELDS,
+    ShelterDataset,
+)
+
+logger = logging.getLogger(__name__)
+
+# The version of the pack format, bumped on incompatible changes.
+FORMAT = 1
+# The fields of the shelters in a pack, in the order of the columns.
+FIELDS = ("id", "longitude", "latitude", *INTEGER_FIELDS, *STRING_FIELDS)
+# The pack of the shelters with an unknown voivodeship.
+UNKNOWN_VOIVODESHIP = "unknown"
+
+# Coordinates are stored as integers in millionths of a degree, about 0.1 m.
+_COORDINATE_SCALE = 10**6
+_STRING_COLUMNS = range(3 + len(INTEGER_FIELDS), len(FIELDS))
+# The file with the voivodeships of a version and their counts.
+_INDEX = "index.json"
+
+
+@dataclasses.dataclass(frozen=True)
+class Pack:
+    """A gzipped, columnar JSON pack of the shelters of a voivodeship.
+
+    The JSON document has the `format`, `version` and `voivodeship` of the
+    pack, the `base` version of a delta pack (`null` for a full pack), the
+    `fields` and `coordinate_scale`, the `strings` referenced by the string
+    columns, the `columns` of the added or updated shelters, one list per
+    field, and the ids of the `removed` shelters.
+
+    Attributes:
+        voivodeship: The voivodeship.
+        version: The dataset version of the pack.
+        base: The dataset version a delta pack applies to, or `None` for a
+            full pack.
+        count: The number of added or updated shelters.
+        removed: The number of removed shelters.
+        body: The gzipped JSON document.
+        etag: The strong ETag of the pack, quoted.
+    """
+
+    voivodeship: str
+    version: str
+    base: str | None
+    count: int
+    removed: int
+    body: bytes
+    etag: str
+
+    @property
+    def size(self) -> int:
+        """The size of the gzipped pack in bytes."""
+        return len(self.body)
+
+    @functools.cached_property
+    def compressed(self) -> CompressedBody:
+        """The pack with every encoding, compressed with brotli on first use."""
+        return CompressedBody.from_gzip(self.body, "application/json", etag=self.etag)
+
+    @classmethod
+    def encode(
+        cls,
+        voivodeship: str,
+        version: str,
+        records: typing.Sequence[tuple],
+        base: str | None = None,
+        removed: typing.Sequence[int] = (),
+    ) -> Pack:
+        """Encode a pack.
+
+        Args:
+            voivodeship: The voivodeship.
+            version: The dataset version.
+            records: The added or updated shelters, as tuples of the values of
+                `FIELDS` sorted by id.
+            base: The base version of a delta pack. Defaults to `None`.
+            removed: The ids of the removed shelters. Defaults to none.
+
+        Returns:
+            The `Pack`.
+        """
+        strings: dict[str, int] = {}
+        columns = [list(column) for column in zip(*records)] or [[] for _ in FIELDS]
+
+        for index in _STRING_COLUMNS:
+            columns[index] = [
+                None if value is None else strings.setdefault(value, len(strings))
+                for value in columns[index]
+            ]
+
+        document = {
+            "format": FORMAT,
+            "version": version,
+            "base": base,
+            "voivodeship": voivodeship,
+            "fields": FIELDS,
+            "coordinate_scale": _COORDINATE_SCALE,
+            "strings": list(strings),
+            "columns": dict(zip(FIELDS, columns)),
+            "removed": sorted(removed),
+        }
+        body = gzip.compress(
+            json.dumps(document, ensure_ascii=False, separators=(",", ":")).encode(),
+            mtime=0,
+        )
+
+        return cls.from_body(
+            voivodeship, version, base, body, count=len(records), removed=len(removed)
+        )
+
+    @classmethod
+    def from_body(
+        cls,
+        voivodeship: str,
+        version: str,
+        base: str | None,
+        body: bytes,
+        count: int,
+        removed: int = 0,
+    ) -> Pack:
+        """Wrap an encoded pack, computing its ETag."""
+        return cls(
+            voivodeship=voivodeship,
+            version=version,
+            base=base,
+            count=count,
+            removed=removed,
+            body=body,
+            etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+        )
+
+    def records(self) -> dict[int, tuple]:
+        """Decode the shelters of the pack.
+
+        Returns:
+            The shelters, by id.
+        """
+        document = json.loads(gzip.decompress(self.body))
+        strings = document["strings"]
+        columns = [document["columns"][field] for field in FIELDS]
+
+        for index in _STRING_COLUMNS:
+            columns[index] = [
+                None if value is None else strings[value] for value in columns[index]
+            ]
+
+        return {record[0]: record for record in zip(*columns)}
+
+
+def build_packs(dataset: ShelterDataset) -> dict[str, Pack]:
+    """Build the full packs of a dataset, one per voivodeship.
+
+    Args:
+        dataset: The dataset.
+
+    Returns:
+        The packs, by voivodeship.
+    """
+    columns = dataset.columns
+    integers = [columns[field] for field in INTEGER_FIELDS]
+    strings = [columns[field] for field in STRING_FIELDS]
+    voivodeships = columns["voivodeship"]
+
+    records: dict[int, list[tuple]] = {}
+
+    # Rows are sorted by id, so the records of every pack are too.
+    for row in range(len(dataset)):
+        records.setdefault(voivodeships[row], []).append(
+            (
+                dataset.ids[row],
+                round(dataset.longitudes[row] * _COORDINATE_SCALE),
+                round(dataset.latitudes[row] * _COORDINATE_SCALE),
+                *[
+                    None if column[row] == MISSING_INTEGER else column[row]
+                    for column in integers
+                ],
+                *[dataset.strings[column[row]] for column in strings],
+            )
+        )
+
+    packs = {}
+
+    for index, voivodeship_records in records.items():
+        voivodeship = (
+            UNKNOWN_VOIVODESHIP if index == MISSING_STRING else dataset.strings[index]
+        )
+        packs[voivodeship] = Pack.encode(
+            voivodeship, dataset.version, voivodeship_records
+        )
+
+    return packs
+
+
+def delta_pack(
+    voivodeship: str,
+    version: str,
+    base_version: str,
+    base: Pack | None,
+    current: Pack | None,
+) -> Pack:
+    """Build the delta pack between two versions of the pack of a voivodeship.
+
+    Args:
+        voivodeship: The voivodeship.
+        version: The current dataset version.
+        base_version: The base dataset version.
+        base: The pack of the base version, or `None` if the voivodeship had
+            no shelters.
+        current: The pack of the current version, or `None` if the
+            voivodeship has no shelters anymore.
+
+    Returns:
+        The delta `Pack`.
+    """
+    base_records = base.records() if base is not None else {}
+    current_records = current.records() if current is not None else {}
+
+    return Pack.encode(
+        voivodeship,
+        version,
+        [
+            record
+            for id, record in sorted(current_records.items())
+            if base_records.get(id) != record
+        ],
+        base=base_version,
+        removed=base_records.keys() - current_records.keys(),
+    )
+
+
+class PackStore:
+    """The packs of the recent dataset versions.
+
+    The full packs of a version are built once, on first use, and kept for
+    the last `history` versions to build delta packs against. If the store
+    has a directory, the full packs are also written to it, so workers and
+    restarts share them and the history survives a restart. Delta packs are
+    built on first request and kept in memory.
+    """
+
+    def __init__(
+        self,
+        path: str | os.PathLike | None = None,
+        history: int = 8,
+        max_deltas: int = 256,
+    ) -> None:
+        """Initialize the store.
+
+        Args:
+            path: The directory to store the full packs in. Defaults to
+                `None`, which means they are only kept in memory.
+            history: The number of versions to keep. Defaults to 8.
+            max_deltas: The number of delta packs to keep in memory.
+                Defaults to 256.
+        """
+        self.path = path
+        self.history = history
+        self.max_deltas = max_deltas
+
+        self._versions: collections.OrderedDict[str, dict[str, Pack]] = (
+            collections.OrderedDict()
+        )
+        self._deltas: collections.OrderedDict[tuple[str, str, str], Pack] = (
+            collections.OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def packs(self, dataset: ShelterDataset) -> dict[str, Pack]:
+        """Get the full packs of a dataset, building them if needed.
+
+        Args:
+            dataset: The dataset.
+
+        Returns:
+            The packs, by voivodeship.
+        """
+        if (packs := self._versions.get(dataset.version)) is not None:
+            return packs
+
+        with self._lock:
+            if (packs := self._get_version(dataset.version)) is None:
+                packs = build_packs(dataset)
+                self._write_version(dataset.version, packs)
+                self._remember_version(dataset.version, packs)
+
+            return packs
+
+    def pack(
+        self, dataset: ShelterDataset, voivodeship: str, base: str | None = None
+    ) -> Pack | None:
+        """Get the pack of a voivodeship.
+
+        Args:
+            dataset: The dataset.
+            voivodeship: The voivodeship.
+            base: The version the client has. Defaults to `None`, which means
+                the full pack. If the version isn't kept anymore, the full
+                pack is returned.
+
+        Returns:
+            The delta pack from `base` if it is kept, else the full pack, or
+            `None` if the voivodeship has no shelters in either version.
+        """
+        packs = self.packs(dataset)
+        current = packs.get(voivodeship)
+
+        if base is None:
+            return current
+
+        key = (dataset.version, base, voivodeship)
+
+        if (pack := self._deltas.get(key)) is not None:
+            return pack
+
+        with self._lock:
+            base_packs = self._get_version(base)
+
+        if base_packs is None:
+            return current
+
+        if current is None and voivodeship not in base_packs:
+            return None
+
+        pack = delta_pack(
+            voivodeship, dataset.version, base, base_packs.get(voivodeship), current
+        )
+
+        with self._lock:
+            self._deltas[key] = pack
+
+            while len(self._deltas) > self.max_deltas:
+                self._deltas.popitem(last=False)
+
+        return pack
+
+    def _get_version(self, version: str) -> dict[str, Pack] | None:
+        """Get the packs of a version from memory or the directory."""
+        if (packs := self._versions.get(version)) is not None:
+            self._versions.move_to_end(version)
+            return packs
+
+        if (packs := self._read_version(version)) is not None:
+            self._remember_version(version, packs)
+
+        return packs
+
+    def _remember_version(self, version: str, packs: dict[str, Pack]) -> None:
+        """Keep the packs of a version in memory."""
+        self._versions[version] = packs
+
+        while len(self._versions) > self.history:
+            self._versions.popitem(last=False)
+
+    def _read_version(self, version: str) -> dict[str, Pack] | None:
+        """Read the packs of a version from the directory."""
+        if not self.path or os.sep in version or version.startswith("."):
+            return None
+
+        directory = os.path.join(self.path, version)
+
+        try:
+            with open(os.path.join(directory, _INDEX), encoding="utf-8") as file:
+                counts = json.load(file)
+
+            packs = {}
+
+            for voivodeship, count in counts.items():
+                with open(
+                    os.path.join(directory, _file_name(voivodeship)), "rb"
+                ) as file:
+                    packs[voivodeship] = Pack.from_body(
+                        voivodeship, version, None, file.read(), count=count
+                    )
+        except (OSError, ValueError):
+            return None
+
+        return packs
+
+    def _write_version(self, version: str, packs: dict[str, Pack]) -> None:
+        """Write the packs of a version to the directory and remove the packs
+        of the versions past the history."""
+        if not self.path:
+            return
+
+        target = os.path.join(self.path, version)
+        os.makedirs(self.path, exist_ok=True)
+
+        # The packs are written to a hidden directory that is renamed once
+        # complete, so other workers never read a partial version.
+        directory = tempfile.mkdtemp(prefix=".", dir=self.path)
+
+        try:
+            for voivodeship, pack in packs.items():
+                with open(
+                    os.path.join(directory, _file_name(voivodeship)), "wb"
+                ) as file:
+                    file.write(pack.body)
+
+            with open(os.path.join(directory, _INDEX), "w", encoding="utf-8") as file:
+                json.dump(
+                    {voivodeship: pack.count for voivodeship, pack in packs.items()},
+                    file,
+                    ensure_ascii=False,
+                )
+
+            # Another worker may have written the same packs first.
+            if not os.path.exists(target):
+                os.rename(directory, target)
+        except OSError:
+            logger.warning(
+                "Couldn't write the shelter packs of %s", version, exc_info=True
+            )
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+        versions = sorted(
+            (
+                entry
+                for entry in os.scandir(self.path)
+                if entry.is_dir() and not entry.name.startswith(".")
+            ),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+
+        for entry in versions[: -self.history]:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def _file_name(voivodeship: str) -> str:
+    """Get the name of the file of the pack of a voivodeship."""
+    return f"{urllib.parse.quote(voivodeship, safe='')}.json.gz"
+
+
+_store: PackStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_pack_store() -> PackStore:
+    """Get the pack store of this process, configured by the `ARCGIS_PACKS`
+    setting.
+
+    Returns:
+        The `PackStore`.
+    """
+    global _store
+
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = PackStore(**settings.ARCGIS_PACKS)
+
+    return _store
@@ -23,3 +23,78 @@ class ShelterSerializerWithDistance(ShelterSerializer):
     """Serializer for `Shelter` objects with distance."""
 
     distance = serializers.FloatField(required=True)
+
+
+class ShelterSerializerWithRoutePosition(ShelterSerializerWithDistance):
+    """Serializer for `Shelter` objects along a route, with the distance from
+    the route and the position along it."""
+
+    position = serializers.FloatField(required=True)
+
+
+class ClusterSerializer(serializers.Serializer):
+    """Serializer for `Cluster` objects."""
+
+    longitude = serializers.FloatField()
+    latitude = serializers.FloatField()
+    count = serializers.IntegerField()
+    capacity = serializers.IntegerField()
+    id = serializers.IntegerField(allow_null=True)
+
+
+class ShelterClustersSerializer(serializers.Serializer):
+    """Serializer for the clusters and shelters in a bounding box."""
+
+    zoom = serializers.IntegerField()
+    clusters = ClusterSerializer(many=True)
+    shelters = ShelterSerializer(many=True)
+
+
+class ShelterCapacitySerializer(serializers.Serializer):
+    """Serializer for the nearest shelters covering a number of people."""
+
+    capacity = serializers.IntegerField()
+    shelters = ShelterSerializerWithDistance(many=True)
+
+
+class AreaAggregateSerializer(serializers.Serializer):
+    """Serializer for `AreaAggregate` objects."""
+
+    voivodeship = serializers.CharField(allow_null=True)
+    province = serializers.CharField(allow_null=True)
+    count = serializers.IntegerField()
+    capacity = serializers.IntegerField()
+    area = serializers.IntegerField()
+    quality = serializers.DictField(child=serializers.IntegerField())
+
+
+class AreaAggregatesSerializer(serializers.Serializer):
+    """Serializer for the rollups of the administrative areas within an area."""
+
+    total = AreaAggregateSerializer()
+    areas = AreaAggregateSerializer(many=True)
+
+
+class ShelterPackSerializer(serializers.Serializer):
+    """Serializer for the offline pack of a voivodeship in the pack index."""
+
+    voivodeship = serializers.CharField()
+    count = serializers.IntegerField()
+    size = serializers.IntegerField()
+    etag = serializers.CharField()
+
+
+class ShelterPacksSerializer(serializers.Serializer):
+    """Serializer for the index of the offline packs of a dataset version."""
+
+    version = serializers.CharField()
+    packs = ShelterPackSerializer(many=True)
+
+
+class CategoryCodesSerializer(serializers.Serializer):
+    """Serializer for the codes of the categorical shelter fields."""
+
+    version = serializers.CharField()
+    fields = serializers.DictField(
+        child=serializers.ListField(child=serializers.CharField())
+    )
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import dataclasses
+import json
+import mmap
+import os
+import struct
+import typing
+
+MAGIC = b"SCSHELTR"
+FORMAT_VERSION = 1
+
+# Magic, format version and number of sections.
+_HEADER = struct.Struct("<8sII")
+# Name, offset and length in bytes of a section.
+_SECTION = struct.Struct("<16sQQ")
+_ALIGNMENT = 8
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot file is invalid or has an unsupported format."""
+
+
+@dataclasses.dataclass
+class Snapshot:
+    """A snapshot file opened with `mmap`.
+
+    The sections are zero-copy views of the mapped file, so every process that
+    opens the same file shares one copy of it in the page cache.
+
+    Attributes:
+        metadata: The JSON metadata stored with the snapshot.
+        sections: The binary sections by name.
+    """
+
+    metadata: dict[str, typing.Any]
+    sections: dict[str, memoryview]
+
+
+def write_snapshot(
+    path: str | os.PathLike,
+    metadata: dict[str, typing.Any],
+    sections: dict[str, typing.Any],
+) -> None:
+    """Write a snapshot file.
+
+    The file is written next to `path` and renamed over it, so processes never
+    see a partially written snapshot.
+
+    Args:
+        path: The path of the snapshot.
+        metadata: JSON serializable metadata to store with the snapshot.
+        sections: The binary sections by name. Values can be any object
+            supporting the buffer protocol, e.g. `bytes` or `array.array`.
+    """
+    sections = {
+        "metadata": json.dumps(metadata).encode(),
+        **{name: memoryview(section).cast("B") for name, section in sections.items()},
+    }
+
+    offset = _align(_HEADER.size + _SECTION.size * len(sections))
+    table = []
+
+    for name, section in sections.items():
+        table.append((name, offset, len(section)))
+        offset = _align(offset + len(section))
+
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+
+    with open(temporary_path, "wb") as file:
+        file.write(_HEADER.pack(MAGIC, FORMAT_VERSION, len(sections)))
+
+        for name, offset, length in table:
+            file.write(_SECTION.pack(name.encode(), offset, length))
+
+        for (name, offset, _), section in zip(table, sections.values()):
+            file.write(b"\0" * (offset - file.tell()))
+            file.write(section)
+
+        file.flush()
+        os.fsync(file.fileno())
+
+    os.replace(temporary_path, path)
+
+
+def open_snapshot(path: str | os.PathLike) -> Snapshot:
+    """Open a snapshot file.
+
+    Args:
+        path: The path of the snapshot.
+
+    Returns:
+        The `Snapshot`.
+
+    Raises:
+        OSError: If the file can't be opened.
+        SnapshotError: If the file is not a valid snapshot.
+    """
+    with open(path, "rb") as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    view = memoryview(buffer)
+
+    try:
+        magic, format_version, count = _HEADER.unpack_from(view)
+    except struct.error:
+        raise SnapshotError(f"{path} is not a shelter snapshot")
+
+    if magic != MAGIC:
+        raise SnapshotError(f"{path} is not a shelter snapshot")
+
+    if format_version != FORMAT_VERSION:
+        raise SnapshotError(
+            f"{path} has format version {format_version}, expected {FORMAT_VERSION}"
+        )
+
+    sections = {}
+
+    for index in range(count):
+        name, offset, length = _SECTION.unpack_from(
+            view, _HEADER.size + index * _SECTION.size
+        )
+
+        if offset + length > len(view):
+            raise SnapshotError(f"{path} is truncated")
+
+        sections[name.rstrip(b"\0").decode()] = view[offset : offset + length]
+
+    metadata = json.loads(bytes(sections.pop("metadata")))
+
+    return Snapshot(metadata=metadata, sections=sections)
+
+
+def _align(offset: int) -> int:
+    """Round an offset up to the section alignment."""
+    return (offset + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
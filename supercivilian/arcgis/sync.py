@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import dataclasses
+import datetime
+import logging
+import os
+import typing
+
+from django.conf import settings
+
+from supercivilian.core.metrics import Counter
+
+from .aggregates import get_shelter_aggregates
+from .dataclasses import Shelter
+from .dataset import DatasetBuilder, ShelterDataset, get_dataset, set_dataset
+from .ingest import ShelterReader
+from .packs import get_pack_store
+from .utilities import download_shelter_dataset, get_all_features
+
+logger = logging.getLogger(__name__)
+
+SYNC_CHANGES = Counter(
+    "supercivilian_shelter_sync_changes_total",
+    "Number of shelters upserted or removed by dataset syncs",
+)
+
+# Edits are fetched from a little before the last sync, in case the clocks of
+# the server and ArcGIS differ.
+_EDIT_OVERLAP = datetime.timedelta(minutes=5)
+# The maximum number of ids in one `ObjectId2 IN (...)` query.
+_IDS_PER_QUERY = 500
+
+
+@dataclasses.dataclass
+class Delta:
+    """The changes to a shelter dataset since it was last synced.
+
+    Attributes:
+        upserted: The added and updated shelters.
+        removed: The ids of the removed shelters.
+        synced_at: When the changes were fetched, as an ISO 8601 UTC timestamp.
+    """
+
+    upserted: list[Shelter] = dataclasses.field(default_factory=list)
+    removed: set[int] = dataclasses.field(default_factory=set)
+    synced_at: str | None = None
+
+    def __bool__(self) -> bool:
+        return bool(self.upserted or self.removed)
+
+
+class Source(typing.Protocol):
+    """Where a shelter dataset is synced from."""
+
+    def load(self) -> ShelterDataset:
+        """Load all shelters into a new dataset."""
+        ...
+
+    def changes(self, dataset: ShelterDataset) -> Delta:
+        """Find the changes to a dataset since it was last synced."""
+        ...
+
+
+class FeatureServerSource:
+    """Syncs from the ArcGIS FeatureServer.
+
+    Added and removed shelters are found by diffing the ids of the layer
+    against the dataset, which only downloads the ids. If the layer tracks
+    edits, updated shelters are found by querying the edit date field for
+    edits since the last sync.
+    """
+
+    def __init__(
+        self,
+        edit_field: str | None = None,
+        page_size: int = 2000,
+        workers: int = 4,
+    ) -> None:
+        """Initialize the source.
+
+        Args:
+            edit_field: The edit date field of the layer. Defaults to `None`,
+                which means updates to existing shelters aren't picked up.
+            page_size: The number of features per request. Defaults to 2000.
+            workers: The number of pages downloaded in parallel. Defaults to 4.
+        """
+        self.edit_field = edit_field
+        self.page_size = page_size
+        self.workers = workers
+
+    def load(self) -> ShelterDataset:
+        return download_shelter_dataset(page_size=self.page_size, workers=self.workers)
+
+    def changes(self, dataset: ShelterDataset) -> Delta:
+        synced_at = _now()
+
+        ids = {
+            feature["attributes"]["ObjectId2"]
+            for feature in self._features(out_fields="ObjectId2")
+        }
+        known = set(dataset.ids)
+
+        upserted = []
+
+        if self.edit_field and dataset.synced_at:
+            since = datetime.datetime.fromisoformat(dataset.synced_at) - _EDIT_OVERLAP
+            upserted += [
+                Shelter.from_api_data(feature)
+                for feature in self._features(
+                    where=f"{self.edit_field} >= timestamp "
+                    f"'{since.strftime('%Y-%m-%d %H:%M:%S')}'"
+                )
+            ]
+
+        added = sorted(ids - known - {shelter.id for shelter in upserted})
+
+        for start in range(0, len(added), _IDS_PER_QUERY):
+            chunk = added[start : start + _IDS_PER_QUERY]
+            upserted += [
+                Shelter.from_api_data(feature)
+                for feature in self._features(
+                    where=f"ObjectId2 IN ({','.join(map(str, chunk))})"
+                )
+            ]
+
+        return Delta(
+            upserted=[
+                shelter for shelter in upserted if dataset.get(shelter.id) != shelter
+            ],
+            removed=known - ids,
+            synced_at=synced_at,
+        )
+
+    def _features(self, where: str = "1=1", out_fields: str = "*") -> list:
+        """Get all features matching a query."""
+        return get_all_features(
+            where=where,
+            out_fields=out_fields,
+            page_size=self.page_size,
+            workers=self.workers,
+        )
+
+
+class FileSource:
+    """Syncs from a dump of the shelter layer, e.g. a local stand-in for the
+    FeatureServer. See `supercivilian.arcgis.ingest.ShelterReader`.
+
+    The dump is streamed and every shelter is compared with the dataset.
+    """
+
+    def __init__(self, path: str | os.PathLike, format: str | None = None) -> None:
+        """Initialize the source.
+
+        Args:
+            path: The path of the dump.
+            format: The format of the dump. Defaults to detecting it from the
+                file extension.
+        """
+        self.path = path
+        self.format = format
+
+    def load(self) -> ShelterDataset:
+        synced_at = _now()
+
+        return ShelterDataset.from_shelters(
+            ShelterReader(self.path, format=self.format), synced_at=synced_at
+        )
+
+    def changes(self, dataset: ShelterDataset) -> Delta:
+        delta = Delta(synced_at=_now())
+        seen = set()
+
+        for shelter in ShelterReader(self.path, format=self.format):
+            seen.add(shelter.id)
+
+            if dataset.get(shelter.id) != shelter:
+                delta.upserted.append(shelter)
+
+        delta.removed = set(dataset.ids) - seen
+
+        return delta
+
+
+def apply_delta(dataset: ShelterDataset, delta: Delta) -> ShelterDataset:
+    """Apply changes to a dataset.
+
+    Args:
+        dataset: The dataset, which is left unchanged.
+        delta: The changes.
+
+    Returns:
+        A new version of the dataset.
+    """
+    builder = DatasetBuilder()
+    replaced = delta.removed | {shelter.id for shelter in delta.upserted}
+
+    for row, id in enumerate(dataset.ids):
+        if id not in replaced:
+            builder.add(dataset.shelter(row))
+
+    for shelter in delta.upserted:
+        builder.add(shelter)
+
+    return builder.build(cell_size=dataset.cell_size, synced_at=delta.synced_at)
+
+
+def sync_shelter_dataset(source: Source | None = None) -> tuple[ShelterDataset, Delta]:
+    """Sync the shelter dataset of this process and swap in the new version.
+
+    The new version is written to the snapshot at `ARCGIS_DATASET_PATH`, if
+    the setting is set, where other workers pick it up. If there is no
+    dataset yet, all shelters are loaded from the source.
+
+    Args:
+        source: The source to sync from. Defaults to the ArcGIS FeatureServer,
+            configured by the `ARCGIS_SYNC` setting.
+
+    Returns:
+        A `(dataset, delta)` tuple of the current dataset and the applied
+        changes. The delta is empty if the dataset was loaded from scratch.
+
+    Raises:
+        requests.RequestException: If a request failed.
+        ValueError: If a response or the dump is invalid.
+        OSError: If the dump can't be read or the snapshot can't be written.
+    """
+    if source is None:
+        source = FeatureServerSource(**settings.ARCGIS_SYNC)
+
+    path = settings.ARCGIS_DATASET_PATH
+    dataset = get_dataset() if not path or os.path.exists(path) else None
+
+    if dataset is None:
+        dataset = source.load()
+        delta = Delta(synced_at=dataset.synced_at)
+        upserted = len(dataset)
+    else:
+        delta = source.changes(dataset)
+
+        if not delta:
+            logger.info("Shelter dataset version %s is up to date", dataset.version)
+            return dataset, delta
+
+        dataset = apply_delta(dataset, delta)
+        upserted = len(delta.upserted)
+
+    if path:
+        dataset.save(path)
+
+    set_dataset(dataset)
+    get_shelter_aggregates(dataset)
+    get_pack_store().packs(dataset)
+
+    SYNC_CHANGES.inc(upserted, change="upserted")
+    SYNC_CHANGES.inc(len(delta.removed), change="removed")
+    logger.info(
+        "Synced shelter dataset version %s: %d upserted, %d removed",
+        dataset.version,
+        upserted,
+        len(delta.removed),
+    )
+
+    return dataset, delta
+
+
+def _now() -> str:
+    """Get the current time as an ISO 8601 UTC timestamp."""
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
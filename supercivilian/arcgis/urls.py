@@ -1,12 +1,39 @@
 from django.urls import path
 
-from .views import GetShelterDetailsView, GetSheltersForPointView
+from .views import (
+    ExportSheltersView,
+    GetCategoryCodesView,
+    GetProvinceAggregatesView,
+    GetNearestSheltersView,
+    GetShelterClustersView,
+    GetShelterDetailsView,
+    GetShelterPacksView,
+    GetShelterPackView,
+    GetSheltersAlongRouteView,
+    GetSheltersForCapacityView,
+    GetSheltersForPointView,
+    GetSheltersInBoxView,
+    GetSheltersInPolygonView,
+    GetVoivodeshipAggregatesView,
+)
 
 app_name = "arcgis"
 
 # fmt: off
 urlpatterns = [
     path("shelters", GetSheltersForPointView.as_view(), name="get-shelters-for-point"),
+    path("shelters/nearest", GetNearestSheltersView.as_view(), name="get-nearest-shelters"),
+    path("shelters/capacity", GetSheltersForCapacityView.as_view(), name="get-shelters-for-capacity"),
+    path("shelters/clusters", GetShelterClustersView.as_view(), name="get-shelter-clusters"),
+    path("shelters/box", GetSheltersInBoxView.as_view(), name="get-shelters-in-box"),
+    path("shelters/polygon", GetSheltersInPolygonView.as_view(), name="get-shelters-in-polygon"),
+    path("shelters/route", GetSheltersAlongRouteView.as_view(), name="get-shelters-along-route"),
+    path("shelters/aggregates/voivodeships", GetVoivodeshipAggregatesView.as_view(), name="get-voivodeship-aggregates"),
+    path("shelters/aggregates/provinces", GetProvinceAggregatesView.as_view(), name="get-province-aggregates"),
+    path("shelters/export", ExportSheltersView.as_view(), name="export-shelters"),
+    path("shelters/codes", GetCategoryCodesView.as_view(), name="get-category-codes"),
     path("shelters/<int:id>", GetShelterDetailsView.as_view(), name="get-shelter-details"),
+    path("packs", GetShelterPacksView.as_view(), name="get-shelter-packs"),
+    path("packs/<str:voivodeship>", GetShelterPackView.as_view(), name="get-shelter-pack"),
 ]
 # fmt: on
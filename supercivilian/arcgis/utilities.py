@@ -1,27 +1,54 @@
 from __future__ import annotations
 
+import concurrent.futures
+import datetime
+import functools
+import itertools
 import typing
 import logging
 import urllib.parse
 
 import requests
-from django.core.cache import cache
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 
+from supercivilian.core import upstream
+from supercivilian.core.cache import lookup, store
 from supercivilian.core.dataclasses import Point
+from supercivilian.core.metrics import Histogram
+from supercivilian.core.timing import span
 
+from .aggregates import AreaAggregate, get_shelter_aggregates
+from .batching import get_batcher
+from .clusters import Cluster, get_cluster_hierarchy
 from .constants import BASE_ARCGIS_SHELTER_API_URL
 from .dataclasses import Shelter
+from .dataset import MISSING_INTEGER, ShelterDataset, get_dataset, set_dataset
+from .fields import ShelterCodes, get_shelter_codes
+from .geometry import PreparedPolygon, route_positions
+from .ingest import ShelterReader
+from .packs import Pack, get_pack_store
 from .typing import ArcGISShelter
 
 logger = logging.getLogger(__name__)
 
+SORT_DURATION = Histogram(
+    "supercivilian_arcgis_sort_duration_seconds",
+    "Time spent sorting shelters by their distance from a point",
+)
 
-def _shelters_cache_key_for_point(point: Point) -> str:
+
+def _shelters_cache_key_for_point(point: Point, version: str | None = None) -> str:
     """Generate a cache key for shelters for a point.
 
     Args:
         point: The point.
+        version: The version of the shelter dataset the shelters come from,
+            if any, so a new version never serves shelters of the old one.
     """
+    if version is not None:
+        return f"shelters:{version}:{point.longitude},{point.latitude}"
+
     return f"shelters:{point.longitude},{point.latitude}"
 
 
@@ -42,6 +69,23 @@ def _geodesic_sort(point: Point) -> float:
     return closure
 
 
+def _require_dataset() -> ShelterDataset:
+    """Get the shelter dataset for queries only it can answer.
+
+    Returns:
+        The `ShelterDataset`.
+
+    Raises:
+        UpstreamUnavailableError: If the shelter dataset isn't loaded.
+    """
+    if (dataset := get_dataset()) is None:
+        raise upstream.UpstreamUnavailableError(
+            "arcgis", "The shelter dataset is not loaded"
+        )
+
+    return dataset
+
+
 def generate_arcgis_shelter_api_url(**params: typing.Any) -> str:
     """Generate a URL for the ArcGIS shelter API.
 
@@ -51,20 +95,25 @@ def generate_arcgis_shelter_api_url(**params: typing.Any) -> str:
     Returns:
         The generated URL with encoded parameters.
     """
-    return f"{BASE_ARCGIS_SHELTER_API_URL}?{urllib.parse.urlencode(params)}"
+    base_url = settings.ARCGIS_SHELTER_API_URL or BASE_ARCGIS_SHELTER_API_URL
 
+    return f"{base_url}?{urllib.parse.urlencode(params)}"
 
-def get_shelters_from_cache(point: Point) -> list[Shelter] | None:
+
+def get_shelters_from_cache(
+    point: Point, version: str | None = None
+) -> list[Shelter] | None:
     """Get shelters for a point from the cache.
 
     Args:
         point: The point.
+        version: The version of the shelter dataset, if any.
 
     Returns:
         A list of `Shelter` objects if the shelters exist, else `None`.
     """
-    if (shelters := cache.get(_shelters_cache_key_for_point(point))) is not None:
-        return [Shelter(**shelter) for shelter in shelters]
+    if (shelters := lookup(_shelters_cache_key_for_point(point, version))) is not None:
+        return list(shelters)
 
     return None
 
@@ -74,6 +123,7 @@ def set_shelters_in_cache(
     shelters: list[Shelter],
     timeout: int = 60 * 60,
     sort: bool = True,
+    version: str | None = None,
 ) -> None:
     """Set shelters for a point in the cache.
 
@@ -83,22 +133,28 @@ def set_shelters_in_cache(
         timeout: The timeout of the cache. Defaults to 1 hour.
         sort: Whether to sort the shelters by distance from the point before
             setting them in the cache. Defaults to `True`.
+        version: The version of the shelter dataset the shelters come from,
+            if any.
     """
     if sort:
-        shelters.sort(key=_geodesic_sort(point))
+        with SORT_DURATION.time(), span("sort"):
+            shelters.sort(key=_geodesic_sort(point))
 
-    cache.set(
-        _shelters_cache_key_for_point(point),
-        [shelter.dict() for shelter in shelters],
-        timeout=timeout,
-    )
+    with span("cache_set"):
+        store(
+            _shelters_cache_key_for_point(point, version),
+            # Frozen shelters in a tuple are immutable, so the in-process
+            # cache keeps them as they are rather than pickled.
+            tuple(shelters),
+            timeout=timeout,
+        )
 
 
 def get_shelters_for_point(
     point: Point, range_: float, offset: int = 0, limit: int = 10
 ) -> list[Shelter]:
-    """Get shelters within a given range of a point from the cache or the
-    ArcGIS API.
+    """Get shelters within a given range of a point from the cache, the
+    shelter dataset or the ArcGIS API, unless in offline mode.
 
     Args:
         point: The point to search around.
@@ -108,10 +164,33 @@ def get_shelters_for_point(
 
     Returns:
         A list of shelters sorted by distance from the point.
+
+    Raises:
+        UpstreamUnavailableError: If the shelters can't be found, so the
+            failure isn't cached as an empty result.
     """
-    if (shelters := get_shelters_from_cache(point)) is not None:
+    dataset = get_dataset()
+    version = dataset.version if dataset is not None else None
+
+    if (shelters := get_shelters_from_cache(point, version)) is not None:
+        return shelters[offset : offset + limit]
+
+    if dataset is not None:
+        with span("dataset"):
+            if (batcher := get_batcher(dataset)) is not None:
+                shelters = batcher.within(point, range_)
+            else:
+                shelters = dataset.within(point, range_)
+
+        set_shelters_in_cache(point, shelters, sort=False, version=version)
+
         return shelters[offset : offset + limit]
 
+    if settings.ARCGIS_OFFLINE:
+        raise upstream.UpstreamUnavailableError(
+            "arcgis", "The shelter dataset is not loaded"
+        )
+
     url = generate_arcgis_shelter_api_url(
         where="1=1",
         geometryType="esriGeometryPoint",
@@ -130,26 +209,374 @@ def get_shelters_for_point(
     )
 
     try:
-        response = requests.get(url, timeout=10)
+        response = upstream.get("arcgis", url)
         response.raise_for_status()
 
-        payload = response.json()
-
-        if "features" not in payload:
-            return []
+        with span("parse"):
+            payload = response.json()
 
         features: list[ArcGISShelter] = payload["features"]
-    except (requests.RequestException, ValueError):
-        return []
+    except (requests.RequestException, ValueError, KeyError, TypeError) as error:
+        logger.warning("Couldn't get shelters from ArcGIS: %r", error)
+
+        raise upstream.UpstreamUnavailableError("arcgis") from error
+
+    with span("from_api_data"):
+        shelters = [Shelter.from_api_data(feature) for feature in features]
 
-    shelters = [Shelter.from_api_data(feature) for feature in features]
-    sorted_shelters = sorted(shelters, key=_geodesic_sort(point))
+    with SORT_DURATION.time(), span("sort"):
+        sorted_shelters = sorted(shelters, key=_geodesic_sort(point))
 
-    set_shelters_in_cache(point, sorted_shelters, sort=False)
+    if not response.stale:
+        set_shelters_in_cache(point, sorted_shelters, sort=False)
 
     return sorted_shelters[offset : offset + limit]
 
 
+def get_nearest_shelters(point: Point, limit: int = 1) -> list[Shelter]:
+    """Get the shelters nearest to a point.
+
+    Answered by the shelter dataset, with its `NearestGrid` if it has one.
+    Without a dataset, the nearest shelters within the default range of
+    `get_shelters_for_point` are returned.
+
+    Args:
+        point: The point.
+        limit: The number of shelters to return. Defaults to 1.
+
+    Returns:
+        A list of shelters sorted by distance from the point.
+    """
+    if (dataset := get_dataset()) is None:
+        return get_shelters_for_point(point, 30 * 1000, 0, limit)
+
+    return [dataset.shelter(row) for _, row in dataset.nearest(point, limit)]
+
+
+def get_shelters_for_capacity(
+    point: Point,
+    people: int,
+    range_: float = 50 * 1000,
+    min_quality: int | None = None,
+    access_type: str | None = None,
+    max_shelters: int = 1000,
+) -> tuple[list[Shelter], int]:
+    """Get the nearest shelters whose combined capacity holds a number of
+    people.
+
+    Shelters are walked lazily in distance order and their capacity is added
+    up until it reaches `people`, so only the rings of the dataset around the
+    point that are needed are searched. Shelters with an unknown capacity are
+    skipped.
+
+    Args:
+        point: The point.
+        people: The number of people to shelter.
+        range_: The range in meters to search. Defaults to 50 km.
+        min_quality: The minimum quality of the shelters. Defaults to `None`,
+            which means any quality. Shelters with an unknown quality are
+            skipped if set.
+        access_type: The access type of the shelters. Defaults to `None`,
+            which means any access type.
+        max_shelters: The maximum number of shelters to return. Defaults to
+            1000.
+
+    Returns:
+        A `(shelters, capacity)` tuple of the shelters sorted by distance from
+        the point and their combined capacity, which is less than `people` if
+        there aren't enough shelters in range.
+
+    Raises:
+        UpstreamUnavailableError: If the shelter dataset isn't loaded.
+    """
+    dataset = _require_dataset()
+    capacities = dataset.columns["capacity"]
+    qualities = dataset.columns["quality"]
+    access_types = dataset.columns["access_type"]
+
+    shelters = []
+    capacity = 0
+
+    for _, row in dataset.by_distance(point, range_):
+        if capacities[row] == MISSING_INTEGER or capacities[row] <= 0:
+            continue
+
+        if min_quality is not None and (
+            qualities[row] == MISSING_INTEGER or qualities[row] < min_quality
+        ):
+            continue
+
+        if (
+            access_type is not None
+            and dataset.strings[access_types[row]] != access_type
+        ):
+            continue
+
+        shelters.append(dataset.shelter(row))
+        capacity += capacities[row]
+
+        if capacity >= people or len(shelters) >= max_shelters:
+            break
+
+    return shelters, capacity
+
+
+def get_shelter_clusters(
+    box: tuple[float, float, float, float], zoom: int, max_shelters: int = 500
+) -> tuple[list[Cluster], list[Shelter]]:
+    """Get the shelters in a bounding box, clustered for a map zoom level.
+
+    Above the highest zoom level of the cluster hierarchy, the shelters are
+    returned individually, unless there are more than `max_shelters` of them.
+
+    Args:
+        box: The `(minimum_longitude, minimum_latitude, maximum_longitude,
+            maximum_latitude)` of the box.
+        zoom: The zoom level.
+        max_shelters: The maximum number of individual shelters to return.
+            Defaults to 500.
+
+    Returns:
+        A `(clusters, shelters)` tuple, one of which is empty.
+
+    Raises:
+        UpstreamUnavailableError: If the shelter dataset isn't loaded.
+        BoxTooLargeError: If the box is too large for the zoom level.
+    """
+    dataset = _require_dataset()
+    hierarchy = get_cluster_hierarchy(dataset)
+
+    if zoom > hierarchy.max_zoom:
+        rows = dataset.in_box(*box)
+
+        if len(rows) <= max_shelters:
+            return [], [dataset.shelter(row) for row in sorted(rows)]
+
+    return hierarchy.clusters(box, zoom), []
+
+
+def get_voivodeship_aggregates() -> tuple[AreaAggregate, list[AreaAggregate]]:
+    """Get the rollups of the shelters per voivodeship.
+
+    Returns:
+        A `(total, voivodeships)` tuple of the rollup of the whole country and
+        of every voivodeship.
+
+    Raises:
+        UpstreamUnavailableError: If the shelter dataset isn't loaded.
+    """
+    aggregates = get_shelter_aggregates(_require_dataset())
+
+    return aggregates.total, aggregates.voivodeships()
+
+
+def get_province_aggregates(
+    voivodeship: str | None = None,
+) -> tuple[AreaAggregate | None, list[AreaAggregate]]:
+    """Get the rollups of the shelters per province (powiat).
+
+    Args:
+        voivodeship: The voivodeship to get the provinces of. Defaults to
+            `None`, which means all provinces.
+
+    Returns:
+        A `(total, provinces)` tuple of the rollup of the voivodeship, or of
+        the whole country, and of every province. The total is `None` if the
+        voivodeship has no shelters.
+
+    Raises:
+        UpstreamUnavailableError: If the shelter dataset isn't loaded.
+    """
+    aggregates = get_shelter_aggregates(_require_dataset())
+
+    if voivodeship is None:
+        return aggregates.total, aggregates.provinces()
+
+    return aggregates.voivodeship(voivodeship), aggregates.provinces(voivodeship)
+
+
+def get_shelters_in_box(
+    box: tuple[float, float, float, float], offset: int = 0, limit: int = 100
+) -> list[Shelter]:
+    """Get the shelters in a bounding box from the shelter dataset.
+
+    Args:
+        box: The `(minimum_longitude, minimum_latitude, maximum_longitude,
+            maximum_latitude)` of the box.
+        offset: The offset of the first record to return. Defaults to 0.
+        limit: The maximum number of records to return. Defaults to 100.
+
+    Returns:
+        A list of shelters sorted by id.
+
+    Raises:
+        UpstreamUnavailableError: If the shelter dataset isn't loaded.
+    """
+    dataset = _require_dataset()
+    rows = sorted(dataset.in_box(*box))
+
+    return [dataset.shelter(row) for row in rows[offset : offset + limit]]
+
+
+def get_shelters_in_polygon(
+    polygon: PreparedPolygon, offset: int = 0, limit: int = 100
+) -> list[Shelter]:
+    """Get the shelters in a polygon from the shelter dataset.
+
+    Args:
+        polygon: The polygon, see `supercivilian.arcgis.geometry.prepare_polygon`.
+        offset: The offset of the first record to return. Defaults to 0.
+        limit: The maximum number of records to return. Defaults to 100.
+
+    Returns:
+        A list of shelters sorted by id.
+
+    Raises:
+        UpstreamUnavailableError: If the shelter dataset isn't loaded.
+    """
+    dataset = _require_dataset()
+    rows = sorted(
+        polygon.filter(
+            dataset.longitudes, dataset.latitudes, dataset.rows_in_box(*polygon.box)
+        )
+    )
+
+    return [dataset.shelter(row) for row in rows[offset : offset + limit]]
+
+
+def get_shelters_along_route(
+    route: list[tuple[float, float]],
+    width: float,
+    offset: int = 0,
+    limit: int = 100,
+) -> list[tuple[Shelter, float, float]]:
+    """Get the shelters within a corridor around a route from the shelter
+    dataset.
+
+    Args:
+        route: The route, as a list of `(longitude, latitude)` tuples.
+        width: The maximum distance from the route in meters.
+        offset: The offset of the first record to return. Defaults to 0.
+        limit: The maximum number of records to return. Defaults to 100.
+
+    Returns:
+        A list of `(shelter, position, distance)` tuples sorted by position,
+        where `position` is the distance along the route to the point nearest
+        to the shelter and `distance` is the distance from it, in meters.
+
+    Raises:
+        UpstreamUnavailableError: If the shelter dataset isn't loaded.
+    """
+    dataset = _require_dataset()
+    matches = route_positions(
+        route, width, dataset.longitudes, dataset.latitudes, dataset.rows_in_box
+    )
+    rows = sorted(matches, key=lambda row: (matches[row], dataset.ids[row]))
+
+    return [
+        (dataset.shelter(row), *matches[row]) for row in rows[offset : offset + limit]
+    ]
+
+
+def export_shelters(
+    box: tuple[float, float, float, float] | None = None,
+    voivodeship: str | None = None,
+    province: str | None = None,
+) -> typing.Iterator[Shelter]:
+    """Get the shelters of the shelter dataset, one at a time.
+
+    The dataset is checked when called, but the shelters are only decoded as
+    they are iterated over, so exporting all of them takes constant memory.
+
+    Args:
+        box: The `(minimum_longitude, minimum_latitude, maximum_longitude,
+            maximum_latitude)` of the box to export. Defaults to `None`, which
+            means everywhere.
+        voivodeship: The voivodeship to export. Defaults to `None`, which
+            means all voivodeships.
+        province: The province (powiat) to export. Defaults to `None`, which
+            means all provinces.
+
+    Returns:
+        An iterator over the shelters, by id if `box` is `None`, else in the
+        order of the dataset's index.
+
+    Raises:
+        UpstreamUnavailableError: If the shelter dataset isn't loaded.
+    """
+    dataset = _require_dataset()
+    longitudes, latitudes = dataset.longitudes, dataset.latitudes
+
+    if box is None:
+        rows: typing.Iterable[int] = range(len(dataset))
+    else:
+        minimum_longitude, minimum_latitude, maximum_longitude, maximum_latitude = box
+        rows = (
+            row
+            for row in dataset.rows_in_box(*box)
+            if minimum_longitude <= longitudes[row] <= maximum_longitude
+            and minimum_latitude <= latitudes[row] <= maximum_latitude
+        )
+
+    filters = [
+        (dataset.columns[field], value)
+        for field, value in (("voivodeship", voivodeship), ("province", province))
+        if value is not None
+    ]
+
+    return (
+        dataset.shelter(row)
+        for row in rows
+        if all(dataset.strings[column[row]] == value for column, value in filters)
+    )
+
+
+def get_category_codes() -> ShelterCodes:
+    """Get the codes of the categorical shelter fields of the shelter dataset.
+
+    Returns:
+        The `ShelterCodes`.
+
+    Raises:
+        UpstreamUnavailableError: If the shelter dataset isn't loaded.
+    """
+    return get_shelter_codes(_require_dataset())
+
+
+def get_shelter_packs() -> tuple[str, list[Pack]]:
+    """Get the full offline packs of the shelter dataset.
+
+    Returns:
+        A `(version, packs)` tuple of the dataset version and its packs,
+        sorted by voivodeship.
+
+    Raises:
+        UpstreamUnavailableError: If the shelter dataset isn't loaded.
+    """
+    dataset = _require_dataset()
+    packs = get_pack_store().packs(dataset)
+
+    return dataset.version, [packs[voivodeship] for voivodeship in sorted(packs)]
+
+
+def get_shelter_pack(voivodeship: str, since: str | None = None) -> Pack | None:
+    """Get the offline pack of the shelters of a voivodeship.
+
+    Args:
+        voivodeship: The voivodeship.
+        since: The dataset version the client has. Defaults to `None`, which
+            means the full pack.
+
+    Returns:
+        The delta pack since `since` if that version is still kept, else the
+        full pack, or `None` if the voivodeship has no shelters.
+
+    Raises:
+        UpstreamUnavailableError: If the shelter dataset isn't loaded.
+    """
+    return get_pack_store().pack(_require_dataset(), voivodeship, since)
+
+
 def get_details_for_shelter(id: int) -> Shelter | None:
     """Get details for a shelter.
 
@@ -159,10 +586,18 @@ def get_details_for_shelter(id: int) -> Shelter | None:
     Returns:
         A `Shelter` object if the shelter exists, else `None`.
     """
+    if (dataset := get_dataset()) is not None and (
+        shelter := dataset.get(id)
+    ) is not None:
+        return shelter
+
+    if settings.ARCGIS_OFFLINE:
+        return None
+
     cache_key = f"shelter:{id}"
 
-    if (shelter := cache.get(cache_key)) is not None:
-        return Shelter(**shelter)
+    if (shelter := lookup(cache_key)) is not None:
+        return shelter
 
     url = generate_arcgis_shelter_api_url(
         where=f"ObjectId2 = {id}",
@@ -171,7 +606,7 @@ def get_details_for_shelter(id: int) -> Shelter | None:
     )
 
     try:
-        response = requests.get(url, timeout=10)
+        response = upstream.get("arcgis", url)
         response.raise_for_status()
 
         payload = response.json()
@@ -187,6 +622,146 @@ def get_details_for_shelter(id: int) -> Shelter | None:
         return None
 
     shelter = Shelter.from_api_data(features[0])
-    cache.set(cache_key, shelter.dict(), timeout=60 * 60)
+
+    if not response.stale:
+        store(cache_key, shelter, timeout=60 * 60)
 
     return shelter
+
+
+def _get_features_page(
+    where: str, out_fields: str, offset: int, count: int
+) -> list[ArcGISShelter]:
+    """Get a page of features from the ArcGIS API, ordered by id.
+
+    Args:
+        where: The `where` clause of the query.
+        out_fields: The attributes to return, separated by commas.
+        offset: The offset of the first record of the page.
+        count: The number of records in the page.
+
+    Returns:
+        A list of features.
+
+    Raises:
+        requests.RequestException: If the request failed.
+        ValueError: If the response is not valid JSON.
+    """
+    url = generate_arcgis_shelter_api_url(
+        where=where,
+        outFields=out_fields,
+        orderByFields="ObjectId2 ASC",
+        resultOffset=offset,
+        resultRecordCount=count,
+        returnGeometry="false",
+        f="json",
+    )
+
+    response = upstream.get("arcgis", url, cacheable=lambda response: False)
+    response.raise_for_status()
+
+    return response.json().get("features", [])
+
+
+def get_all_features(
+    where: str = "1=1",
+    out_fields: str = "*",
+    page_size: int = 2000,
+    workers: int = 4,
+) -> list[ArcGISShelter]:
+    """Get all features matching a query from the ArcGIS API.
+
+    Args:
+        where: The `where` clause of the query. Defaults to all features.
+        out_fields: The attributes to return, separated by commas. Defaults
+            to all attributes.
+        page_size: The number of features per request. Must not exceed the
+            maximum record count of the layer. Defaults to 2000.
+        workers: The number of pages downloaded in parallel. Defaults to 4.
+
+    Returns:
+        A list of features, ordered by id.
+
+    Raises:
+        requests.RequestException: If a request failed.
+        ValueError: If a response is not valid JSON.
+    """
+    response = upstream.get(
+        "arcgis",
+        generate_arcgis_shelter_api_url(where=where, returnCountOnly="true", f="json"),
+        cacheable=lambda response: False,
+    )
+    response.raise_for_status()
+
+    count = response.json()["count"]
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        pages = executor.map(
+            functools.partial(_get_features_page, where, out_fields),
+            range(0, count, page_size),
+            itertools.repeat(page_size),
+        )
+
+        return [feature for page in pages for feature in page]
+
+
+def download_shelter_dataset(page_size: int = 2000, workers: int = 4) -> ShelterDataset:
+    """Download all shelters from the ArcGIS API into a new shelter dataset.
+
+    Args:
+        page_size: The number of shelters per request. Must not exceed the
+            maximum record count of the layer. Defaults to 2000.
+        workers: The number of pages downloaded in parallel. Defaults to 4.
+
+    Returns:
+        The downloaded `ShelterDataset`.
+
+    Raises:
+        requests.RequestException: If a request failed.
+        ValueError: If a response is not valid JSON.
+    """
+    synced_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    features = get_all_features(page_size=page_size, workers=workers)
+
+    return ShelterDataset.from_shelters(
+        (Shelter.from_api_data(feature) for feature in features),
+        synced_at=synced_at,
+    )
+
+
+def load_shelter_dataset() -> ShelterDataset:
+    """Load the shelter dataset of this process.
+
+    The dataset is opened from the snapshot at `ARCGIS_DATASET_PATH` if the
+    setting is set, else it is read from the dump at `ARCGIS_DATASET_SOURCE`
+    if that is set, else it is downloaded from the ArcGIS API.
+
+    Returns:
+        The loaded `ShelterDataset`.
+
+    Raises:
+        OSError: If the snapshot or dump can't be opened.
+        SnapshotError: If the snapshot is invalid.
+        IngestError: If the dump is invalid.
+        ImproperlyConfigured: If in offline mode without a snapshot or dump.
+        requests.RequestException: If a request failed.
+        ValueError: If a response is not valid JSON.
+    """
+    if settings.ARCGIS_DATASET_PATH:
+        dataset = ShelterDataset.open(settings.ARCGIS_DATASET_PATH)
+    elif settings.ARCGIS_DATASET_SOURCE:
+        dataset = ShelterDataset.from_shelters(
+            ShelterReader(settings.ARCGIS_DATASET_SOURCE)
+        )
+    elif settings.ARCGIS_OFFLINE:
+        raise ImproperlyConfigured(
+            "ARCGIS_OFFLINE requires ARCGIS_DATASET_PATH or ARCGIS_DATASET_SOURCE"
+        )
+    else:
+        dataset = download_shelter_dataset()
+
+    set_dataset(dataset)
+
+    logger.info("Loaded %d shelters, dataset version %s", len(dataset), dataset.version)
+
+    return dataset
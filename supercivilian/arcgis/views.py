@@ -1,7 +1,22 @@
-from django.http import HttpRequest
+import typing
+
+from django.http import (
+    HttpRequest,
+    HttpResponse,
+    HttpResponseNotModified,
+    StreamingHttpResponse,
+)
+from django.utils.http import parse_etags
+from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import OpenApiParameter, OpenApiResponse, extend_schema
 from rest_framework import status, views
+from rest_framework.negotiation import BaseContentNegotiation
 
+from supercivilian.core.compression import (
+    cache_compressed,
+    compressed_response,
+    response_cache_key,
+)
 from supercivilian.core.dataclasses import Point
 from supercivilian.core.params import ParameterError, SearchParameters
 from supercivilian.core.responses import (
@@ -12,8 +27,90 @@ from supercivilian.core.responses import (
 from supercivilian.core.serializers import ErrorWithMessageSerializer
 from supercivilian.core.utilities import success_response_serializer
 
-from .serializers import ShelterSerializer, ShelterSerializerWithDistance
-from .utilities import get_details_for_shelter, get_shelters_for_point
+from .clusters import BoxTooLargeError
+from .dataset import get_dataset
+from .export import EXPORT_FORMATS
+from .fields import MAX_PRECISION, ShelterFields
+from .packs import Pack
+from .geometry import decode_polyline, prepare_polygon
+from .serializers import (
+    AreaAggregatesSerializer,
+    CategoryCodesSerializer,
+    ShelterCapacitySerializer,
+    ShelterClustersSerializer,
+    ShelterPacksSerializer,
+    ShelterSerializer,
+    ShelterSerializerWithDistance,
+    ShelterSerializerWithRoutePosition,
+)
+from .utilities import (
+    export_shelters,
+    get_category_codes,
+    get_details_for_shelter,
+    get_nearest_shelters,
+    get_province_aggregates,
+    get_shelters_along_route,
+    get_shelters_for_capacity,
+    get_shelter_clusters,
+    get_shelters_for_point,
+    get_shelters_in_box,
+    get_shelter_pack,
+    get_shelter_packs,
+    get_shelters_in_polygon,
+    get_voivodeship_aggregates,
+)
+
+# How long responses built from shelters are cached for (in seconds).
+_SHELTERS_RESPONSE_TIMEOUT = 60 * 60
+
+_SHELTER_FIELDS_PARAMETERS = [
+    OpenApiParameter(
+        name="fields",
+        description=(
+            "The fields of the shelters to return, separated by commas. "
+            "Defaults to all fields."
+        ),
+        type=str,
+    ),
+    OpenApiParameter(
+        name="precision",
+        description=(
+            "The number of decimals of the coordinates of the shelters. Maximum "
+            f"is `{MAX_PRECISION}`. Defaults to full precision."
+        ),
+        type=int,
+    ),
+    OpenApiParameter(
+        name="codes",
+        description=(
+            "Whether to return the categorical fields of the shelters as codes, "
+            "see `/arcgis/shelters/codes`"
+        ),
+        default=False,
+        type=bool,
+    ),
+]
+
+
+def _shelters_cache_key(
+    request: HttpRequest, *args: typing.Any, **kwargs: typing.Any
+) -> str:
+    """Key a cached response by the dataset version it is built from."""
+    dataset = get_dataset()
+
+    return response_cache_key(
+        request, "shelters", dataset.version if dataset is not None else "live"
+    )
+
+
+class _AnyContentNegotiation(BaseContentNegotiation):
+    """Content negotiation for views that don't render their responses."""
+
+    def select_parser(self, request, parsers):
+        return parsers[0] if parsers else None
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
 
 
 class GetSheltersForPointView(views.APIView):
@@ -55,6 +152,7 @@ class GetSheltersForPointView(views.APIView):
                 default=30 * 1000,
                 type=int,
             ),
+            *_SHELTER_FIELDS_PARAMETERS,
         ],
         responses={
             status.HTTP_200_OK: OpenApiResponse(
@@ -69,9 +167,14 @@ class GetSheltersForPointView(views.APIView):
                 response=ErrorWithMessageSerializer,
                 description="Invalid query parameters",
             ),
+            status.HTTP_503_SERVICE_UNAVAILABLE: OpenApiResponse(
+                response=ErrorWithMessageSerializer,
+                description="Upstream service temporarily unavailable",
+            ),
         },
         auth=[],
     )
+    @cache_compressed(_shelters_cache_key, _SHELTERS_RESPONSE_TIMEOUT, streaming=True)
     def get(self, request: HttpRequest) -> APIResponse:
         parameters = SearchParameters(request)
 
@@ -81,6 +184,9 @@ class GetSheltersForPointView(views.APIView):
             offset = parameters.integer("offset", default=0)
             limit = parameters.integer("limit", default=10)
             range_ = parameters.integer("range", default=30 * 1000)
+            fields = ShelterFields.from_parameters(
+                parameters, extra=("distance",), codes=get_category_codes
+            )
         except ParameterError as exception:
             return APIErrorResponse(
                 message=str(exception), status=status.HTTP_400_BAD_REQUEST
@@ -96,40 +202,1009 @@ class GetSheltersForPointView(views.APIView):
 
         shelters = get_shelters_for_point(point, range_, offset, limit)
 
+        return _shelters_response(
+            [fields.dict(shelter, point) for shelter in shelters] if shelters else [],
+            fields,
+        )
+
+
+class GetNearestSheltersView(views.APIView):
+    """GET the shelters nearest to a point."""
+
+    @extend_schema(
+        operation_id="get_nearest_shelters",
+        tags=["arcgis"],
+        summary="Get the shelters nearest to a point",
+        description="Get the shelters nearest to a point, regardless of range",
+        parameters=[
+            OpenApiParameter(
+                name="longitude",
+                description="The longitude of the point",
+                required=True,
+                type=float,
+            ),
+            OpenApiParameter(
+                name="latitude",
+                description="The latitude of the point",
+                required=True,
+                type=float,
+            ),
+            OpenApiParameter(
+                name="limit",
+                description="The number of shelters to return. Maximum is `10`.",
+                default=1,
+                type=int,
+            ),
+            *_SHELTER_FIELDS_PARAMETERS,
+        ],
+        responses={
+            status.HTTP_200_OK: OpenApiResponse(
+                response=success_response_serializer(
+                    name="NearestShelterListPayload",
+                    serializer=ShelterSerializerWithDistance,
+                    many=True,
+                ),
+                description="A list of shelters, nearest first",
+            ),
+            status.HTTP_400_BAD_REQUEST: OpenApiResponse(
+                response=ErrorWithMessageSerializer,
+                description="Invalid query parameters",
+            ),
+            status.HTTP_503_SERVICE_UNAVAILABLE: OpenApiResponse(
+                response=ErrorWithMessageSerializer,
+                description="Upstream service temporarily unavailable",
+            ),
+        },
+        auth=[],
+    )
+    def get(self, request: HttpRequest) -> APIResponse:
+        parameters = SearchParameters(request)
+
+        try:
+            longitude = parameters.float("longitude", required=True)
+            latitude = parameters.float("latitude", required=True)
+            limit = parameters.integer("limit", default=1)
+            fields = ShelterFields.from_parameters(
+                parameters, extra=("distance",), codes=get_category_codes
+            )
+        except ParameterError as exception:
+            return APIErrorResponse(
+                message=str(exception), status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if not 1 <= limit <= 10:
+            return APIErrorResponse(
+                message="Limit must be between 1 and 10",
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        point = Point(longitude=longitude, latitude=latitude)
+        shelters = get_nearest_shelters(point, limit)
+
+        return _shelters_response(
+            [fields.dict(shelter, point) for shelter in shelters], fields
+        )
+
+
+class GetSheltersForCapacityView(views.APIView):
+    """GET the nearest shelters that can hold a number of people."""
+
+    @extend_schema(
+        operation_id="get_shelters_for_capacity",
+        tags=["arcgis"],
+        summary="Get the nearest shelters that can hold a number of people",
+        description=(
+            "Get the shelters nearest to a point whose combined capacity holds "
+            "a given number of people. Shelters with an unknown capacity are "
+            "skipped."
+        ),
+        parameters=[
+            OpenApiParameter(
+                name="longitude",
+                description="The longitude of the point",
+                required=True,
+                type=float,
+            ),
+            OpenApiParameter(
+                name="latitude",
+                description="The latitude of the point",
+                required=True,
+                type=float,
+            ),
+            OpenApiParameter(
+                name="people",
+                description="The number of people to shelter",
+                required=True,
+                type=int,
+            ),
+            OpenApiParameter(
+                name="range",
+                description=(
+                    "How far from the point to search for shelters (in meters). "
+                    "Maximum is `500 * 1000`."
+                ),
+                default=50 * 1000,
+                type=int,
+            ),
+            OpenApiParameter(
+                name="min_quality",
+                description="The minimum quality of the shelters",
+                type=int,
+            ),
+            OpenApiParameter(
+                name="access_type",
+                description="The access type of the shelters",
+                type=str,
+            ),
+            *_SHELTER_FIELDS_PARAMETERS,
+        ],
+        responses={
+            status.HTTP_200_OK: OpenApiResponse(
+                response=success_response_serializer(
+                    name="ShelterCapacityPayload",
+                    serializer=ShelterCapacitySerializer,
+                ),
+                description=(
+                    "The shelters, nearest first, and their combined capacity, "
+                    "which is less than `people` if there aren't enough shelters "
+                    "in range"
+                ),
+            ),
+            status.HTTP_400_BAD_REQUEST: OpenApiResponse(
+                response=ErrorWithMessageSerializer,
+                description="Invalid query parameters",
+            ),
+            status.HTTP_503_SERVICE_UNAVAILABLE: OpenApiResponse(
+                response=ErrorWithMessageSerializer,
+                description="Shelter dataset not loaded",
+            ),
+        },
+        auth=[],
+    )
+    def get(self, request: HttpRequest) -> APIResponse:
+        parameters = SearchParameters(request)
+
+        try:
+            longitude = parameters.float("longitude", required=True)
+            latitude = parameters.float("latitude", required=True)
+            people = parameters.integer("people", required=True)
+            range_ = parameters.integer("range", default=50 * 1000)
+            min_quality = parameters.integer("min_quality")
+            access_type = parameters.string("access_type")
+            fields = ShelterFields.from_parameters(
+                parameters, extra=("distance",), codes=get_category_codes
+            )
+        except ParameterError as exception:
+            return APIErrorResponse(
+                message=str(exception), status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if people < 1:
+            return APIErrorResponse(
+                message="People must be at least 1",
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if not 0 < range_ <= 500 * 1000:
+            return APIErrorResponse(
+                message="Range must be between 1m and 500km",
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        point = Point(longitude=longitude, latitude=latitude)
+        shelters, capacity = get_shelters_for_capacity(
+            point, people, range_, min_quality, access_type
+        )
+
+        return _shelters_response(
+            {
+                "capacity": capacity,
+                "shelters": [fields.dict(shelter, point) for shelter in shelters],
+            },
+            fields,
+        )
+
+
+class GetShelterClustersView(views.APIView):
+    """GET the shelters in a map viewport, clustered for its zoom level."""
+
+    @extend_schema(
+        operation_id="get_shelter_clusters",
+        tags=["arcgis"],
+        summary="Get the shelters in a map viewport",
+        description=(
+            "Get the shelters in a bounding box, aggregated into clusters with "
+            "their count, total capacity and centroid. Above zoom level 16, the "
+            "shelters are returned individually instead."
+        ),
+        parameters=[
+            OpenApiParameter(
+                name="bbox",
+                description=(
+                    "The bounding box of the viewport, as `minimum longitude,"
+                    "minimum latitude,maximum longitude,maximum latitude`"
+                ),
+                required=True,
+                type=str,
+            ),
+            OpenApiParameter(
+                name="zoom",
+                description="The web map zoom level of the viewport, from 0 to 22",
+                required=True,
+                type=int,
+            ),
+        ],
+        responses={
+            status.HTTP_200_OK: OpenApiResponse(
+                response=success_response_serializer(
+                    name="ShelterClustersPayload",
+                    serializer=ShelterClustersSerializer,
+                ),
+                description="The clusters or shelters in the viewport",
+            ),
+            status.HTTP_400_BAD_REQUEST: OpenApiResponse(
+                response=ErrorWithMessageSerializer,
+                description="Invalid query parameters",
+            ),
+            status.HTTP_503_SERVICE_UNAVAILABLE: OpenApiResponse(
+                response=ErrorWithMessageSerializer,
+                description="Shelter dataset not loaded",
+            ),
+        },
+        auth=[],
+    )
+    def get(self, request: HttpRequest) -> APIResponse:
+        parameters = SearchParameters(request)
+
+        try:
+            box = parameters.box("bbox", required=True)
+            zoom = parameters.integer("zoom", required=True)
+        except ParameterError as exception:
+            return APIErrorResponse(
+                message=str(exception), status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if not 0 <= zoom <= 22:
+            return APIErrorResponse(
+                message="Zoom must be between 0 and 22",
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            clusters, shelters = get_shelter_clusters(box, zoom)
+        except BoxTooLargeError as exception:
+            return APIErrorResponse(
+                message=str(exception), status=status.HTTP_400_BAD_REQUEST
+            )
+
         return APISuccessResponse(
-            payload=([shelter.dict(point) for shelter in shelters] if shelters else [])
+            payload={
+                "zoom": zoom,
+                "clusters": [cluster.dict() for cluster in clusters],
+                "shelters": [shelter.dict() for shelter in shelters],
+            }
         )
 
 
-class GetShelterDetailsView(views.APIView):
-    """GET details for a shelter."""
+class GetSheltersInBoxView(views.APIView):
+    """GET shelters within a bounding box."""
 
     @extend_schema(
-        operation_id="get_shelter_details",
+        operation_id="get_shelters_in_box",
         tags=["arcgis"],
-        summary="Get details for a shelter",
-        description="Get details for a shelter",
+        summary="Get shelters within a bounding box",
+        description="Get shelters within a bounding box, sorted by id",
+        parameters=[
+            OpenApiParameter(
+                name="bbox",
+                description=(
+                    "The bounding box, as `minimum longitude,minimum latitude,"
+                    "maximum longitude,maximum latitude`"
+                ),
+                required=True,
+                type=str,
+            ),
+            OpenApiParameter(
+                name="offset",
+                description="The offset of the shelters to return",
+                default=0,
+                type=int,
+            ),
+            OpenApiParameter(
+                name="limit",
+                description="The number of shelters to return. Maximum is `1000`.",
+                default=100,
+                type=int,
+            ),
+            *_SHELTER_FIELDS_PARAMETERS,
+        ],
         responses={
             status.HTTP_200_OK: OpenApiResponse(
                 response=success_response_serializer(
-                    name="ShelterDetailsPayload",
+                    name="ShelterInBoxListPayload",
                     serializer=ShelterSerializer,
+                    many=True,
                 ),
-                description="Details for the shelter",
+                description="A list of shelters",
             ),
-            status.HTTP_404_NOT_FOUND: OpenApiResponse(
+            status.HTTP_400_BAD_REQUEST: OpenApiResponse(
                 response=ErrorWithMessageSerializer,
-                description="Shelter not found",
+                description="Invalid query parameters",
+            ),
+            status.HTTP_503_SERVICE_UNAVAILABLE: OpenApiResponse(
+                response=ErrorWithMessageSerializer,
+                description="Shelter dataset not loaded",
             ),
         },
         auth=[],
     )
-    def get(self, request: HttpRequest, id: int) -> APIResponse:
-        shelter = get_details_for_shelter(id)
+    def get(self, request: HttpRequest) -> APIResponse:
+        parameters = SearchParameters(request)
 
-        if shelter is None:
+        try:
+            box = parameters.box("bbox", required=True)
+            offset = parameters.integer("offset", default=0)
+            limit = parameters.integer("limit", default=100)
+            fields = ShelterFields.from_parameters(parameters, codes=get_category_codes)
+        except ParameterError as exception:
             return APIErrorResponse(
-                message="Shelter not found", status=status.HTTP_404_NOT_FOUND
+                message=str(exception), status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if offset < 0:
+            return APIErrorResponse(
+                message="Offset must not be negative",
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if not 1 <= limit <= 1000:
+            return APIErrorResponse(
+                message="Limit must be between 1 and 1000",
+                status=status.HTTP_400_BAD_REQUEST,
             )
 
-        return APISuccessResponse(payload=shelter.dict())
+        shelters = get_shelters_in_box(box, offset, limit)
+
+        return _shelters_response(
+            [fields.dict(shelter) for shelter in shelters], fields
+        )
+
+
+class GetSheltersInPolygonView(views.APIView):
+    """POST a GeoJSON polygon to get the shelters within it."""
+
+    @extend_schema(
+        operation_id="get_shelters_in_polygon",
+        tags=["arcgis"],
+        summary="Get shelters within a polygon",
+        description=(
+            "Get shelters within a GeoJSON `Polygon` or `MultiPolygon`, or a "
+            "`Feature` with one, sent as the request body. Sorted by id."
+        ),
+        request={"application/json": OpenApiTypes.OBJECT},
+        parameters=[
+            OpenApiParameter(
+                name="offset",
+                description="The offset of the shelters to return",
+                default=0,
+                type=int,
+            ),
+            OpenApiParameter(
+                name="limit",
+                description="The number of shelters to return. Maximum is `1000`.",
+                default=100,
+                type=int,
+            ),
+            *_SHELTER_FIELDS_PARAMETERS,
+        ],
+        responses={
+            status.HTTP_200_OK: OpenApiResponse(
+                response=success_response_serializer(
+                    name="ShelterInPolygonListPayload",
+                    serializer=ShelterSerializer,
+                    many=True,
+                ),
+                description="A list of shelters",
+            ),
+            status.HTTP_400_BAD_REQUEST: OpenApiResponse(
+                response=ErrorWithMessageSerializer,
+                description="Invalid query parameters or polygon",
+            ),
+            status.HTTP_503_SERVICE_UNAVAILABLE: OpenApiResponse(
+                response=ErrorWithMessageSerializer,
+                description="Shelter dataset not loaded",
+            ),
+        },
+        auth=[],
+    )
+    def post(self, request: HttpRequest) -> APIResponse:
+        parameters = SearchParameters(request, mapping=request.GET)
+
+        try:
+            offset = parameters.integer("offset", default=0)
+            limit = parameters.integer("limit", default=100)
+            fields = ShelterFields.from_parameters(parameters, codes=get_category_codes)
+        except ParameterError as exception:
+            return APIErrorResponse(
+                message=str(exception), status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if offset < 0:
+            return APIErrorResponse(
+                message="Offset must not be negative",
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if not 1 <= limit <= 1000:
+            return APIErrorResponse(
+                message="Limit must be between 1 and 1000",
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            polygon = prepare_polygon(request.data)
+        except ValueError as exception:
+            return APIErrorResponse(
+                message=str(exception), status=status.HTTP_400_BAD_REQUEST
+            )
+
+        shelters = get_shelters_in_polygon(polygon, offset, limit)
+
+        return _shelters_response(
+            [fields.dict(shelter) for shelter in shelters], fields
+        )
+
+
+class GetSheltersAlongRouteView(views.APIView):
+    """GET shelters along a route."""
+
+    @extend_schema(
+        operation_id="get_shelters_along_route",
+        tags=["arcgis"],
+        summary="Get shelters along a route",
+        description=(
+            "Get shelters within a given distance of a route, ordered by their "
+            "position along it"
+        ),
+        parameters=[
+            OpenApiParameter(
+                name="polyline",
+                description=(
+                    "The route as an encoded polyline, e.g. the `overview_polyline` "
+                    "of a Google Directions API route"
+                ),
+                required=True,
+                type=str,
+            ),
+            OpenApiParameter(
+                name="width",
+                description=(
+                    "How far from the route to search for shelters (in meters). "
+                    "Maximum is `10 * 1000`."
+                ),
+                default=1000,
+                type=int,
+            ),
+            OpenApiParameter(
+                name="offset",
+                description="The offset of the shelters to return",
+                default=0,
+                type=int,
+            ),
+            OpenApiParameter(
+                name="limit",
+                description="The number of shelters to return. Maximum is `1000`.",
+                default=100,
+                type=int,
+            ),
+            *_SHELTER_FIELDS_PARAMETERS,
+        ],
+        responses={
+            status.HTTP_200_OK: OpenApiResponse(
+                response=success_response_serializer(
+                    name="ShelterAlongRouteListPayload",
+                    serializer=ShelterSerializerWithRoutePosition,
+                    many=True,
+                ),
+                description=(
+                    "A list of shelters with their distance from the route and "
+                    "position along it (in meters)"
+                ),
+            ),
+            status.HTTP_400_BAD_REQUEST: OpenApiResponse(
+                response=ErrorWithMessageSerializer,
+                description="Invalid query parameters",
+            ),
+            status.HTTP_503_SERVICE_UNAVAILABLE: OpenApiResponse(
+                response=ErrorWithMessageSerializer,
+                description="Shelter dataset not loaded",
+            ),
+        },
+        auth=[],
+    )
+    def get(self, request: HttpRequest) -> APIResponse:
+        parameters = SearchParameters(request)
+
+        try:
+            polyline = parameters.string("polyline", required=True, strip=False)
+            width = parameters.integer("width", default=1000)
+            offset = parameters.integer("offset", default=0)
+            limit = parameters.integer("limit", default=100)
+            fields = ShelterFields.from_parameters(
+                parameters, extra=("distance", "position"), codes=get_category_codes
+            )
+        except ParameterError as exception:
+            return APIErrorResponse(
+                message=str(exception), status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if not 0 < width <= 10 * 1000:
+            return APIErrorResponse(
+                message="Width must be between 1m and 10km",
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if offset < 0:
+            return APIErrorResponse(
+                message="Offset must not be negative",
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if not 1 <= limit <= 1000:
+            return APIErrorResponse(
+                message="Limit must be between 1 and 1000",
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            route = decode_polyline(polyline)
+        except ValueError as exception:
+            return APIErrorResponse(
+                message=str(exception), status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if len(route) < 2:
+            return APIErrorResponse(
+                message="The polyline must have at least 2 points",
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        shelters = get_shelters_along_route(route, width, offset, limit)
+
+        return _shelters_response(
+            [
+                fields.dict(shelter, distance=distance, position=position)
+                for shelter, position, distance in shelters
+            ],
+            fields,
+        )
+
+
+class GetVoivodeshipAggregatesView(views.APIView):
+    """GET shelter rollups per voivodeship."""
+
+    @extend_schema(
+        operation_id="get_voivodeship_aggregates",
+        tags=["arcgis"],
+        summary="Get shelter rollups per voivodeship",
+        description=(
+            "Get the number of shelters, their total capacity and area and the "
+            "histogram of their quality for the whole country and every "
+            "voivodeship"
+        ),
+        responses={
+            status.HTTP_200_OK: OpenApiResponse(
+                response=success_response_serializer(
+                    name="VoivodeshipAggregatesPayload",
+                    serializer=AreaAggregatesSerializer,
+                ),
+                description="The rollups of the country and its voivodeships",
+            ),
+            status.HTTP_503_SERVICE_UNAVAILABLE: OpenApiResponse(
+                response=ErrorWithMessageSerializer,
+                description="Shelter dataset not loaded",
+            ),
+        },
+        auth=[],
+    )
+    def get(self, request: HttpRequest) -> APIResponse:
+        total, voivodeships = get_voivodeship_aggregates()
+
+        return APISuccessResponse(
+            payload={
+                "total": total.dict(),
+                "areas": [aggregate.dict() for aggregate in voivodeships],
+            }
+        )
+
+
+class GetProvinceAggregatesView(views.APIView):
+    """GET shelter rollups per province."""
+
+    @extend_schema(
+        operation_id="get_province_aggregates",
+        tags=["arcgis"],
+        summary="Get shelter rollups per province",
+        description=(
+            "Get the number of shelters, their total capacity and area and the "
+            "histogram of their quality for every province (powiat), optionally "
+            "of one voivodeship"
+        ),
+        parameters=[
+            OpenApiParameter(
+                name="voivodeship",
+                description="The voivodeship to get the provinces of",
+                type=str,
+            ),
+        ],
+        responses={
+            status.HTTP_200_OK: OpenApiResponse(
+                response=success_response_serializer(
+                    name="ProvinceAggregatesPayload",
+                    serializer=AreaAggregatesSerializer,
+                ),
+                description=(
+                    "The rollups of the voivodeship, or the country, and its "
+                    "provinces"
+                ),
+            ),
+            status.HTTP_400_BAD_REQUEST: OpenApiResponse(
+                response=ErrorWithMessageSerializer,
+                description="Invalid query parameters",
+            ),
+            status.HTTP_404_NOT_FOUND: OpenApiResponse(
+                response=ErrorWithMessageSerializer,
+                description="Voivodeship not found",
+            ),
+            status.HTTP_503_SERVICE_UNAVAILABLE: OpenApiResponse(
+                response=ErrorWithMessageSerializer,
+                description="Shelter dataset not loaded",
+            ),
+        },
+        auth=[],
+    )
+    def get(self, request: HttpRequest) -> APIResponse:
+        parameters = SearchParameters(request)
+
+        try:
+            voivodeship = parameters.string("voivodeship")
+        except ParameterError as exception:
+            return APIErrorResponse(
+                message=str(exception), status=status.HTTP_400_BAD_REQUEST
+            )
+
+        total, provinces = get_province_aggregates(voivodeship)
+
+        if total is None:
+            return APIErrorResponse(
+                message="Voivodeship not found", status=status.HTTP_404_NOT_FOUND
+            )
+
+        return APISuccessResponse(
+            payload={
+                "total": total.dict(),
+                "areas": [aggregate.dict() for aggregate in provinces],
+            }
+        )
+
+
+class ExportSheltersView(views.APIView):
+    """GET a streamed export of the shelters."""
+
+    # The response is streamed rather than rendered, so any `Accept` header
+    # is fine.
+    content_negotiation_class = _AnyContentNegotiation
+
+    @extend_schema(
+        operation_id="export_shelters",
+        tags=["arcgis"],
+        summary="Export shelters",
+        description=(
+            "Export all shelters, or those of a region or bounding box, as "
+            "newline delimited JSON or a GeoJSON `FeatureCollection`. The "
+            "export is streamed as the shelters are read from the dataset."
+        ),
+        parameters=[
+            OpenApiParameter(
+                name="output",
+                description="The format of the export",
+                enum=list(EXPORT_FORMATS),
+                default="ndjson",
+                type=str,
+            ),
+            OpenApiParameter(
+                name="voivodeship",
+                description="The voivodeship to export",
+                type=str,
+            ),
+            OpenApiParameter(
+                name="province",
+                description="The province (powiat) to export",
+                type=str,
+            ),
+            OpenApiParameter(
+                name="bbox",
+                description=(
+                    "The bounding box to export, as `minimum longitude,minimum "
+                    "latitude,maximum longitude,maximum latitude`"
+                ),
+                type=str,
+            ),
+        ],
+        responses={
+            (status.HTTP_200_OK, "application/x-ndjson"): OpenApiResponse(
+                response=ShelterSerializer,
+                description="One shelter per line",
+            ),
+            (status.HTTP_200_OK, "application/geo+json"): OpenApiResponse(
+                response=OpenApiTypes.OBJECT,
+                description="A GeoJSON `FeatureCollection` of the shelters",
+            ),
+            status.HTTP_400_BAD_REQUEST: OpenApiResponse(
+                response=ErrorWithMessageSerializer,
+                description="Invalid query parameters",
+            ),
+            status.HTTP_503_SERVICE_UNAVAILABLE: OpenApiResponse(
+                response=ErrorWithMessageSerializer,
+                description="Shelter dataset not loaded",
+            ),
+        },
+        auth=[],
+    )
+    def get(self, request: HttpRequest) -> HttpResponse:
+        parameters = SearchParameters(request)
+
+        try:
+            output = parameters.string("output", default="ndjson")
+            voivodeship = parameters.string("voivodeship")
+            province = parameters.string("province")
+            box = parameters.box("bbox")
+        except ParameterError as exception:
+            return APIErrorResponse(
+                message=str(exception), status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if output not in EXPORT_FORMATS:
+            return APIErrorResponse(
+                message=f"Output must be one of {', '.join(EXPORT_FORMATS)}",
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        content_type, extension, encode = EXPORT_FORMATS[output]
+        shelters = export_shelters(box, voivodeship, province)
+
+        response = StreamingHttpResponse(encode(shelters), content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="shelters.{extension}"'
+
+        return response
+
+
+class GetShelterPacksView(views.APIView):
+    """GET the index of the offline shelter packs."""
+
+    @extend_schema(
+        operation_id="get_shelter_packs",
+        tags=["arcgis"],
+        summary="Get the index of the offline shelter packs",
+        description=(
+            "Get the dataset version and the size and ETag of the offline pack "
+            "of every voivodeship"
+        ),
+        responses={
+            status.HTTP_200_OK: OpenApiResponse(
+                response=success_response_serializer(
+                    name="ShelterPacksPayload",
+                    serializer=ShelterPacksSerializer,
+                ),
+                description="The index of the packs",
+            ),
+            status.HTTP_503_SERVICE_UNAVAILABLE: OpenApiResponse(
+                response=ErrorWithMessageSerializer,
+                description="Shelter dataset not loaded",
+            ),
+        },
+        auth=[],
+    )
+    def get(self, request: HttpRequest) -> APIResponse:
+        version, packs = get_shelter_packs()
+
+        return APISuccessResponse(
+            payload={
+                "version": version,
+                "packs": [
+                    {
+                        "voivodeship": pack.voivodeship,
+                        "count": pack.count,
+                        "size": pack.size,
+                        "etag": pack.etag,
+                    }
+                    for pack in packs
+                ],
+            }
+        )
+
+
+class GetShelterPackView(views.APIView):
+    """GET the offline shelter pack of a voivodeship."""
+
+    @extend_schema(
+        operation_id="get_shelter_pack",
+        tags=["arcgis"],
+        summary="Get the offline shelter pack of a voivodeship",
+        description=(
+            "Get all shelters of a voivodeship as a columnar JSON document, "
+            "compressed with brotli or gzip if the client accepts it. With `since`, only the shelters "
+            "added, updated or removed since that dataset version are returned, "
+            "unless the version is too old, in which case `base` is `null` and "
+            "the pack replaces the client's copy. Supports `If-None-Match` with "
+            "the strong `ETag` of the pack."
+        ),
+        parameters=[
+            OpenApiParameter(
+                name="since",
+                description="The dataset version of the client's copy of the pack",
+                type=str,
+            ),
+        ],
+        responses={
+            (status.HTTP_200_OK, "application/json"): OpenApiResponse(
+                response=OpenApiTypes.OBJECT,
+                description="The pack",
+            ),
+            status.HTTP_304_NOT_MODIFIED: OpenApiResponse(
+                description="The client's copy of the pack is current",
+            ),
+            status.HTTP_400_BAD_REQUEST: OpenApiResponse(
+                response=ErrorWithMessageSerializer,
+                description="Invalid query parameters",
+            ),
+            status.HTTP_404_NOT_FOUND: OpenApiResponse(
+                response=ErrorWithMessageSerializer,
+                description="Voivodeship not found",
+            ),
+            status.HTTP_503_SERVICE_UNAVAILABLE: OpenApiResponse(
+                response=ErrorWithMessageSerializer,
+                description="Shelter dataset not loaded",
+            ),
+        },
+        auth=[],
+    )
+    def get(self, request: HttpRequest, voivodeship: str) -> HttpResponse:
+        parameters = SearchParameters(request)
+
+        try:
+            since = parameters.string("since")
+        except ParameterError as exception:
+            return APIErrorResponse(
+                message=str(exception), status=status.HTTP_400_BAD_REQUEST
+            )
+
+        pack = get_shelter_pack(voivodeship, since)
+
+        if pack is None:
+            return APIErrorResponse(
+                message="Voivodeship not found", status=status.HTTP_404_NOT_FOUND
+            )
+
+        return _pack_response(request, pack)
+
+
+class GetCategoryCodesView(views.APIView):
+    """GET the codes of the categorical shelter fields."""
+
+    @extend_schema(
+        operation_id="get_category_codes",
+        tags=["arcgis"],
+        summary="Get the codes of the categorical shelter fields",
+        description=(
+            "Get the values of the categorical shelter fields, whose indices are "
+            "the codes returned with `codes=true`. The codes change with the "
+            "dataset version, given by the `Shelter-Codes-Version` header of "
+            "responses with codes. Supports `If-None-Match`."
+        ),
+        responses={
+            status.HTTP_200_OK: OpenApiResponse(
+                response=success_response_serializer(
+                    name="CategoryCodesPayload",
+                    serializer=CategoryCodesSerializer,
+                ),
+                description="The values of the categorical fields",
+            ),
+            status.HTTP_304_NOT_MODIFIED: OpenApiResponse(
+                description="The client's copy of the codes is current",
+            ),
+            status.HTTP_503_SERVICE_UNAVAILABLE: OpenApiResponse(
+                response=ErrorWithMessageSerializer,
+                description="Shelter dataset not loaded",
+            ),
+        },
+        auth=[],
+    )
+    def get(self, request: HttpRequest) -> HttpResponse:
+        codes = get_category_codes()
+        etag = f'"{codes.version}"'
+
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            response = HttpResponseNotModified()
+        else:
+            response = APISuccessResponse(
+                payload={"version": codes.version, "fields": codes.values}
+            )
+
+        response["ETag"] = etag
+        response["Cache-Control"] = "public, no-cache"
+
+        return response
+
+
+class GetShelterDetailsView(views.APIView):
+    """GET details for a shelter."""
+
+    @extend_schema(
+        operation_id="get_shelter_details",
+        tags=["arcgis"],
+        summary="Get details for a shelter",
+        description="Get details for a shelter",
+        parameters=_SHELTER_FIELDS_PARAMETERS,
+        responses={
+            status.HTTP_200_OK: OpenApiResponse(
+                response=success_response_serializer(
+                    name="ShelterDetailsPayload",
+                    serializer=ShelterSerializer,
+                ),
+                description="Details for the shelter",
+            ),
+            status.HTTP_400_BAD_REQUEST: OpenApiResponse(
+                response=ErrorWithMessageSerializer,
+                description="Invalid query parameters",
+            ),
+            status.HTTP_404_NOT_FOUND: OpenApiResponse(
+                response=ErrorWithMessageSerializer,
+                description="Shelter not found",
+            ),
+            status.HTTP_503_SERVICE_UNAVAILABLE: OpenApiResponse(
+                response=ErrorWithMessageSerializer,
+                description="Upstream service temporarily unavailable",
+            ),
+        },
+        auth=[],
+    )
+    @cache_compressed(_shelters_cache_key, _SHELTERS_RESPONSE_TIMEOUT)
+    def get(self, request: HttpRequest, id: int) -> APIResponse:
+        parameters = SearchParameters(request)
+
+        try:
+            fields = ShelterFields.from_parameters(parameters, codes=get_category_codes)
+        except ParameterError as exception:
+            return APIErrorResponse(
+                message=str(exception), status=status.HTTP_400_BAD_REQUEST
+            )
+
+        shelter = get_details_for_shelter(id)
+
+        if shelter is None:
+            return APIErrorResponse(
+                message="Shelter not found", status=status.HTTP_404_NOT_FOUND
+            )
+
+        return _shelters_response(fields.dict(shelter), fields)
+
+
+def _pack_response(request: HttpRequest, pack: Pack) -> HttpResponse:
+    """Respond with a pack, or with `304 Not Modified` if the client has it."""
+    return compressed_response(
+        request, pack.compressed, cache_control="public, no-cache"
+    )
+
+
+def _shelters_response(
+    payload: dict[str, typing.Any] | list[dict[str, typing.Any]],
+    fields: ShelterFields,
+) -> APIResponse:
+    """Respond with serialized shelters, with the version of their codes."""
+    response = APISuccessResponse(payload=payload)
+
+    if fields.codes is not None:
+        response["Shelter-Codes-Version"] = fields.codes.version
+
+    return response
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import collections
+import concurrent.futures
+import csv
+import logging
+import re
+import typing
+import urllib.parse
+
+from django.conf import settings
+
+from supercivilian.core.dataclasses import Point
+
+from .aggregates import get_shelter_aggregates
+from .clusters import get_cluster_hierarchy
+from .constants import HOT_POINTS
+from .packs import get_pack_store
+from .utilities import get_shelters_for_point, load_shelter_dataset
+
+logger = logging.getLogger(__name__)
+
+_SHELTERS_REQUEST = re.compile(r"/arcgis/shelters\?(\S+)")
+
+
+def hot_points_from_file(path: str) -> list[Point]:
+    """Read hot points from a CSV file with `longitude` and `latitude` columns.
+
+    Args:
+        path: The path of the file.
+
+    Returns:
+        A list of points.
+    """
+    with open(path, encoding="utf-8-sig", newline="") as file:
+        return [
+            Point(longitude=float(row["longitude"]), latitude=float(row["latitude"]))
+            for row in csv.DictReader(file)
+        ]
+
+
+def hot_points_from_access_log(path: str, top: int = 100) -> list[Point]:
+    """Find the most requested points of `/arcgis/shelters` in an access log.
+
+    Any log format with the request path and query string on the line works,
+    e.g. the gunicorn or nginx default formats.
+
+    Args:
+        path: The path of the access log.
+        top: The number of points to return. Defaults to 100.
+
+    Returns:
+        A list of points, the most requested first.
+    """
+    counter: collections.Counter[tuple[float, float]] = collections.Counter()
+
+    with open(path, encoding="utf-8", errors="replace") as file:
+        for line in file:
+            if (match := _SHELTERS_REQUEST.search(line)) is None:
+                continue
+
+            query = urllib.parse.parse_qs(match.group(1).rstrip('"'))
+
+            try:
+                longitude = float(query["longitude"][0])
+                latitude = float(query["latitude"][0])
+            except (KeyError, ValueError):
+                continue
+
+            counter[(longitude, latitude)] += 1
+
+    return [
+        Point(longitude=longitude, latitude=latitude)
+        for (longitude, latitude), _ in counter.most_common(top)
+    ]
+
+
+def warm_up(
+    points: typing.Sequence[Point],
+    range_: float = 30 * 1000,
+    load_dataset: bool = True,
+    workers: int = 8,
+    progress: typing.Callable[[int, int, Point, Exception | None], None] | None = None,
+) -> int:
+    """Load the shelter dataset, build its clusters, rollups and offline packs
+    and fill the shelter cache for hot points.
+
+    Args:
+        points: The points to fill the cache for.
+        range_: The range in meters to search around the points. Defaults to
+            the default range of `/arcgis/shelters`.
+        load_dataset: Whether to load the shelter dataset first. Defaults to
+            `True`.
+        workers: The number of points warmed up in parallel. Defaults to 8.
+        progress: If provided, called after every point with the number of
+            points done, the total number of points, the point and the
+            exception raised for it, if any.
+
+    Returns:
+        The number of points that failed to warm up.
+    """
+    if load_dataset:
+        dataset = load_shelter_dataset()
+        get_cluster_hierarchy(dataset)
+        get_shelter_aggregates(dataset)
+        get_pack_store().packs(dataset)
+
+    failures = 0
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(get_shelters_for_point, point, range_, 0, 0): point
+            for point in points
+        }
+
+        for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+            error = future.exception()
+
+            if error is not None:
+                failures += 1
+
+            if progress is not None:
+                progress(done, len(futures), futures[future], error)
+
+    return failures
+
+
+def warm_up_on_startup() -> None:
+    """Warm up this process if enabled by the `ARCGIS_WARMUP` setting.
+
+    Meant to be called when the WSGI application is loaded, so workers only
+    start serving once they are warm. Errors are logged, never raised.
+    """
+    options = settings.ARCGIS_WARMUP
+
+    if not options.get("on_startup", False):
+        return
+
+    points = [
+        Point(longitude=longitude, latitude=latitude)
+        for longitude, latitude in options.get("points") or HOT_POINTS
+    ]
+
+    try:
+        failures = warm_up(
+            points,
+            range_=options.get("range", 30 * 1000),
+            load_dataset=options.get("load_dataset", True),
+            workers=options.get("workers", 8),
+        )
+    except Exception:
+        logger.exception("Warming up failed")
+        return
+
+    logger.info("Warmed up %d points, %d failed", len(points), failures)
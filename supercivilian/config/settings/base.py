@@ -26,10 +26,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "supercivilian.core.middleware.MetricsMiddleware",
+    "supercivilian.core.middleware.TracingMiddleware",
+    "supercivilian.core.middleware.TimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "supercivilian.core.middleware.CompressionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "supercivilian.core.middleware.StaleResponseMiddleware",
 ]
 
 ROOT_URLCONF = "supercivilian.config.urls"
@@ -98,6 +103,7 @@ SESSION_COOKIE_AGE = 12 * 60 * 60
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_RENDERER_CLASSES": ("rest_framework.renderers.JSONRenderer",),
+    "EXCEPTION_HANDLER": "supercivilian.core.exceptions.exception_handler",
 }
 
 SPECTACULAR_SETTINGS = {
@@ -109,3 +115,197 @@ SPECTACULAR_SETTINGS = {
         "hideDownloadButton": True,  # Hide the download button
     },
 }
+
+# Upstream settings
+# See `supercivilian.core.upstream.Upstream`, `CircuitBreaker`, `Hedger` and
+# `ConcurrencyLimiter` for the options. Concurrency limits are per process.
+
+UPSTREAMS = {
+    "arcgis": {
+        "timeout": (3.05, 10),
+        "stale_timeout": 24 * 60 * 60,
+        "circuit_breaker": {"slow_call_duration": 5},
+        "hedging": {"percentile": 0.95, "budget": 0.1},
+        "concurrency": {"latency_target": 3},
+    },
+    "places": {
+        "timeout": (3.05, 5),
+        "stale_timeout": 24 * 60 * 60,
+        "hedging": {"percentile": 0.95, "budget": 0.05},
+        "concurrency": {},
+    },
+    "geocoding": {
+        "timeout": (3.05, 5),
+        "stale_timeout": 24 * 60 * 60,
+        "concurrency": {},
+    },
+    "photos": {
+        "timeout": (3.05, 10),
+        "circuit_breaker": {"slow_call_duration": 5},
+        "concurrency": {"latency_target": 3},
+    },
+}
+
+# Metrics settings
+# With a `multiprocess_dir`, every worker writes its metrics to the directory
+# every `interval` seconds and `/metrics` aggregates the metrics of all
+# workers. Clear the directory before starting the server, e.g. in gunicorn's
+# `on_starting` hook. `/metrics` is only served with `endpoint`, and with a
+# `token`, only to requests with it as a bearer token, e.g. from Prometheus.
+# See `supercivilian.core.metrics.Registry`.
+
+METRICS = {
+    "multiprocess_dir": environment("METRICS_MULTIPROCESS_DIR", default=None),
+    "interval": 5,
+    "endpoint": environment.bool("METRICS_ENDPOINT", default=True),
+    "token": environment("METRICS_TOKEN", default=None),
+}
+
+# Tracing settings
+# Every request is traced and a `sample_rate` share of traces, or the traces
+# continuing a sampled remote trace, are exported to the `exporters`: classes
+# of `supercivilian.core.tracing.Exporter` with their keyword arguments. With
+# `TRACING_FILE`, spans are written to the file (`-` for standard output,
+# `{pid}` for a file per worker) in the OTLP/JSON format of OpenTelemetry, or
+# as a JSON line per span with `TRACING_FORMAT="json"`.
+
+TRACING = {
+    "exporters": (
+        [
+            {
+                "class": "supercivilian.core.tracing.FileExporter",
+                "path": environment("TRACING_FILE"),
+                "format": environment("TRACING_FORMAT", default="otlp"),
+            }
+        ]
+        if environment("TRACING_FILE", default=None)
+        else []
+    ),
+    "sample_rate": environment.float("TRACING_SAMPLE_RATE", default=1.0),
+}
+
+# Logging settings
+# Logs of the app have the IDs of the trace and the span they were logged in.
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "filters": {"trace": {"()": "supercivilian.core.tracing.TraceFilter"}},
+    "formatters": {
+        "trace": {
+            "format": "%(asctime)s %(levelname)s %(name)s "
+            "[trace_id=%(trace_id)s span_id=%(span_id)s] %(message)s"
+        }
+    },
+    "handlers": {
+        "console": {
+            "class": "logging.StreamHandler",
+            "filters": ["trace"],
+            "formatter": "trace",
+        }
+    },
+    "loggers": {
+        "supercivilian": {
+            "handlers": ["console"],
+            "level": environment("LOG_LEVEL", default="INFO"),
+        }
+    },
+}
+
+# Timing settings
+# With `SERVER_TIMING`, responses have a `Server-Timing` header with the
+# durations of the stages of the request, e.g. cache lookups and upstream
+# calls. With a profiling `directory`, a `rate` share of requests is profiled
+# and the profiles of requests slower than `threshold` seconds are dumped to
+# the directory. Requests with the `header` set to the `token` are always
+# profiled and dumped. See `supercivilian.core.timing`.
+
+SERVER_TIMING = environment.bool("SERVER_TIMING", default=True)
+
+PROFILING = {
+    "directory": environment("PROFILING_DIR", default=None),
+    "rate": environment.float("PROFILING_RATE", default=0.0),
+    "threshold": 1.0,
+    "header": "X-Profile",
+    "token": environment("PROFILING_TOKEN", default=None),
+}
+
+# Compression settings
+# Cached responses are compressed once, with the slow `brotli_quality` and
+# `gzip_level`, unless their keys rarely repeat, e.g. shelters around a point.
+# Other responses of at least `min_size` bytes are compressed on
+# every request, with the fast `streaming_*` settings.
+
+COMPRESSION = {
+    "brotli_quality": 9,
+    "gzip_level": 9,
+    "streaming_brotli_quality": 4,
+    "streaming_gzip_level": 6,
+    "min_size": 512,
+}
+
+# ArcGIS settings
+# `ARCGIS_DATASET_PATH` is the shelter dataset snapshot opened by every worker,
+# see `python manage.py build_shelter_snapshot`. Workers check the snapshot for
+# a new version every `ARCGIS_DATASET_RELOAD_INTERVAL` seconds and swap it in
+# without a restart, see `python manage.py sync_shelters`. Without a snapshot,
+# the dataset is read from the CSV or JSON dump of the shelter layer at
+# `ARCGIS_DATASET_SOURCE`, see `supercivilian.arcgis.ingest`. Reading a dump is
+# slow, so load it at startup with `ARCGIS_WARMUP_ON_STARTUP`; otherwise it is
+# read in the background after the first request. In offline mode
+# (`ARCGIS_OFFLINE`), shelters are only served from the dataset and the ArcGIS
+# API is never called.
+# See `supercivilian.arcgis.nearest.NearestGrid.build` for the options of the
+# nearest shelter grid built into snapshots, or set it to `None` not to build it.
+# See `supercivilian.arcgis.sync.FeatureServerSource` for the sync options.
+# `edit_field` is the edit date field of the layer, if it tracks edits; without
+# it, only added and removed shelters are picked up.
+# See `supercivilian.arcgis.packs.PackStore` for the offline pack options. With
+# a `path`, the packs are shared by the workers and kept across restarts.
+# `ARCGIS_SHELTER_API_URL` overrides the URL of the shelter layer query, e.g.
+# with a local stand-in for load tests (see `loadtest`).
+# See `supercivilian.arcgis.warmup.warm_up` for the warmup options. `points` is a
+# list of `(longitude, latitude)` tuples and defaults to the largest cities.
+
+ARCGIS_DATASET_PATH = environment("ARCGIS_DATASET_PATH", default=None)
+ARCGIS_DATASET_SOURCE = environment("ARCGIS_DATASET_SOURCE", default=None)
+ARCGIS_DATASET_RELOAD_INTERVAL = 60
+ARCGIS_OFFLINE = environment.bool("ARCGIS_OFFLINE", default=False)
+ARCGIS_SHELTER_API_URL = environment("ARCGIS_SHELTER_API_URL", default=None)
+
+ARCGIS_NEAREST_GRID = {
+    "cell_size": 0.05,
+    "k": 5,
+    "max_candidates": 16,
+    "max_depth": 6,
+}
+
+# With `ARCGIS_BATCHING`, concurrent shelter searches of a worker are resolved
+# together, waiting up to `window` seconds for each other, see
+# `supercivilian.arcgis.batching.ShelterBatcher`.
+
+ARCGIS_BATCHING = {
+    "enabled": environment.bool("ARCGIS_BATCHING", default=False),
+    "window": 0.002,
+    "max_size": 32,
+}
+
+ARCGIS_SYNC = {
+    "edit_field": environment("ARCGIS_SYNC_EDIT_FIELD", default=None),
+    "page_size": 2000,
+    "workers": 4,
+}
+
+ARCGIS_PACKS = {
+    "path": environment("ARCGIS_PACKS_PATH", default=None),
+    "history": 8,
+    "max_deltas": 256,
+}
+
+ARCGIS_WARMUP = {
+    "on_startup": environment.bool("ARCGIS_WARMUP_ON_STARTUP", default=False),
+    "load_dataset": True,
+    "points": None,
+    "range": 30 * 1000,
+    "workers": 8,
+}
@@ -1,3 +1,19 @@
 from ..environment import environment
 
 MAPS_PLATFORM_API_KEY = environment("MAPS_PLATFORM_API_KEY")
+# Overrides the base URL of the Maps Platform APIs, e.g. with a local stand-in
+# for load tests (see `loadtest`).
+MAPS_PLATFORM_API_URL = environment("MAPS_PLATFORM_API_URL", default=None)
+
+# Quota budgets of the Google Maps Platform endpoints.
+# See `supercivilian.google.quota.QuotaBudget` for the options. Set `shared` to
+# share the budgets between workers through the cache.
+GOOGLE_QUOTA = {
+    "shared": False,
+    "endpoints": {
+        "autocomplete": {"rate": 10, "burst": 20},
+        "details": {"rate": 10, "burst": 20},
+        "photos": {"rate": 5, "burst": 10},
+        "geocode": {"rate": 10, "burst": 20},
+    },
+}
@@ -6,14 +6,49 @@ SECRET_KEY = environment("SECRET_KEY")
 ALLOWED_HOSTS = environment("ALLOWED_HOSTS").split(",")
 
 # Caching settings
+# Every worker has its own cache of up to `CACHE_MAX_BYTES` bytes. `families`
+# are the quotas of the key families, as shares of the cache: shelter lists
+# per point, shelter details, precompressed responses (shelter pages and
+# place details) and stale upstream responses (shelter queries, place
+# predictions and details, and geocodes). The quotas add up to the whole
+# cache, so no family can be squeezed out by the others. See
+# `supercivilian.core.cache.MemoryCache`.
 
 CACHES = {
     "default": {
-        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "BACKEND": "supercivilian.core.cache.MemoryCache",
         "LOCATION": "supercivilian",
+        "OPTIONS": {
+            "max_bytes": environment.int("CACHE_MAX_BYTES", default=256 * 1024 * 1024),
+            "families": {
+                "shelters": 0.3,
+                "shelter": 0.05,
+                "response": 0.3,
+                "response:places": 0.1,
+                "stale:arcgis": 0.1,
+                "stale:places": 0.1,
+                "stale:geocoding": 0.05,
+            },
+        },
     }
 }
 
+# Metrics settings
+# `/metrics` tells anyone the traffic of the endpoints, upstream errors and
+# the quota spend, so it is off unless `METRICS_ENDPOINT` is set. Protect it
+# with `METRICS_TOKEN` when turning it on.
+
+METRICS = {
+    **METRICS,  # noqa: F405
+    "endpoint": environment.bool("METRICS_ENDPOINT", default=False),
+}
+
+# Timing settings
+# The `Server-Timing` header tells clients how requests are handled, e.g. which
+# were answered from the cache, so it is off unless `SERVER_TIMING` is set.
+
+SERVER_TIMING = environment.bool("SERVER_TIMING", default=False)
+
 # Security settings
 
 SECURE_PROXY_SSL_HEADER = ("HTTP_X_FORWARDED_PROTO", "https")
@@ -1,11 +1,14 @@
 from django.urls import include, path
 from drf_spectacular.views import SpectacularRedocView, SpectacularAPIView
 
+from supercivilian.core.views import MetricsView
+
 # fmt: off
 urlpatterns = [
     path("google/", include("supercivilian.google.urls")),
     path("arcgis/", include("supercivilian.arcgis.urls")),
     path("schema/", SpectacularAPIView.as_view(), name="schema"),
+    path("metrics", MetricsView.as_view(), name="metrics"),
     path(
         "",
         SpectacularRedocView.as_view(),
@@ -5,3 +5,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "supercivilian.config.settings")
 
 application = get_wsgi_application()
+
+from supercivilian.arcgis.warmup import warm_up_on_startup  # noqa: E402
+
+warm_up_on_startup()
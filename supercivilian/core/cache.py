@@ -0,0 +1,586 @@
+from __future__ import annotations
+
+import collections
+import dataclasses
+import functools
+import pickle
+import sys
+import threading
+import time
+import typing
+
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from . import tracing
+from .metrics import Counter, Gauge
+from .timing import span
+
+CACHE_REQUESTS = Counter(
+    "supercivilian_cache_requests_total",
+    "Number of cache lookups by key family and result",
+)
+
+_MISSING = object()
+
+
+def key_family(key: str) -> str:
+    """Get the family of a cache key, its prefix before the first colon.
+
+    Args:
+        key: The cache key, e.g. `shelters:...`.
+
+    Returns:
+        The family, e.g. `shelters`.
+    """
+    return key.partition(":")[0]
+
+
+def lookup(key: str, default: typing.Any = None) -> typing.Any:
+    """Get a value from the cache, counting the hit or miss.
+
+    Args:
+        key: The cache key.
+        default: The value to return on a miss. Defaults to `None`.
+
+    Returns:
+        The cached value, or `default` on a miss.
+    """
+    family = key_family(key)
+
+    with span("cache"), tracing.span("cache.get", family=family) as current:
+        value = cache.get(key, _MISSING)
+        hit = value is not _MISSING
+        current.set_attribute("hit", hit)
+
+    CACHE_REQUESTS.inc(family=family, result="hit" if hit else "miss")
+
+    return value if hit else default
+
+
+def store(key: str, value: typing.Any, timeout: float | None) -> None:
+    """Set a value in the cache, tracing the call.
+
+    Args:
+        key: The cache key.
+        value: The value.
+        timeout: How long to keep the value, in seconds, or `None` to keep it
+            forever.
+    """
+    with tracing.span("cache.set", family=key_family(key)):
+        cache.set(key, value, timeout=timeout)
+
+
+MEMORY_CACHE_BYTES = Gauge(
+    "supercivilian_memory_cache_bytes",
+    "Estimated size of the values in the in-process cache by key family",
+    multiprocess_mode="sum",
+)
+MEMORY_CACHE_EVICTIONS = Counter(
+    "supercivilian_memory_cache_evictions_total",
+    "Number of values evicted from the in-process cache by key family and reason",
+)
+MEMORY_CACHE_REJECTIONS = Counter(
+    "supercivilian_memory_cache_rejections_total",
+    "Number of values not admitted to the in-process cache by key family",
+)
+
+# The per-process stores of `MemoryCache`, by cache name, as Django creates a
+# cache backend per thread.
+_stores: dict[str, _Store] = {}
+_stores_lock = threading.Lock()
+# Maps every byte to half its value, to age the counters of a sketch.
+_HALVE = bytes(value >> 1 for value in range(256))
+# Spreads the bits of a hash over the slices that index the rows of a sketch.
+_SKETCH_MULTIPLIER = 0x9E3779B97F4A7C15
+
+
+class MemoryCache(BaseCache):
+    """An in-process cache bounded by the size of its values.
+
+    Unlike `LocMemCache`, which holds 300 entries, culls them at random and
+    pickles every value, the cache:
+
+    - Accounts for the estimated size of its values, up to `max_bytes`.
+    - Gives every key family (see `key_family`, or a longer prefix such as
+      `stale:places`) listed in `families` a quota, as a share of
+      `max_bytes`, so a few large shelter lists can't evict everything else.
+    - Evicts the least recently used values of a family over its quota, or of
+      the largest family when the cache is full.
+    - Only admits a new value that needs evictions if its key is requested
+      more often than the value it would evict, as estimated by a frequency
+      sketch (TinyLFU), so one-off keys don't flush popular ones. Values
+      stored with `add` or `incr`, e.g. counters, are always admitted.
+    - Stores immutable values (strings, bytes, numbers and tuples and frozen
+      dataclasses of them, e.g. `CompressedBody`) as they are, so they are
+      shared rather than unpickled on every hit. Other values are pickled.
+    - Keeps hit, miss, eviction and rejection statistics per family, see
+      `stats`.
+
+    Every process has its own cache, shared by its threads.
+
+    Options:
+        max_bytes: The total size of the values. Defaults to 256 MiB.
+        families: The quotas of key families, as shares of `max_bytes`.
+            Families without a quota are only bounded by `max_bytes`.
+        admission: Whether to use TinyLFU admission. Defaults to `True`.
+        sketch_width: The number of counters per row of the frequency sketch,
+            a power of two. Defaults to 65536.
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, name: str, params: dict[str, typing.Any]) -> None:
+        super().__init__(params)
+
+        options = params.get("OPTIONS", {})
+
+        with _stores_lock:
+            if name not in _stores:
+                _stores[name] = _Store(
+                    max_bytes=options.get("max_bytes", 256 * 1024 * 1024),
+                    families=options.get("families", {}),
+                    admission=options.get("admission", True),
+                    sketch_width=options.get("sketch_width", 65536),
+                )
+
+            self._store = _stores[name]
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None) -> bool:
+        family = self._store.family(key)
+        key = self.make_and_validate_key(key, version=version)
+        entry = self._entry(family, value, timeout)
+
+        with self._store.lock:
+            if self._store.live(family, key) is not None:
+                return False
+
+            return self._store.insert(key, entry, admit=False)
+
+    def get(self, key, default=None, version=None) -> typing.Any:
+        family = self._store.family(key)
+        key = self.make_and_validate_key(key, version=version)
+
+        with self._store.lock:
+            entry = self._store.live(family, key, count=True)
+
+        if entry is None:
+            return default
+
+        return pickle.loads(entry.value) if entry.pickled else entry.value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None) -> None:
+        family = self._store.family(key)
+        key = self.make_and_validate_key(key, version=version)
+        entry = self._entry(family, value, timeout)
+
+        with self._store.lock:
+            self._store.insert(key, entry)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None) -> bool:
+        family = self._store.family(key)
+        key = self.make_and_validate_key(key, version=version)
+
+        with self._store.lock:
+            if (entry := self._store.live(family, key)) is None:
+                return False
+
+            entry.expires = self.get_backend_timeout(timeout)
+
+            return True
+
+    def incr(self, key, delta=1, version=None) -> int:
+        family = self._store.family(key)
+        key = self.make_and_validate_key(key, version=version)
+
+        with self._store.lock:
+            if (entry := self._store.live(family, key)) is None:
+                raise ValueError(f"Key '{key}' not found.")
+
+            value = pickle.loads(entry.value) if entry.pickled else entry.value
+            value += delta
+            if (size := _immutable_size(value)) is not None:
+                updated = _Entry(family, value, size, entry.expires)
+            else:
+                updated = self._pickled(family, value, entry.expires)
+
+            self._store.insert(key, updated, admit=False)
+
+        return value
+
+    def delete(self, key, version=None) -> bool:
+        family = self._store.family(key)
+        key = self.make_and_validate_key(key, version=version)
+
+        with self._store.lock:
+            return self._store.remove(family, key) is not None
+
+    def has_key(self, key, version=None) -> bool:
+        family = self._store.family(key)
+        key = self.make_and_validate_key(key, version=version)
+
+        with self._store.lock:
+            return self._store.live(family, key) is not None
+
+    def clear(self) -> None:
+        with self._store.lock:
+            self._store.clear()
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """Get the statistics of the cache.
+
+        Returns:
+            The `hits`, `misses`, `sets`, `evictions`, `expirations`,
+            `rejections`, `entries`, `bytes` and `quota` (`None` without one)
+            of every family seen so far.
+        """
+        with self._store.lock:
+            return {
+                family: {
+                    **segment.stats,
+                    "entries": len(segment.entries),
+                    "bytes": segment.bytes,
+                    "quota": segment.quota,
+                }
+                for family, segment in self._store.segments.items()
+            }
+
+    def _entry(self, family: str, value: typing.Any, timeout: typing.Any) -> _Entry:
+        """Prepare a value to store, pickling it unless it is immutable."""
+        expires = self.get_backend_timeout(timeout)
+
+        if (size := _immutable_size(value)) is not None:
+            return _Entry(family, value, size, expires)
+
+        return self._pickled(family, value, expires)
+
+    def _pickled(self, family: str, value: typing.Any, expires: float | None) -> _Entry:
+        pickled = pickle.dumps(value, self.pickle_protocol)
+
+        return _Entry(family, pickled, len(pickled), expires, pickled=True)
+
+
+class _Entry:
+    """A value of a `MemoryCache`."""
+
+    __slots__ = ("family", "value", "size", "expires", "pickled")
+
+    def __init__(
+        self,
+        family: str,
+        value: typing.Any,
+        size: int,
+        expires: float | None,
+        pickled: bool = False,
+    ) -> None:
+        self.family = family
+        self.value = value
+        # Keys are small next to the values, so they are counted as a fixed
+        # overhead with the entry itself.
+        self.size = size + _ENTRY_OVERHEAD
+        self.expires = expires
+        self.pickled = pickled
+
+
+class _Segment:
+    """The values of a key family of a `MemoryCache`, least recently used
+    first."""
+
+    def __init__(self, quota: int | None) -> None:
+        self.quota = quota
+        self.entries: collections.OrderedDict[str, _Entry] = collections.OrderedDict()
+        self.bytes = 0
+        self.stats = dict.fromkeys(
+            ("hits", "misses", "sets", "evictions", "expirations", "rejections"), 0
+        )
+
+
+class _Store:
+    """The values of a `MemoryCache`, shared by its threads.
+
+    Every method must be called with `lock` held.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        families: dict[str, float],
+        admission: bool,
+        sketch_width: int,
+    ) -> None:
+        self.lock = threading.Lock()
+        self.max_bytes = max_bytes
+        self.quotas = {
+            family: int(share * max_bytes) for family, share in families.items()
+        }
+        self.sketch = _FrequencySketch(sketch_width) if admission else None
+        self.segments: dict[str, _Segment] = {}
+        self.bytes = 0
+
+    def family(self, key: str) -> str:
+        """Get the family of a key, its longest prefix with a quota.
+
+        Args:
+            key: The key, before Django's prefix and version are added.
+
+        Returns:
+            The family, e.g. `stale:places`, else `key_family(key)`.
+        """
+        head, _, rest = key.partition(":")
+
+        if rest and (family := f"{head}:{rest.partition(':')[0]}") in self.quotas:
+            return family
+
+        return head
+
+    def segment(self, family: str) -> _Segment:
+        if (segment := self.segments.get(family)) is None:
+            segment = self.segments[family] = _Segment(self.quotas.get(family))
+
+        return segment
+
+    def live(self, family: str, key: str, count: bool = False) -> _Entry | None:
+        """Get the entry of a key unless it has expired, marking it used.
+
+        Args:
+            family: The family of the key.
+            key: The key.
+            count: Whether to count the request as a hit or a miss and in the
+                frequency sketch. Defaults to `False`.
+
+        Returns:
+            The entry, or `None`.
+        """
+        if count:
+            segment = self.segment(family)
+
+            if self.sketch is not None:
+                self.sketch.increment(key)
+        elif (segment := self.segments.get(family)) is None:
+            return None
+
+        if (entry := segment.entries.get(key)) is not None:
+            if entry.expires is not None and entry.expires <= time.time():
+                self.remove(family, key)
+                self._evicted(segment, family, "expired")
+                entry = None
+            else:
+                segment.entries.move_to_end(key)
+
+        if count:
+            segment.stats["hits" if entry is not None else "misses"] += 1
+
+        return entry
+
+    def insert(self, key: str, entry: _Entry, admit: bool = True) -> bool:
+        """Store an entry, evicting others to make room.
+
+        Args:
+            key: The key.
+            entry: The entry.
+            admit: Whether to only admit a new entry that needs evictions if
+                its key is requested more often than the first victim's.
+                Defaults to `True`.
+
+        Returns:
+            Whether the entry was admitted.
+        """
+        family = entry.family
+        segment = self.segment(family)
+        replaced = self.remove(family, key) is not None
+        quota = segment.quota if segment.quota is not None else self.max_bytes
+
+        if entry.size > min(quota, self.max_bytes):
+            self._rejected(segment, family)
+            return False
+
+        if self.sketch is not None:
+            self.sketch.increment(key)
+
+        if (
+            admit
+            and not replaced
+            and self.sketch is not None
+            and (victim := self._victim(segment, entry.size)) is not None
+        ):
+            if self.sketch.estimate(key) <= self.sketch.estimate(victim):
+                self._rejected(segment, family)
+                return False
+
+        while segment.bytes + entry.size > quota:
+            self._evict(segment, family)
+
+        while self.bytes + entry.size > self.max_bytes:
+            largest = max(self.segments, key=lambda name: self.segments[name].bytes)
+            self._evict(self.segments[largest], largest)
+
+        segment.entries[key] = entry
+        segment.bytes += entry.size
+        segment.stats["sets"] += 1
+        self.bytes += entry.size
+
+        MEMORY_CACHE_BYTES.set(segment.bytes, family=family)
+
+        return True
+
+    def remove(self, family: str, key: str) -> _Entry | None:
+        """Remove the entry of a key.
+
+        Args:
+            family: The family of the key.
+            key: The key.
+
+        Returns:
+            The removed entry, or `None`.
+        """
+        if (segment := self.segments.get(family)) is None:
+            return None
+
+        if (entry := segment.entries.pop(key, None)) is not None:
+            segment.bytes -= entry.size
+            self.bytes -= entry.size
+
+            MEMORY_CACHE_BYTES.set(segment.bytes, family=family)
+
+        return entry
+
+    def clear(self) -> None:
+        for family, segment in self.segments.items():
+            segment.entries.clear()
+            segment.bytes = 0
+
+            MEMORY_CACHE_BYTES.set(0, family=family)
+
+        self.bytes = 0
+
+    def _victim(self, segment: _Segment, size: int) -> str | None:
+        """Get the key the first eviction for a new entry would evict, if
+        any."""
+        if segment.quota is not None and segment.bytes + size > segment.quota:
+            return next(iter(segment.entries), None)
+
+        if self.bytes + size > self.max_bytes:
+            largest = max(self.segments.values(), key=lambda other: other.bytes)
+
+            return next(iter(largest.entries), None)
+
+        return None
+
+    def _evict(self, segment: _Segment, family: str) -> None:
+        """Evict the least recently used entry of a family."""
+        key = next(iter(segment.entries))
+        self.remove(family, key)
+        self._evicted(segment, family, "capacity")
+
+    def _evicted(self, segment: _Segment, family: str, reason: str) -> None:
+        segment.stats["expirations" if reason == "expired" else "evictions"] += 1
+        MEMORY_CACHE_EVICTIONS.inc(family=family, reason=reason)
+
+    def _rejected(self, segment: _Segment, family: str) -> None:
+        segment.stats["rejections"] += 1
+        MEMORY_CACHE_REJECTIONS.inc(family=family)
+
+
+class _FrequencySketch:
+    """A count-min sketch of how often keys are requested, for TinyLFU.
+
+    The sketch has four rows of counters, indexed by 16-bit slices of one
+    hash of the key. Counters saturate at 15 and are halved once the sketch
+    has counted ten times as many requests as it has counters per row, so
+    old popularity fades.
+    """
+
+    def __init__(self, width: int) -> None:
+        if not 0 < width <= 1 << 16 or width & (width - 1):
+            raise ValueError("The sketch width must be a power of two up to 65536")
+
+        self.width = width
+        self.counters = bytearray(4 * width)
+        self.sample_size = 10 * width
+        self.additions = 0
+
+    def _indexes(self, key: str) -> tuple[int, int, int, int]:
+        hashed = hash(key) * _SKETCH_MULTIPLIER
+        width = self.width
+        mask = width - 1
+
+        return (
+            hashed & mask,
+            width + (hashed >> 16 & mask),
+            2 * width + (hashed >> 32 & mask),
+            3 * width + (hashed >> 48 & mask),
+        )
+
+    def increment(self, key: str) -> None:
+        counters = self.counters
+
+        for index in self._indexes(key):
+            if counters[index] < 15:
+                counters[index] += 1
+
+        self.additions += 1
+
+        if self.additions >= self.sample_size:
+            self.counters = self.counters.translate(_HALVE)
+            self.additions //= 2
+
+    def estimate(self, key: str) -> int:
+        counters = self.counters
+        first, second, third, fourth = self._indexes(key)
+
+        return min(counters[first], counters[second], counters[third], counters[fourth])
+
+
+# The estimated overhead of an entry: the `_Entry`, its key and the slot in
+# the `OrderedDict`.
+_ENTRY_OVERHEAD = 200
+
+
+def _immutable_size(value: typing.Any, depth: int = 0) -> int | None:
+    """Estimate the size of a value if it is immutable all the way down.
+
+    Args:
+        value: The value.
+        depth: The nesting depth of the value, to give up on deep values.
+
+    Returns:
+        The estimated size in bytes, or `None` if the value is (or may
+        contain something) mutable.
+    """
+    if type(value) in _SCALARS:
+        return sys.getsizeof(value)
+
+    if depth > 8:
+        return None
+
+    if isinstance(value, (tuple, frozenset)):
+        items = value
+    elif (fields := _frozen_fields(type(value))) is not None:
+        items = [getattr(value, field) for field in fields]
+    else:
+        return None
+
+    size = sys.getsizeof(value)
+
+    for item in items:
+        # Scalars are checked inline, as large values hold many of them.
+        if type(item) in _SCALARS:
+            size += sys.getsizeof(item)
+        elif (item_size := _immutable_size(item, depth + 1)) is not None:
+            size += item_size
+        else:
+            return None
+
+    return size
+
+
+_SCALARS = frozenset((type(None), bool, int, float, str, bytes))
+
+
+@functools.cache
+def _frozen_fields(cls: type) -> tuple[str, ...] | None:
+    """Get the fields of a frozen dataclass, or `None` for other classes."""
+    if not dataclasses.is_dataclass(cls) or not cls.__dataclass_params__.frozen:
+        return None
+
+    return tuple(field.name for field in dataclasses.fields(cls))
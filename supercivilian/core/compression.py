@@ -0,0 +1,382 @@
+from __future__ import annotations
+
+import dataclasses
+import functools
+import gzip
+import hashlib
+import re
+import typing
+import zlib
+
+import brotli
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from . import tracing
+from .cache import lookup, store
+from .responses import RENDER_DURATION
+from .timing import span
+from .upstream import is_stale
+
+# The encodings responses can be compressed with, in order of preference.
+ENCODINGS = ("br", "gzip")
+
+_ACCEPT_ENCODING = re.compile(r"([\w*-]+)\s*(?:;\s*q\s*=\s*([\d.]+))?")
+# Headers of a view's response that aren't kept with its cached body.
+_UNCACHED_HEADERS = {"content-type", "content-length", "vary", "etag"}
+
+
+@dataclasses.dataclass(frozen=True)
+class CompressedBody:
+    """A response body stored compressed with every encoding of `ENCODINGS`.
+
+    The uncompressed body isn't kept, it is decompressed from the gzip body
+    for the rare client that accepts neither encoding.
+
+    Attributes:
+        content_type: The content type of the body.
+        gzip: The body compressed with gzip.
+        br: The body compressed with brotli.
+        etag: The quoted ETag of the gzip body. The other encodings have the
+            ETag with their name appended, e.g. `"<hash>-br"`.
+        headers: Extra headers to send with the body.
+    """
+
+    content_type: str
+    gzip: bytes
+    br: bytes
+    etag: str
+    headers: tuple[tuple[str, str], ...] = ()
+
+    @classmethod
+    def compress(
+        cls,
+        body: bytes,
+        content_type: str,
+        headers: typing.Iterable[tuple[str, str]] = (),
+        streaming: bool = False,
+    ) -> CompressedBody:
+        """Compress a body with every encoding.
+
+        The body is compressed once with the `COMPRESSION` quality settings,
+        which trade compression time for size since it is sent many times.
+
+        Args:
+            body: The uncompressed body.
+            content_type: The content type of the body.
+            headers: Extra headers to send with the body. Defaults to none.
+            streaming: Whether to use the fast `streaming_*` quality settings
+                instead, for bodies rarely sent twice. Defaults to `False`.
+
+        Returns:
+            The `CompressedBody`.
+        """
+        gzip_level = settings.COMPRESSION[
+            "streaming_gzip_level" if streaming else "gzip_level"
+        ]
+
+        return cls.from_gzip(
+            gzip.compress(body, compresslevel=gzip_level, mtime=0),
+            content_type,
+            headers=headers,
+            body=body,
+            streaming=streaming,
+        )
+
+    @classmethod
+    def from_gzip(
+        cls,
+        gzip_body: bytes,
+        content_type: str,
+        etag: str | None = None,
+        headers: typing.Iterable[tuple[str, str]] = (),
+        body: bytes | None = None,
+        streaming: bool = False,
+    ) -> CompressedBody:
+        """Add the other encodings to a body already compressed with gzip.
+
+        Args:
+            gzip_body: The body compressed with gzip.
+            content_type: The content type of the body.
+            etag: The quoted ETag of the gzip body. Defaults to `None`, which
+                means it is derived from the gzip body.
+            headers: Extra headers to send with the body. Defaults to none.
+            body: The uncompressed body, if at hand. Defaults to `None`, which
+                means it is decompressed from the gzip body.
+            streaming: Whether to use the fast `streaming_brotli_quality`.
+                Defaults to `False`.
+
+        Returns:
+            The `CompressedBody`.
+        """
+        if body is None:
+            body = gzip.decompress(gzip_body)
+
+        if etag is None:
+            etag = f'"{hashlib.sha256(gzip_body).hexdigest()[:32]}"'
+
+        return cls(
+            content_type=content_type,
+            gzip=gzip_body,
+            br=brotli.compress(
+                body,
+                quality=settings.COMPRESSION[
+                    "streaming_brotli_quality" if streaming else "brotli_quality"
+                ],
+            ),
+            etag=etag,
+            headers=tuple(headers),
+        )
+
+    def body(self, encoding: str | None) -> bytes:
+        """Get the body in an encoding.
+
+        Args:
+            encoding: The encoding, of `ENCODINGS`, or `None` for the
+                uncompressed body.
+
+        Returns:
+            The body.
+        """
+        if encoding is None:
+            return gzip.decompress(self.gzip)
+
+        return getattr(self, encoding)
+
+    def etag_for(self, encoding: str | None) -> str:
+        """Get the ETag of the body in an encoding.
+
+        Args:
+            encoding: The encoding, of `ENCODINGS`, or `None` for the
+                uncompressed body.
+
+        Returns:
+            The quoted ETag.
+        """
+        if encoding == "gzip":
+            return self.etag
+
+        return f'{self.etag[:-1]}-{encoding or "identity"}"'
+
+
+def accepted_encoding(request: HttpRequest) -> str | None:
+    """Pick the encoding of a response from the `Accept-Encoding` header.
+
+    Args:
+        request: The request.
+
+    Returns:
+        The most preferred encoding of `ENCODINGS` the client accepts, with
+        ties broken by the order of `ENCODINGS`, or `None` if it accepts none.
+    """
+    header = request.headers.get("Accept-Encoding", "")
+
+    if not header:
+        return None
+
+    qualities: dict[str, float] = {}
+
+    for match in _ACCEPT_ENCODING.finditer(header.lower()):
+        try:
+            quality = float(match[2]) if match[2] is not None else 1.0
+        except ValueError:
+            continue
+
+        qualities[match[1]] = quality
+
+    wildcard = qualities.get("*", 0.0)
+    best, best_quality = None, 0.0
+
+    for encoding in ENCODINGS:
+        if (quality := qualities.get(encoding, wildcard)) > best_quality:
+            best, best_quality = encoding, quality
+
+    return best
+
+
+def compressed_response(
+    request: HttpRequest,
+    body: CompressedBody,
+    cache_control: str | None = None,
+) -> HttpResponse:
+    """Respond with a body in the encoding the client prefers, or with
+    `304 Not Modified` if the client has it.
+
+    Args:
+        request: The request.
+        body: The body.
+        cache_control: The `Cache-Control` header. Defaults to `None`, which
+            means none is sent.
+
+    Returns:
+        The response.
+    """
+    encoding = accepted_encoding(request)
+    etag = body.etag_for(encoding)
+
+    if etag in parse_etags(request.headers.get("If-None-Match", "")):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body.body(encoding), content_type=body.content_type)
+
+        if encoding is not None:
+            response["Content-Encoding"] = encoding
+
+        for header, value in body.headers:
+            response[header] = value
+
+    response["ETag"] = etag
+
+    if cache_control is not None:
+        response["Cache-Control"] = cache_control
+
+    patch_vary_headers(response, ["Accept-Encoding"])
+
+    return response
+
+
+def cache_compressed(
+    key: typing.Callable[..., str | None], timeout: int, streaming: bool = False
+) -> typing.Callable:
+    """Cache the responses of an API view method precompressed.
+
+    A successful response is rendered to JSON, compressed with every encoding
+    and cached as a `CompressedBody`, so later requests are answered without
+    calling the view, rendering or compressing. Error responses and responses
+    built from stale upstream data aren't cached.
+
+    Args:
+        key: Called with the request and the arguments of the view method to
+            get the cache key of the response, or `None` not to cache it.
+            The key should be made with `response_cache_key`.
+        timeout: How long to cache responses for (in seconds).
+        streaming: Whether to compress with the fast `streaming_*` quality
+            settings, for responses whose keys rarely repeat. Defaults to
+            `False`.
+
+    Returns:
+        The decorator.
+    """
+
+    def decorator(method: typing.Callable) -> typing.Callable:
+        @functools.wraps(method)
+        def wrapper(
+            view: typing.Any,
+            request: HttpRequest,
+            *args: typing.Any,
+            **kwargs: typing.Any,
+        ) -> HttpResponse:
+            if (cache_key := key(request, *args, **kwargs)) is None:
+                return method(view, request, *args, **kwargs)
+
+            if (body := lookup(cache_key)) is None:
+                response = method(view, request, *args, **kwargs)
+
+                if (
+                    not isinstance(response, Response)
+                    or response.status_code != 200
+                    or is_stale()
+                ):
+                    return response
+
+                with RENDER_DURATION.time(), span("render"), tracing.span("render"):
+                    content = JSONRenderer().render(response.data)
+
+                with span("compress"):
+                    body = CompressedBody.compress(
+                        content,
+                        "application/json",
+                        headers=(
+                            (header, value)
+                            for header, value in response.items()
+                            if header.lower() not in _UNCACHED_HEADERS
+                        ),
+                        streaming=streaming,
+                    )
+                store(cache_key, body, timeout)
+
+            return compressed_response(request, body)
+
+        return wrapper
+
+    return decorator
+
+
+def response_cache_key(request: HttpRequest, *parts: typing.Any) -> str:
+    """Make the cache key of a response to a request.
+
+    Args:
+        request: The request.
+        *parts: Parts to add to the key, e.g. the version of the data the
+            response is built from.
+
+    Returns:
+        The cache key, of the path and the query parameters in any order.
+    """
+    query = sorted(
+        (key, value) for key in request.GET for value in request.GET.getlist(key)
+    )
+    digest = hashlib.sha256(repr((request.path, query)).encode()).hexdigest()
+
+    return ":".join(("response", *map(str, parts), digest))
+
+
+def compress_chunks(
+    chunks: typing.Iterable[bytes], encoding: str
+) -> typing.Iterator[bytes]:
+    """Compress a streamed body chunk by chunk.
+
+    Every chunk is flushed, so the client receives it without waiting for the
+    next one.
+
+    Args:
+        chunks: The chunks of the body.
+        encoding: The encoding, of `ENCODINGS`.
+
+    Returns:
+        An iterator over the compressed chunks.
+    """
+    if encoding == "br":
+        compressor = brotli.Compressor(
+            quality=settings.COMPRESSION["streaming_brotli_quality"]
+        )
+
+        for chunk in chunks:
+            if data := compressor.process(chunk) + compressor.flush():
+                yield data
+
+        yield compressor.finish()
+    else:
+        compressor = zlib.compressobj(
+            settings.COMPRESSION["streaming_gzip_level"], zlib.DEFLATED, 31
+        )
+
+        for chunk in chunks:
+            if data := compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH):
+                yield data
+
+        yield compressor.flush()
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Compress a body once, for a response that isn't cached.
+
+    Args:
+        body: The body.
+        encoding: The encoding, of `ENCODINGS`.
+
+    Returns:
+        The compressed body.
+    """
+    if encoding == "br":
+        return brotli.compress(
+            body, quality=settings.COMPRESSION["streaming_brotli_quality"]
+        )
+
+    return gzip.compress(
+        body, compresslevel=settings.COMPRESSION["streaming_gzip_level"], mtime=0
+    )
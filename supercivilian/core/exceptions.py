@@ -0,0 +1,45 @@
+import typing
+
+import requests
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.views import exception_handler as default_exception_handler
+
+from .responses import APIErrorResponse
+from .upstream import UpstreamUnavailableError
+
+
+def exception_handler(
+    exception: Exception, context: dict[str, typing.Any]
+) -> Response | None:
+    """Exception handler for the REST framework.
+
+    Turns `UpstreamUnavailableError` into a 503 error response with a
+    `Retry-After` header, and failed upstream calls (`requests` errors, e.g.
+    timeouts, without a stale response to fall back on) into a 503 error
+    response. Defers to the default handler otherwise.
+
+    Args:
+        exception: The raised exception.
+        context: The context of the view that raised the exception.
+
+    Returns:
+        The error response, or `None` if the exception should be re-raised.
+    """
+    if isinstance(exception, UpstreamUnavailableError):
+        response = APIErrorResponse(
+            message=str(exception), status=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+
+        if exception.retry_after is not None:
+            response["Retry-After"] = str(exception.retry_after)
+
+        return response
+
+    if isinstance(exception, requests.RequestException):
+        return APIErrorResponse(
+            message="Service temporarily unavailable",
+            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        )
+
+    return default_exception_handler(exception, context)
@@ -0,0 +1,529 @@
+from __future__ import annotations
+
+import bisect
+import contextlib
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+import typing
+
+logger = logging.getLogger(__name__)
+
+Labels = tuple[tuple[str, str], ...]
+
+# The default buckets of histograms of durations, in seconds.
+DURATION_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+)
+# The default buckets of histograms of sizes, in bytes.
+SIZE_BUCKETS = tuple(4**exponent for exponent in range(4, 13))
+
+
+class Metric:
+    """Base class for metrics exposed in the Prometheus text format.
+
+    Metrics register themselves in the module level `registry` on creation
+    and keep one value per combination of label values.
+    """
+
+    type: typing.ClassVar[str]
+
+    def __init__(self, name: str, documentation: str) -> None:
+        """Initialize the metric.
+
+        Args:
+            name: The name of the metric.
+            documentation: The help text of the metric.
+        """
+        self.name = name
+        self.documentation = documentation
+        self._values: dict[Labels, typing.Any] = {}
+        self._lock = threading.Lock()
+
+        registry.register(self)
+
+    def snapshot(self) -> dict[Labels, typing.Any]:
+        """Get a copy of the current values of the metric.
+
+        Returns:
+            The values, keyed by their sorted labels.
+        """
+        with self._lock:
+            return dict(self._values)
+
+    def merge(
+        self, snapshots: typing.Iterable[tuple[int, bool, dict[Labels, typing.Any]]]
+    ) -> dict[Labels, typing.Any]:
+        """Merge the values of the metric in several processes.
+
+        Args:
+            snapshots: `(pid, alive, values)` tuples of every process.
+
+        Returns:
+            The merged values. Values are summed by default.
+        """
+        merged: dict[Labels, typing.Any] = {}
+
+        for _, _, values in snapshots:
+            for labels, value in values.items():
+                merged[labels] = merged.get(labels, 0) + value
+
+        return merged
+
+    def samples(
+        self, values: dict[Labels, typing.Any] | None = None
+    ) -> list[tuple[str, dict[str, str], float]]:
+        """Get the samples of the metric.
+
+        Args:
+            values: The values to get the samples of. Defaults to `None`,
+                which means the current values.
+
+        Returns:
+            A list of `(name, labels, value)` tuples.
+        """
+        if values is None:
+            values = self.snapshot()
+
+        return [(self.name, dict(labels), value) for labels, value in values.items()]
+
+
+class Counter(Metric):
+    """A monotonically increasing value."""
+
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        """Increment the counter.
+
+        Args:
+            amount: The amount to increment by. Defaults to 1.
+            **labels: The label values of the sample.
+        """
+        key = tuple(sorted(labels.items()))
+
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """A value that can go up and down."""
+
+    type = "gauge"
+
+    def __init__(
+        self, name: str, documentation: str, multiprocess_mode: str = "max"
+    ) -> None:
+        """Initialize the gauge.
+
+        Args:
+            name: The name of the gauge.
+            documentation: The help text of the gauge.
+            multiprocess_mode: How the values of several processes are merged:
+                `"max"`, `"min"`, `"sum"` or `"all"`, which keeps the value of
+                every process with a `pid` label. Only the values of live
+                processes are merged. Defaults to `"max"`.
+        """
+        super().__init__(name, documentation)
+
+        self.multiprocess_mode = multiprocess_mode
+
+    def set(self, value: float, **labels: str) -> None:
+        """Set the gauge.
+
+        Args:
+            value: The new value.
+            **labels: The label values of the sample.
+        """
+        key = tuple(sorted(labels.items()))
+
+        with self._lock:
+            self._values[key] = value
+
+    def merge(
+        self, snapshots: typing.Iterable[tuple[int, bool, dict[Labels, typing.Any]]]
+    ) -> dict[Labels, typing.Any]:
+        merged: dict[Labels, typing.Any] = {}
+
+        for pid, alive, values in snapshots:
+            if not alive:
+                continue
+
+            for labels, value in values.items():
+                if self.multiprocess_mode == "all":
+                    merged[tuple(sorted((*labels, ("pid", str(pid)))))] = value
+                elif labels not in merged:
+                    merged[labels] = value
+                elif self.multiprocess_mode == "sum":
+                    merged[labels] += value
+                elif self.multiprocess_mode == "min":
+                    merged[labels] = min(merged[labels], value)
+                else:
+                    merged[labels] = max(merged[labels], value)
+
+        return merged
+
+
+class Histogram(Metric):
+    """The distribution of observed values, counted in cumulative buckets."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        buckets: typing.Sequence[float] = DURATION_BUCKETS,
+    ) -> None:
+        """Initialize the histogram.
+
+        Args:
+            name: The name of the histogram.
+            documentation: The help text of the histogram.
+            buckets: The upper bounds of the buckets, in increasing order. A
+                `+Inf` bucket is always added. Defaults to `DURATION_BUCKETS`.
+        """
+        super().__init__(name, documentation)
+
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Observe a value.
+
+        Args:
+            value: The value.
+            **labels: The label values of the sample.
+        """
+        key = tuple(sorted(labels.items()))
+        # Values are counted in their own bucket only, and the buckets summed
+        # into cumulative ones when rendered.
+        index = bisect.bisect_left(self.buckets, value)
+
+        with self._lock:
+            if (counts := self._values.get(key)) is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 2)
+
+            counts[index] += 1
+            # The sum of the values, after the `+Inf` bucket.
+            counts[-1] += value
+
+    @contextlib.contextmanager
+    def time(self, **labels: str) -> typing.Iterator[None]:
+        """Observe the duration of a block, in seconds.
+
+        Args:
+            **labels: The label values of the sample.
+        """
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self) -> dict[Labels, typing.Any]:
+        with self._lock:
+            return {labels: list(counts) for labels, counts in self._values.items()}
+
+    def merge(
+        self, snapshots: typing.Iterable[tuple[int, bool, dict[Labels, typing.Any]]]
+    ) -> dict[Labels, typing.Any]:
+        merged: dict[Labels, typing.Any] = {}
+
+        for _, _, values in snapshots:
+            for labels, counts in values.items():
+                if len(counts) != len(self.buckets) + 2:
+                    # Written by a process with other buckets.
+                    continue
+
+                if (total := merged.get(labels)) is None:
+                    merged[labels] = list(counts)
+                else:
+                    for index, count in enumerate(counts):
+                        total[index] += count
+
+        return merged
+
+    def samples(
+        self, values: dict[Labels, typing.Any] | None = None
+    ) -> list[tuple[str, dict[str, str], float]]:
+        if values is None:
+            values = self.snapshot()
+
+        samples = []
+
+        for labels, counts in values.items():
+            cumulative = 0
+
+            for bound, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                samples.append(
+                    (
+                        f"{self.name}_bucket",
+                        {**dict(labels), "le": _format_value(bound)},
+                        cumulative,
+                    )
+                )
+
+            samples.append((f"{self.name}_sum", dict(labels), counts[-1]))
+            samples.append((f"{self.name}_count", dict(labels), cumulative))
+
+        return samples
+
+
+class Registry:
+    """A collection of metrics.
+
+    With a multiprocess directory, e.g. for gunicorn workers, every process
+    writes a snapshot of its metrics to the directory every few seconds from
+    a background thread, and `render` merges the snapshots of all processes.
+    Counters and histograms of processes that exited are kept, so totals
+    don't go down when a worker is replaced, and gauges are merged from live
+    processes only. Snapshots are named after the PID and the start time of
+    their process, so a worker that gets the PID of an exited one doesn't
+    overwrite its snapshot. Clear the directory before the server starts.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+        self._directory: str | None = None
+        self._interval = 5.0
+        self._exporter_pid: int | None = None
+        self._exporter_started = 0
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> None:
+        """Register a metric.
+
+        Args:
+            metric: The metric to register.
+
+        Raises:
+            ValueError: If a metric with the same name is already registered.
+        """
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+
+        self._metrics[metric.name] = metric
+
+    def configure_multiprocess(self, directory: str | None, interval: float) -> None:
+        """Configure the multiprocess directory.
+
+        Args:
+            directory: The directory shared by the processes, or `None` to
+                only render the metrics of the current process.
+            interval: How often every process writes its snapshot, in seconds.
+        """
+        self._directory = directory
+        self._interval = interval
+
+    def start_exporter(self) -> None:
+        """Start writing the snapshots of the current process, if a
+        multiprocess directory is configured and it hasn't started yet.
+
+        Cheap enough to call on every request, which also starts it in
+        processes forked after the registry was configured.
+        """
+        if self._directory is None or self._exporter_pid == os.getpid():
+            return
+
+        with self._lock:
+            if self._exporter_pid == (pid := os.getpid()):
+                return
+
+            self._exporter_pid = pid
+            self._exporter_started = time.time_ns()
+
+        os.makedirs(self._directory, exist_ok=True)
+        threading.Thread(
+            target=self._export, name="metrics-exporter", daemon=True
+        ).start()
+
+    def render(self) -> str:
+        """Render all registered metrics in the Prometheus text format.
+
+        Returns:
+            The metrics in the Prometheus text exposition format.
+        """
+        snapshots = self._snapshots()
+        lines = []
+
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+
+            values = (
+                metric.merge(
+                    (pid, alive, metrics.get(metric.name, {}))
+                    for pid, alive, metrics in snapshots
+                )
+                if snapshots is not None
+                else None
+            )
+
+            for name, labels, value in metric.samples(values):
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+    def _snapshots(
+        self,
+    ) -> list[tuple[int, bool, dict[str, dict[Labels, typing.Any]]]] | None:
+        """Read the snapshots of the other processes and take the current
+        one's, or `None` without a multiprocess directory."""
+        if self._directory is None:
+            return None
+
+        pid = os.getpid()
+        own = self._snapshot_name() if self._exporter_pid == pid else None
+        snapshots = [(pid, True, self._snapshot())]
+        documents = []
+
+        try:
+            names = os.listdir(self._directory)
+        except FileNotFoundError:
+            names = []
+
+        for name in names:
+            if not name.endswith(".json") or name == own:
+                continue
+
+            try:
+                with open(os.path.join(self._directory, name)) as file:
+                    documents.append(json.load(file))
+            except (OSError, ValueError):
+                # Removed or being replaced.
+                continue
+
+        # A PID can be reused by a later process, so only the latest snapshot
+        # of a running PID, other than the current process, is alive.
+        latest: dict[int, int] = {pid: -1}
+
+        for document in documents:
+            if document["pid"] != pid:
+                latest[document["pid"]] = max(
+                    latest.get(document["pid"], 0), document["started"]
+                )
+
+        for document in documents:
+            snapshots.append(
+                (
+                    document["pid"],
+                    document["started"] == latest[document["pid"]]
+                    and _alive(document["pid"]),
+                    {
+                        metric: {
+                            tuple(map(tuple, labels)): value for labels, value in values
+                        }
+                        for metric, values in document["metrics"].items()
+                    },
+                )
+            )
+
+        return snapshots
+
+    def _snapshot_name(self) -> str:
+        """Get the file name of the snapshots of the current process."""
+        return f"{self._exporter_pid}-{self._exporter_started}.json"
+
+    def _snapshot(self) -> dict[str, dict[Labels, typing.Any]]:
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+    def _export(self) -> None:
+        """Write the snapshots of the current process until it exits."""
+        pid, started = os.getpid(), self._exporter_started
+        path = os.path.join(self._directory, self._snapshot_name())
+
+        while self._exporter_pid == pid:
+            document = {
+                "pid": pid,
+                "started": started,
+                "metrics": {
+                    name: [[list(labels), value] for labels, value in values.items()]
+                    for name, values in self._snapshot().items()
+                },
+            }
+
+            try:
+                with tempfile.NamedTemporaryFile(
+                    "w", dir=self._directory, suffix=".tmp", delete=False
+                ) as file:
+                    json.dump(document, file)
+
+                os.replace(file.name, path)
+            except OSError:
+                logger.exception("Failed to write the metrics of process %d", pid)
+
+            time.sleep(self._interval)
+
+
+def _alive(pid: int) -> bool:
+    """Check whether a process is running."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+    return True
+
+
+def _format_labels(labels: dict[str, str]) -> str:
+    """Format labels for the Prometheus text format.
+
+    Args:
+        labels: The labels.
+
+    Returns:
+        The formatted labels, or an empty string if there are none.
+    """
+    if not labels:
+        return ""
+
+    formatted = ",".join(
+        '{}="{}"'.format(
+            key,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for key, value in labels.items()
+    )
+
+    return f"{{{formatted}}}"
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value for the Prometheus text format.
+
+    Args:
+        value: The value.
+
+    Returns:
+        The formatted value.
+    """
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+
+    if float(value).is_integer():
+        return str(int(value))
+
+    return repr(float(value))
+
+
+registry = Registry()
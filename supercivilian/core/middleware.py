@@ -0,0 +1,231 @@
+import re
+import time
+import typing
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from django.utils.cache import patch_vary_headers
+
+from . import tracing
+from .compression import accepted_encoding, compress, compress_chunks
+from .metrics import SIZE_BUCKETS, Histogram, registry
+from .timing import Profiler, server_timing, start, stop
+from .upstream import is_stale, reset_stale, restore_stale
+
+REQUEST_DURATION = Histogram(
+    "supercivilian_request_duration_seconds",
+    "Duration of requests by endpoint, method and status code",
+)
+RESPONSE_SIZE = Histogram(
+    "supercivilian_response_size_bytes",
+    "Size of response bodies as sent, i.e. compressed, by endpoint",
+    buckets=SIZE_BUCKETS,
+)
+
+
+class MetricsMiddleware:
+    """Record the duration and the body size of every response.
+
+    Endpoints are labeled with their URL pattern name, or `unmatched` for
+    requests that don't match any URL pattern. The sizes of streamed bodies
+    are recorded when they are fully sent. Also starts writing the metrics of
+    the process for `/metrics` with the `METRICS["multiprocess_dir"]` setting.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+        registry.configure_multiprocess(
+            settings.METRICS["multiprocess_dir"], settings.METRICS["interval"]
+        )
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        registry.start_exporter()
+
+        start = time.perf_counter()
+        response = self.get_response(request)
+        endpoint = (
+            request.resolver_match.url_name
+            if request.resolver_match is not None
+            else None
+        ) or "unmatched"
+
+        REQUEST_DURATION.observe(
+            time.perf_counter() - start,
+            endpoint=endpoint,
+            method=request.method,
+            status=str(response.status_code),
+        )
+
+        if response.streaming:
+            response.streaming_content = _counted(response.streaming_content, endpoint)
+        else:
+            RESPONSE_SIZE.observe(len(response.content), endpoint=endpoint)
+
+        return response
+
+
+def _counted(chunks: typing.Iterable[bytes], endpoint: str) -> typing.Iterator[bytes]:
+    """Record the size of a streamed body once it is sent."""
+    size = 0
+
+    for chunk in chunks:
+        size += len(chunk)
+        yield chunk
+
+    RESPONSE_SIZE.observe(size, endpoint=endpoint)
+
+
+class TracingMiddleware:
+    """Trace every request, continuing the trace of a `traceparent` header.
+
+    The spans of sampled traces are exported to the exporters of the
+    `TRACING` setting once the request is handled, see
+    `supercivilian.core.tracing`. Every response has the ID of its trace as
+    an `X-Trace-Id` header, to find the spans and logs of a reported request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+        tracing.configure(
+            settings.TRACING["exporters"], settings.TRACING["sample_rate"]
+        )
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        with tracing.trace(
+            request.method,
+            traceparent=request.headers.get("traceparent"),
+            **{"http.method": request.method, "http.target": request.path},
+        ) as root:
+            response = self.get_response(request)
+
+            if (match := request.resolver_match) is not None:
+                root.update_name(f"{request.method} /{match.route}")
+                root.set_attribute("http.route", f"/{match.route}")
+
+            root.set_attribute("http.status_code", response.status_code)
+            response["X-Trace-Id"], _ = tracing.current_ids()
+
+        return response
+
+
+class TimingMiddleware:
+    """Time the stages of requests and profile slow requests.
+
+    With the `SERVER_TIMING` setting, a `Server-Timing` header with the
+    durations of the spans of the request (see
+    `supercivilian.core.timing.span`) and of the whole request is added to
+    every response. With a `PROFILING["directory"]`, sampled or requested
+    requests are profiled, see `supercivilian.core.timing.Profiler`.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.profiler = (
+            Profiler(**settings.PROFILING) if settings.PROFILING["directory"] else None
+        )
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if (profiler := self.profiler) is not None:
+            force = profiler.requested(request.headers)
+
+            if force or profiler.sampled():
+                with profiler.profile(request.path, force=force):
+                    return self._timed(request)
+
+        return self._timed(request)
+
+    def _timed(self, request: HttpRequest) -> HttpResponse:
+        if not settings.SERVER_TIMING:
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        token = start()
+
+        try:
+            response = self.get_response(request)
+        finally:
+            timings = stop(token)
+
+        response["Server-Timing"] = server_timing(
+            timings, time.perf_counter() - started
+        )
+
+        return response
+
+
+class StaleResponseMiddleware:
+    """Mark responses built from stale upstream data.
+
+    If any upstream call made while handling the request was answered from the
+    stale cache, a `Warning: 110` header is added to the response.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        token = reset_stale()
+
+        try:
+            response = self.get_response(request)
+
+            if is_stale():
+                response["Warning"] = '110 - "Response is Stale"'
+        finally:
+            restore_stale(token)
+
+        return response
+
+
+class CompressionMiddleware:
+    """Compress responses that aren't compressed yet.
+
+    Cached responses are stored precompressed (see
+    `supercivilian.core.compression.cache_compressed`) and pass through as
+    they are. Streamed responses are compressed chunk by chunk and other
+    responses of at least `COMPRESSION["min_size"]` bytes at once, both with
+    the fast `streaming_*` quality settings.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        response = self.get_response(request)
+
+        if response.has_header("Content-Encoding"):
+            return response
+
+        if not response.streaming and len(response.content) < (
+            settings.COMPRESSION["min_size"]
+        ):
+            return response
+
+        patch_vary_headers(response, ["Accept-Encoding"])
+
+        if (encoding := accepted_encoding(request)) is None:
+            return response
+
+        if response.streaming:
+            response.streaming_content = compress_chunks(
+                response.streaming_content, encoding
+            )
+            del response["Content-Length"]
+        else:
+            content = compress(response.content, encoding)
+
+            if len(content) >= len(response.content):
+                return response
+
+            response.content = content
+            response["Content-Length"] = str(len(content))
+
+        # The compressed body is only equivalent to the uncompressed one.
+        if etag := response.get("ETag"):
+            response["ETag"] = re.sub(r'^(?!W/)"', 'W/"', etag)
+
+        response["Content-Encoding"] = encoding
+
+        return response
@@ -1,9 +1,14 @@
 from __future__ import annotations
 
+import functools
 import typing
 
 from django.http import HttpRequest
 
+from . import tracing
+
+_Getter = typing.TypeVar("_Getter", bound=typing.Callable[..., typing.Any])
+
 
 class ParameterError(Exception):
     def __init__(self, parameter: str, message: str = None) -> None:
@@ -12,17 +17,36 @@ class ParameterError(Exception):
         super().__init__(message)
 
 
+def _traced(getter: _Getter) -> _Getter:
+    """Trace the parsing of a parameter as a `parameters.<type>` span."""
+
+    @functools.wraps(getter)
+    def wrapper(self: SearchParameters, key: str, *args, **kwargs):
+        with tracing.span(f"parameters.{getter.__name__}", parameter=key):
+            return getter(self, key, *args, **kwargs)
+
+    return typing.cast(_Getter, wrapper)
+
+
 class SearchParameters:
     """Utility class for handling request parameters."""
 
-    def __init__(self, request: HttpRequest):
+    def __init__(
+        self, request: HttpRequest, mapping: typing.Mapping | None = None
+    ) -> None:
         """Initialize the parameters object with a request.
 
         Args:
             request: The HTTP request object.
+            mapping: The parameters to read. Defaults to the query string for
+                GET requests and the form data otherwise.
         """
         self.request = request
-        self.mapping = request.GET if request.method == "GET" else request.POST
+
+        if mapping is not None:
+            self.mapping = mapping
+        else:
+            self.mapping = request.GET if request.method == "GET" else request.POST
 
     @typing.overload
     def string(
@@ -47,6 +71,7 @@ class SearchParameters:
         self, key: str, default: str, required: bool = False, strip: bool = True
     ) -> str: ...
 
+    @_traced
     def string(
         self,
         key: str,
@@ -94,6 +119,7 @@ class SearchParameters:
     @typing.overload
     def integer(self, key: str, default: int, required: bool = False) -> int: ...
 
+    @_traced
     def integer(
         self, key: str, default: int | None = None, required: bool = False
     ) -> int | None:
@@ -117,6 +143,9 @@ class SearchParameters:
         if required and value is None:
             raise ParameterError(key, f"{key} parameter is required")
 
+        if value is None:
+            return None
+
         try:
             return int(value)
         except (TypeError, ValueError):
@@ -135,6 +164,7 @@ class SearchParameters:
     @typing.overload
     def float(self, key: str, default: float, required: bool = False) -> float: ...
 
+    @_traced
     def float(
         self, key: str, default: float | None = None, required: bool = False
     ) -> float | None:
@@ -158,7 +188,88 @@ class SearchParameters:
         if required and value is None:
             raise ParameterError(key, f"{key} parameter is required")
 
+        if value is None:
+            return None
+
         try:
             return float(value)
         except (TypeError, ValueError):
             raise ParameterError(key, f"{key} parameter must be a float")
+
+    @_traced
+    def boolean(self, key: str, default: bool = False) -> bool:
+        """Get a boolean parameter from the request.
+
+        `true`, `1` and `yes` are true and `false`, `0` and `no` are false,
+        regardless of case.
+
+        Args:
+            key: The parameter key.
+            default: The default value.
+                Defaults to False.
+
+        Returns:
+            The parameter value.
+
+        Raises:
+            ParameterError: If the parameter is not a boolean.
+        """
+        value = self.mapping.get(key)
+
+        if value is None:
+            return default
+
+        if value.strip().lower() in ("true", "1", "yes"):
+            return True
+
+        if value.strip().lower() in ("false", "0", "no"):
+            return False
+
+        raise ParameterError(key, f"{key} parameter must be true or false")
+
+    @_traced
+    def box(
+        self, key: str, required: bool = False
+    ) -> tuple[float, float, float, float] | None:
+        """Get a bounding box parameter from the request.
+
+        The box is given as `minimum_longitude,minimum_latitude,
+        maximum_longitude,maximum_latitude`.
+
+        Args:
+            key: The parameter key.
+            required: Whether the parameter is required.
+                Defaults to False.
+
+        Returns:
+            The parameter value, or None if it's missing.
+
+        Raises:
+            ParameterError: If the parameter is required and missing or not a
+                valid bounding box.
+        """
+        value = self.mapping.get(key)
+
+        if value is None:
+            if required:
+                raise ParameterError(key, f"{key} parameter is required")
+
+            return None
+
+        try:
+            box = tuple(float(coordinate) for coordinate in value.split(","))
+        except ValueError:
+            box = ()
+
+        if (
+            len(box) != 4
+            or not -180 <= box[0] <= box[2] <= 180
+            or not -90 <= box[1] <= box[3] <= 90
+        ):
+            raise ParameterError(
+                key,
+                f"{key} parameter must be minimum longitude, minimum latitude, "
+                "maximum longitude and maximum latitude separated by commas",
+            )
+
+        return box
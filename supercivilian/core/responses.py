@@ -2,6 +2,15 @@ import typing
 
 from rest_framework.response import Response
 
+from . import tracing
+from .metrics import Histogram
+from .timing import span
+
+RENDER_DURATION = Histogram(
+    "supercivilian_render_duration_seconds",
+    "Time spent rendering API responses",
+)
+
 
 class APIResponse(Response):
     """Base response class for API responses.
@@ -42,6 +51,11 @@ class APIResponse(Response):
 
         super().__init__(response, status=status)
 
+    @property
+    def rendered_content(self) -> bytes:
+        with RENDER_DURATION.time(), span("render"), tracing.span("render"):
+            return super().rendered_content
+
 
 class APISuccessResponse(APIResponse):
     """Response class for successful API responses."""
@@ -0,0 +1,210 @@
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import cProfile
+import datetime
+import logging
+import os
+import random
+import re
+import threading
+import time
+import typing
+
+logger = logging.getLogger(__name__)
+
+_timings: contextvars.ContextVar[dict[str, list[float]] | None] = (
+    contextvars.ContextVar("timings", default=None)
+)
+# Only one request is profiled at a time, as profilers are process-wide.
+_profile_lock = threading.Lock()
+
+
+def start() -> contextvars.Token:
+    """Start collecting the timings of the spans of the current request.
+
+    Returns:
+        A token to pass to `stop`.
+    """
+    return _timings.set({})
+
+
+def stop(token: contextvars.Token) -> dict[str, list[float]]:
+    """Stop collecting the timings of the current request.
+
+    Args:
+        token: The token returned by `start`.
+
+    Returns:
+        The total duration (in seconds) and the number of every span, keyed
+        by name in the order the spans started.
+    """
+    timings = _timings.get() or {}
+    _timings.reset(token)
+
+    return timings
+
+
+@contextlib.contextmanager
+def span(name: str) -> typing.Iterator[None]:
+    """Time a stage of the current request, e.g. a cache lookup.
+
+    The durations of spans with the same name are added up. Outside of a
+    request, or with the `SERVER_TIMING` setting disabled, spans aren't timed.
+
+    Args:
+        name: The name of the span, a token as in the `Server-Timing` header.
+    """
+    if (timings := _timings.get()) is None:
+        yield
+        return
+
+    started = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - started
+
+        if (timing := timings.get(name)) is None:
+            timings[name] = [duration, 1]
+        else:
+            timing[0] += duration
+            timing[1] += 1
+
+
+def server_timing(timings: dict[str, list[float]], total: float) -> str:
+    """Format timings as a `Server-Timing` header.
+
+    Args:
+        timings: The timings, as returned by `stop`.
+        total: The duration of the whole request (in seconds).
+
+    Returns:
+        The header, with durations in milliseconds and the number of spans of
+        a name in the description if there was more than one.
+    """
+    metrics = [
+        f"{name};dur={duration * 1000:.3f}"
+        + (f';desc="{int(count)}x"' if count > 1 else "")
+        for name, (duration, count) in timings.items()
+    ]
+    metrics.append(f"total;dur={total * 1000:.3f}")
+
+    return ", ".join(metrics)
+
+
+class Profiler:
+    """Profile sampled requests and keep the profiles of slow ones.
+
+    A request is profiled if it is sampled at `rate`, or if it has the
+    `header` with the `token` as its value, which forces its profile to be
+    kept whatever its duration. Profiles are dumped in the `pstats` format to
+    `directory`, e.g. to inspect with `python -m pstats` or `snakeviz`.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        rate: float = 0.0,
+        threshold: float = 1.0,
+        header: str = "X-Profile",
+        token: str | None = None,
+    ) -> None:
+        """Initialize the profiler.
+
+        Args:
+            directory: The directory to dump the profiles to.
+            rate: The fraction of requests to profile. Defaults to 0.
+            threshold: The duration (in seconds) above which the profile of a
+                sampled request is kept. Defaults to 1 second.
+            header: The header that requests a profile. Defaults to
+                `X-Profile`.
+            token: The value of `header` that requests a profile. Defaults to
+                `None`, which means profiles can't be requested.
+        """
+        self.directory = directory
+        self.rate = rate
+        self.threshold = threshold
+        self.header = header
+        self.token = token
+
+    def requested(self, headers: typing.Mapping[str, str]) -> bool:
+        """Check whether a request asks to be profiled.
+
+        Args:
+            headers: The headers of the request.
+
+        Returns:
+            Whether the request has the header with the token.
+        """
+        return self.token is not None and headers.get(self.header) == self.token
+
+    def sampled(self) -> bool:
+        """Check whether to profile a request, at `rate`.
+
+        Returns:
+            Whether to profile the request.
+        """
+        return self.rate > 0 and random.random() < self.rate
+
+    @contextlib.contextmanager
+    def profile(self, name: str, force: bool = False) -> typing.Iterator[None]:
+        """Profile a block and dump the profile if it is slow.
+
+        Profiling is skipped if another request is being profiled.
+
+        Args:
+            name: The name of the profile, e.g. the endpoint, used in the file
+                name.
+            force: Whether to keep the profile whatever the duration. Defaults
+                to `False`.
+        """
+        if not _profile_lock.acquire(blocking=False):
+            yield
+            return
+
+        profiler = cProfile.Profile()
+
+        try:
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler, e.g. a debugger, is active.
+                yield
+                return
+
+            started = time.perf_counter()
+
+            try:
+                yield
+            finally:
+                profiler.disable()
+                duration = time.perf_counter() - started
+
+                if force or duration >= self.threshold:
+                    self._dump(profiler, name, duration)
+        finally:
+            _profile_lock.release()
+
+    def _dump(self, profiler: cProfile.Profile, name: str, duration: float) -> None:
+        """Dump a profile, named after the time, the name and the duration."""
+        path = os.path.join(
+            self.directory,
+            "{}-{}-{}ms.prof".format(
+                datetime.datetime.now(datetime.UTC).strftime("%Y%m%dT%H%M%S%f"),
+                re.sub(r"[^\w.-]+", "_", name),
+                round(duration * 1000),
+            ),
+        )
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            profiler.dump_stats(path)
+        except OSError:
+            logger.exception("Failed to dump the profile to %s", path)
+        else:
+            logger.info(
+                "Dumped the profile of a %.0f ms request to %s", duration * 1000, path
+            )
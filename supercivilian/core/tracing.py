@@ -0,0 +1,406 @@
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import dataclasses
+import json
+import logging
+import os
+import random
+import re
+import socket
+import sys
+import threading
+import time
+import typing
+
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# The trace ID and the ID of the current span (`None` at the root of a trace
+# without a remote parent) of the current request.
+_context: contextvars.ContextVar[tuple[str, str | None] | None] = (
+    contextvars.ContextVar("trace_context", default=None)
+)
+# The finished spans of the current trace, `None` if it isn't sampled.
+_spans: contextvars.ContextVar[list[Span] | None] = contextvars.ContextVar(
+    "trace_spans", default=None
+)
+_exporters: list[Exporter] = []
+_sample_rate = 1.0
+
+_TRACEPARENT = re.compile(
+    r"^00-(?P<trace_id>[0-9a-f]{32})-(?P<span_id>[0-9a-f]{16})"
+    r"-(?P<flags>[0-9a-f]{2})$"
+)
+# OpenTelemetry span kinds, see `SpanKind` in the OTLP protocol.
+_OTLP_KINDS = {"internal": 1, "server": 2, "client": 3}
+
+
+@dataclasses.dataclass
+class Span:
+    """A timed operation within a trace.
+
+    Attributes:
+        name: The name of the operation, e.g. `cache.get`.
+        trace_id: The ID of the trace, 32 hex digits.
+        span_id: The ID of the span, 16 hex digits.
+        parent_id: The ID of the parent span, or `None` for a root span.
+        kind: `internal`, `server` for requests or `client` for outbound
+            calls.
+        start_time: When the span started, in nanoseconds since the epoch.
+        end_time: When the span ended, in nanoseconds since the epoch, or
+            `None` while it is running.
+        attributes: The attributes of the operation, e.g. the cache key.
+        error: The exception the operation raised, if any.
+    """
+
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: str | None
+    kind: str = "internal"
+    start_time: int = dataclasses.field(default_factory=time.time_ns)
+    end_time: int | None = None
+    attributes: dict[str, typing.Any] = dataclasses.field(default_factory=dict)
+    error: str | None = None
+
+    def set_attribute(self, key: str, value: typing.Any) -> None:
+        """Set an attribute of the span.
+
+        Args:
+            key: The attribute, e.g. `http.status_code`.
+            value: A string, number or boolean.
+        """
+        self.attributes[key] = value
+
+    def update_name(self, name: str) -> None:
+        """Rename the span, e.g. once the route of a request is known.
+
+        Args:
+            name: The new name.
+        """
+        self.name = name
+
+    def dict(self) -> dict[str, typing.Any]:
+        """Get the span as a JSON serializable dictionary.
+
+        Returns:
+            The span, with its `duration` in milliseconds.
+        """
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "kind": self.kind,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "duration": (
+                (self.end_time - self.start_time) / 1e6
+                if self.end_time is not None
+                else None
+            ),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """Stands in for a span of a trace that isn't sampled."""
+
+    def set_attribute(self, key: str, value: typing.Any) -> None:
+        pass
+
+    def update_name(self, name: str) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+def _random_id(digits: int) -> str:
+    return f"{random.getrandbits(digits * 4):0{digits}x}"
+
+
+def configure(
+    exporters: typing.Iterable[dict[str, typing.Any]], sample_rate: float = 1.0
+) -> None:
+    """Configure where spans are exported to.
+
+    Args:
+        exporters: The exporters, as dictionaries with the dotted path of the
+            `Exporter` class as `class` and its keyword arguments.
+        sample_rate: The fraction of traces to record, unless the remote
+            parent is sampled. Defaults to 1.
+    """
+    global _sample_rate
+
+    _exporters[:] = [
+        import_string(options["class"])(
+            **{key: value for key, value in options.items() if key != "class"}
+        )
+        for options in exporters
+    ]
+    _sample_rate = sample_rate
+
+
+def current_ids() -> tuple[str | None, str | None]:
+    """Get the IDs of the current trace and span, e.g. for logs.
+
+    Returns:
+        The trace ID and the span ID, `None` outside of a request.
+    """
+    if (context := _context.get()) is None:
+        return None, None
+
+    return context
+
+
+@contextlib.contextmanager
+def trace(
+    name: str, traceparent: str | None = None, **attributes: typing.Any
+) -> typing.Iterator[Span | _NoopSpan]:
+    """Trace a request, exporting its spans once it is handled.
+
+    Every request gets a trace ID, for its logs, but only sampled traces
+    record spans and only if exporters are configured.
+
+    Args:
+        name: The name of the root span.
+        traceparent: The W3C `traceparent` header of the request. The trace
+            continues the remote one if it is valid.
+        **attributes: The attributes of the root span.
+
+    Yields:
+        The root span.
+    """
+    trace_id = parent_id = None
+    sampled = False
+
+    if traceparent is not None and (match := _TRACEPARENT.match(traceparent)):
+        trace_id, parent_id = match["trace_id"], match["span_id"]
+        sampled = bool(int(match["flags"], 16) & 1)
+
+    sampled = bool(_exporters) and (sampled or random.random() < _sample_rate)
+    spans: list[Span] | None = [] if sampled else None
+    context_token = _context.set((trace_id or _random_id(32), parent_id))
+    spans_token = _spans.set(spans)
+
+    try:
+        with span(name, kind="server", **attributes) as root:
+            yield root
+    finally:
+        _spans.reset(spans_token)
+        _context.reset(context_token)
+
+        if spans:
+            export(spans)
+
+
+@contextlib.contextmanager
+def span(
+    name: str, kind: str = "internal", **attributes: typing.Any
+) -> typing.Iterator[Span | _NoopSpan]:
+    """Trace an operation within the current trace.
+
+    Outside of a sampled trace the span isn't recorded. Exceptions are
+    recorded as the error of the span and re-raised.
+
+    Args:
+        name: The name of the operation, e.g. `cache.get`.
+        kind: `internal`, or `client` for outbound calls. Defaults to
+            `internal`.
+        **attributes: The attributes of the span.
+
+    Yields:
+        The span, to set attributes known once the operation is done.
+    """
+    if (spans := _spans.get()) is None or (context := _context.get()) is None:
+        yield _NOOP
+        return
+
+    trace_id, parent_id = context
+    current = Span(
+        name,
+        trace_id=trace_id,
+        span_id=_random_id(16),
+        parent_id=parent_id,
+        kind=kind,
+        attributes=attributes,
+    )
+    token = _context.set((trace_id, current.span_id))
+
+    try:
+        yield current
+    except BaseException as error:
+        current.error = f"{type(error).__name__}: {error}"
+        raise
+    finally:
+        current.end_time = time.time_ns()
+        _context.reset(token)
+        spans.append(current)
+
+
+def export(spans: list[Span]) -> None:
+    """Export the spans of a trace to every exporter.
+
+    Failing exporters are logged and don't fail the request.
+
+    Args:
+        spans: The finished spans.
+    """
+    for exporter in _exporters:
+        try:
+            exporter.export(spans)
+        except Exception:
+            logger.exception("Failed to export spans with %r", exporter)
+
+
+class Exporter:
+    """Exports the spans of traces, e.g. to a file or a collector.
+
+    Exporters are called with the spans of every sampled trace once the
+    request is handled, so they should be fast.
+    """
+
+    def export(self, spans: list[Span]) -> None:
+        """Export the spans of a trace.
+
+        Args:
+            spans: The finished spans, children before their parents.
+        """
+        raise NotImplementedError
+
+
+class FileExporter(Exporter):
+    """Write spans as JSON lines to a file or to standard output.
+
+    The `otlp` format writes a line per trace in the OTLP/JSON encoding of
+    OpenTelemetry, which the `otlpjsonfile` receiver of the OpenTelemetry
+    Collector can read. The `json` format writes a line per span, see
+    `Span.dict`.
+    """
+
+    def __init__(
+        self,
+        path: str = "-",
+        format: typing.Literal["otlp", "json"] = "otlp",
+        service_name: str = "supercivilian",
+    ) -> None:
+        """Initialize the exporter.
+
+        Args:
+            path: The file to append to, or `-` for standard output. `{pid}`
+                is replaced with the process ID, to write a file per worker.
+                Defaults to `-`.
+            format: `otlp` or `json`. Defaults to `otlp`.
+            service_name: The `service.name` of the spans. Defaults to
+                `supercivilian`.
+        """
+        if format not in ("otlp", "json"):
+            raise ValueError(f"Unknown trace format {format!r}")
+
+        self.path = path
+        self.format = format
+        self.resource = {
+            "service.name": service_name,
+            "host.name": socket.gethostname(),
+            "process.pid": os.getpid(),
+        }
+
+        self._lock = threading.Lock()
+
+    def export(self, spans: list[Span]) -> None:
+        if self.format == "otlp":
+            lines = [json.dumps(otlp(spans, self.resource), separators=(",", ":"))]
+        else:
+            lines = [
+                json.dumps({**span.dict(), "resource": self.resource}) for span in spans
+            ]
+
+        content = "".join(f"{line}\n" for line in lines)
+
+        with self._lock:
+            if self.path == "-":
+                sys.stdout.write(content)
+                sys.stdout.flush()
+            else:
+                with open(self.path.format(pid=os.getpid()), "a") as file:
+                    file.write(content)
+
+
+def otlp(spans: list[Span], resource: dict[str, typing.Any]) -> dict[str, typing.Any]:
+    """Encode spans as an OTLP/JSON `ExportTraceServiceRequest`.
+
+    Args:
+        spans: The spans.
+        resource: The attributes of the resource, e.g. `service.name`.
+
+    Returns:
+        The request, ready to be serialized to JSON.
+    """
+    return {
+        "resourceSpans": [
+            {
+                "resource": {"attributes": _otlp_attributes(resource)},
+                "scopeSpans": [
+                    {
+                        "scope": {"name": "supercivilian"},
+                        "spans": [
+                            {
+                                "traceId": span.trace_id,
+                                "spanId": span.span_id,
+                                "parentSpanId": span.parent_id or "",
+                                "name": span.name,
+                                "kind": _OTLP_KINDS.get(span.kind, 1),
+                                "startTimeUnixNano": str(span.start_time),
+                                "endTimeUnixNano": str(span.end_time),
+                                "attributes": _otlp_attributes(span.attributes),
+                                "status": (
+                                    {"code": 2, "message": span.error}
+                                    if span.error is not None
+                                    else {"code": 0}
+                                ),
+                            }
+                            for span in spans
+                        ],
+                    }
+                ],
+            }
+        ]
+    }
+
+
+def _otlp_attributes(attributes: dict[str, typing.Any]) -> list[dict[str, typing.Any]]:
+    """Encode attributes as OTLP/JSON key-values."""
+    encoded = []
+
+    for key, value in attributes.items():
+        if isinstance(value, bool):
+            encoded_value = {"boolValue": value}
+        elif isinstance(value, int):
+            encoded_value = {"intValue": str(value)}
+        elif isinstance(value, float):
+            encoded_value = {"doubleValue": value}
+        else:
+            encoded_value = {"stringValue": str(value)}
+
+        encoded.append({"key": key, "value": encoded_value})
+
+    return encoded
+
+
+class TraceFilter(logging.Filter):
+    """Add the `trace_id` and `span_id` of the current request to log records.
+
+    Both are `-` outside of a request.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        trace_id, span_id = current_ids()
+        record.trace_id = trace_id or "-"
+        record.span_id = span_id or "-"
+
+        return True
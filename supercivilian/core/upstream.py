@@ -0,0 +1,1222 @@
+from __future__ import annotations
+
+import collections
+import concurrent.futures
+import contextlib
+import contextvars
+import dataclasses
+import hashlib
+import heapq
+import itertools
+import json
+import logging
+import re
+import socket
+import threading
+import time
+import typing
+
+import requests
+import requests.adapters
+import urllib3
+import urllib3.connection
+from django.conf import settings
+
+from . import tracing
+from .cache import lookup, store
+from .metrics import Counter, Gauge, Histogram
+from .timing import span
+
+logger = logging.getLogger(__name__)
+
+CIRCUIT_STATE = Gauge(
+    "supercivilian_upstream_circuit_state",
+    "State of the upstream circuit breaker (0 closed, 1 open, 2 half-open)",
+)
+CIRCUIT_TRANSITIONS = Counter(
+    "supercivilian_upstream_circuit_transitions_total",
+    "Number of upstream circuit breaker state transitions",
+)
+CIRCUIT_REJECTIONS = Counter(
+    "supercivilian_upstream_circuit_rejections_total",
+    "Number of upstream calls rejected by an open circuit breaker",
+)
+CIRCUIT_PROBES = Counter(
+    "supercivilian_upstream_circuit_probes_total",
+    "Number of half-open probe calls by outcome",
+)
+UPSTREAM_REQUESTS = Counter(
+    "supercivilian_upstream_requests_total",
+    "Number of calls made to an upstream",
+)
+HEDGES = Counter(
+    "supercivilian_upstream_hedges_total",
+    "Number of hedged duplicate calls made to an upstream",
+)
+HEDGE_WINS = Counter(
+    "supercivilian_upstream_hedge_wins_total",
+    "Number of hedged calls that answered before the original call",
+)
+HEDGE_DELAY = Gauge(
+    "supercivilian_upstream_hedge_delay_seconds",
+    "Current delay after which a duplicate call is made to an upstream",
+)
+CONCURRENCY_LIMIT = Gauge(
+    "supercivilian_upstream_concurrency_limit",
+    "Current adaptive limit of concurrent calls to an upstream",
+    multiprocess_mode="sum",
+)
+IN_FLIGHT = Gauge(
+    "supercivilian_upstream_in_flight",
+    "Number of calls to an upstream in flight",
+    multiprocess_mode="sum",
+)
+SHED = Counter(
+    "supercivilian_upstream_shed_total",
+    "Number of upstream calls shed by the concurrency limiter",
+)
+UPSTREAM_RESPONSES = Counter(
+    "supercivilian_upstream_responses_total",
+    "Number of upstream calls by status code, or `error` if the call failed",
+)
+UPSTREAM_DURATION = Histogram(
+    "supercivilian_upstream_request_duration_seconds",
+    "Duration of calls to an upstream, including hedged calls",
+)
+STALE_RESPONSES = Counter(
+    "supercivilian_upstream_stale_responses_total",
+    "Number of upstream calls answered with stale cached data",
+)
+
+# Query string parameters holding credentials, e.g. the Maps Platform API key.
+_SECRET_PARAMETERS = re.compile(r"([?&](?:key|token|signature)=)[^&#]*")
+_stale: contextvars.ContextVar[bool] = contextvars.ContextVar("stale", default=False)
+
+
+class UpstreamUnavailableError(Exception):
+    """Raised when an upstream can't be called and there is no fallback."""
+
+    def __init__(
+        self, upstream: str, message: str = None, retry_after: int | None = None
+    ) -> None:
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+        super().__init__(message or "Service temporarily unavailable")
+
+
+@dataclasses.dataclass
+class UpstreamResponse:
+    """The response of an upstream call.
+
+    Mirrors the parts of `requests.Response` used by the views, so call sites
+    don't have to care whether the response is live or served from the stale
+    cache.
+    """
+
+    status_code: int
+    content: bytes
+    content_type: str | None = None
+    stale: bool = False
+
+    _json: typing.Any = dataclasses.field(default=None, init=False, repr=False)
+
+    def json(self) -> typing.Any:
+        """Decode the response content as JSON.
+
+        The decoded content is memoized, so repeated calls are cheap.
+
+        Raises:
+            ValueError: If the content is not valid JSON.
+        """
+        if self._json is None:
+            self._json = json.loads(self.content)
+
+        return self._json
+
+    def raise_for_status(self) -> None:
+        """Raise an error if the response has an error status code.
+
+        Raises:
+            requests.HTTPError: If the status code is 400 or above.
+        """
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"Upstream responded with {self.status_code}")
+
+
+class CircuitBreaker:
+    """A failure rate and latency based circuit breaker.
+
+    The breaker keeps the outcomes of the last `window` calls. Once at least
+    `minimum_calls` are recorded and either the failure rate or the slow call
+    rate reaches its threshold, the circuit opens and calls are rejected for
+    `open_duration` seconds. After that the circuit is half-open and lets
+    `half_open_calls` probes through; a successful probe closes the circuit,
+    a failed or slow one opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    _STATE_VALUES = {CLOSED: 0, OPEN: 1, HALF_OPEN: 2}
+
+    def __init__(
+        self,
+        name: str,
+        window: int = 20,
+        minimum_calls: int = 10,
+        failure_rate: float = 0.5,
+        slow_call_duration: float = 2.5,
+        slow_call_rate: float = 0.8,
+        open_duration: float = 30,
+        half_open_calls: int = 1,
+    ) -> None:
+        """Initialize the circuit breaker.
+
+        Args:
+            name: The name of the upstream, used as the metrics label.
+            window: The number of recent calls to consider. Defaults to 20.
+            minimum_calls: The number of calls needed before the circuit can
+                open. Defaults to 10.
+            failure_rate: The failure rate at which the circuit opens.
+                Defaults to 0.5.
+            slow_call_duration: The duration in seconds after which a call is
+                considered slow. Defaults to 2.5.
+            slow_call_rate: The slow call rate at which the circuit opens.
+                Defaults to 0.8.
+            open_duration: How long the circuit stays open in seconds.
+                Defaults to 30.
+            half_open_calls: The number of concurrent probes allowed while
+                half-open. Defaults to 1.
+        """
+        self.name = name
+        self.minimum_calls = minimum_calls
+        self.failure_rate = failure_rate
+        self.slow_call_duration = slow_call_duration
+        self.slow_call_rate = slow_call_rate
+        self.open_duration = open_duration
+        self.half_open_calls = half_open_calls
+
+        self._outcomes: collections.deque[tuple[bool, bool]] = collections.deque(
+            maxlen=window
+        )
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probes = 0
+        self._lock = threading.Lock()
+
+        CIRCUIT_STATE.set(0, upstream=name)
+
+    @property
+    def state(self) -> str:
+        """The current state of the circuit."""
+        with self._lock:
+            return self._current_state()
+
+    def retry_after(self) -> int:
+        """Get the number of seconds until the circuit lets calls through.
+
+        Returns:
+            The number of seconds, at least 1.
+        """
+        with self._lock:
+            remaining = self._opened_at + self.open_duration - time.monotonic()
+
+        return max(1, int(remaining + 0.999))
+
+    def allow(self) -> bool:
+        """Check whether a call may be made.
+
+        Every allowed call must be followed by a call to `record`.
+
+        Returns:
+            `True` if the call may be made, else `False`.
+        """
+        with self._lock:
+            state = self._current_state()
+
+            if state == self.CLOSED:
+                return True
+
+            if state == self.HALF_OPEN and self._probes < self.half_open_calls:
+                self._probes += 1
+                return True
+
+        CIRCUIT_REJECTIONS.inc(upstream=self.name)
+
+        return False
+
+    def cancel(self) -> None:
+        """Give back an allowed call that was never made."""
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._probes -= 1
+
+    def record(self, duration: float, success: bool) -> None:
+        """Record the outcome of an allowed call.
+
+        Args:
+            duration: The duration of the call in seconds.
+            success: Whether the call succeeded.
+        """
+        slow = duration >= self.slow_call_duration
+
+        with self._lock:
+            if self._state == self.HALF_OPEN:
+                self._probes -= 1
+                healthy = success and not slow
+
+                CIRCUIT_PROBES.inc(
+                    upstream=self.name, outcome="success" if healthy else "failure"
+                )
+
+                if healthy:
+                    self._outcomes.clear()
+                    self._transition(self.CLOSED)
+                else:
+                    self._open()
+
+                return
+
+            if self._state == self.OPEN:
+                return
+
+            self._outcomes.append((not success, slow))
+
+            if len(self._outcomes) < self.minimum_calls:
+                return
+
+            failures = sum(1 for failed, _ in self._outcomes if failed)
+            slow_calls = sum(1 for _, slow in self._outcomes if slow)
+
+            if (
+                failures / len(self._outcomes) >= self.failure_rate
+                or slow_calls / len(self._outcomes) >= self.slow_call_rate
+            ):
+                self._open()
+
+    def _current_state(self) -> str:
+        """Get the current state, moving from open to half-open once the open
+        duration has passed. Must be called with the lock held.
+        """
+        if (
+            self._state == self.OPEN
+            and time.monotonic() - self._opened_at >= self.open_duration
+        ):
+            self._probes = 0
+            self._transition(self.HALF_OPEN)
+
+        return self._state
+
+    def _open(self) -> None:
+        """Open the circuit. Must be called with the lock held."""
+        self._opened_at = time.monotonic()
+        self._transition(self.OPEN)
+
+        logger.warning("Circuit breaker for %s opened", self.name)
+
+    def _transition(self, state: str) -> None:
+        """Move to a new state. Must be called with the lock held."""
+        self._state = state
+
+        CIRCUIT_STATE.set(self._STATE_VALUES[state], upstream=self.name)
+        CIRCUIT_TRANSITIONS.inc(upstream=self.name, state=state)
+
+
+class ConcurrencyLimiter:
+    """An adaptive limit on the number of concurrent calls to an upstream.
+
+    Calls over the limit wait in a queue of at most `queue_size` calls for up
+    to `queue_timeout` seconds and are shed once the queue is full or the wait
+    times out. The limit adapts AIMD style: every fast, successful call raises
+    it by `1 / limit`, every failed call or call slower than `latency_target`
+    multiplies it by `backoff`.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial_limit: int = 10,
+        minimum_limit: int = 1,
+        maximum_limit: int = 50,
+        queue_size: int = 10,
+        queue_timeout: float = 0.5,
+        latency_target: float = 1,
+        backoff: float = 0.9,
+    ) -> None:
+        """Initialize the limiter.
+
+        Args:
+            name: The name of the upstream, used as the metrics label.
+            initial_limit: The initial limit. Defaults to 10.
+            minimum_limit: The lower bound of the limit. Defaults to 1.
+            maximum_limit: The upper bound of the limit. Defaults to 50.
+            queue_size: The maximum number of waiting calls. Defaults to 10.
+            queue_timeout: How long a call may wait for a slot in seconds.
+                Defaults to 0.5.
+            latency_target: The duration in seconds above which a call is a
+                sign of overload. Defaults to 1.
+            backoff: The factor the limit is multiplied by on overload.
+                Defaults to 0.9.
+        """
+        self.name = name
+        self.minimum_limit = minimum_limit
+        self.maximum_limit = maximum_limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.latency_target = latency_target
+        self.backoff = backoff
+
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._waiting = 0
+        self._condition = threading.Condition()
+
+        CONCURRENCY_LIMIT.set(initial_limit, upstream=name)
+        IN_FLIGHT.set(0, upstream=name)
+
+    @property
+    def limit(self) -> int:
+        """The current limit."""
+        return int(self._limit)
+
+    def acquire(self) -> None:
+        """Wait for a slot to make a call in.
+
+        Every acquired slot must be given back with `release`.
+
+        Raises:
+            UpstreamUnavailableError: If the call is shed.
+        """
+        with self._condition:
+            if self._in_flight < int(self._limit):
+                self._take()
+                return
+
+            if self._waiting >= self.queue_size:
+                self._shed("queue_full")
+
+            self._waiting += 1
+
+            try:
+                deadline = time.monotonic() + self.queue_timeout
+
+                while self._in_flight >= int(self._limit):
+                    if (remaining := deadline - time.monotonic()) <= 0:
+                        self._shed("queue_timeout")
+
+                    self._condition.wait(remaining)
+            finally:
+                self._waiting -= 1
+
+            self._take()
+
+    def try_acquire(self) -> bool:
+        """Take a slot if one is free, without waiting or being shed.
+
+        Calls waiting in the queue go first. A slot taken must be given back
+        with `release`.
+
+        Returns:
+            Whether a slot was taken.
+        """
+        with self._condition:
+            if self._waiting or self._in_flight >= int(self._limit):
+                return False
+
+            self._take()
+
+            return True
+
+    def release(self, duration: float, success: bool) -> None:
+        """Give back a slot and adapt the limit to the outcome of the call.
+
+        Args:
+            duration: The duration of the call in seconds.
+            success: Whether the call succeeded.
+        """
+        with self._condition:
+            self._in_flight -= 1
+
+            if success and duration <= self.latency_target:
+                self._limit = min(self.maximum_limit, self._limit + 1 / self._limit)
+            else:
+                self._limit = max(self.minimum_limit, self._limit * self.backoff)
+
+            self._condition.notify()
+
+            CONCURRENCY_LIMIT.set(int(self._limit), upstream=self.name)
+            IN_FLIGHT.set(self._in_flight, upstream=self.name)
+
+    def cancel(self) -> None:
+        """Give back a slot without adapting the limit, e.g. for a call that
+        was aborted."""
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify()
+
+            IN_FLIGHT.set(self._in_flight, upstream=self.name)
+
+    def _take(self) -> None:
+        """Take a slot. Must be called with the lock held."""
+        self._in_flight += 1
+
+        IN_FLIGHT.set(self._in_flight, upstream=self.name)
+
+    def _shed(self, reason: str) -> typing.NoReturn:
+        """Shed a call. Must be called with the lock held."""
+        SHED.inc(upstream=self.name, reason=reason)
+
+        raise UpstreamUnavailableError(self.name, retry_after=1)
+
+
+class _Cancellation:
+    """Aborts the HTTP requests made within it, from any thread.
+
+    Requests made with `_http_get` while the cancellation is active register
+    their sockets with it. Cancelling shuts the sockets down, which makes the
+    blocked request fail at once with a `requests.ConnectionError`.
+    """
+
+    def __init__(self) -> None:
+        self.cancelled = False
+
+        self._sockets: list[socket.socket] = []
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def active(self) -> typing.Iterator[None]:
+        """Register the requests made in the block with the cancellation."""
+        token = _cancellation.set(self)
+
+        try:
+            yield
+        finally:
+            _cancellation.reset(token)
+
+    def add(self, sock: socket.socket) -> None:
+        """Register the socket of a request, shutting it down if cancelled."""
+        with self._lock:
+            if not self.cancelled:
+                self._sockets.append(sock)
+                return
+
+        _shutdown(sock)
+
+    def cancel(self) -> None:
+        """Abort the requests made within the cancellation."""
+        with self._lock:
+            self.cancelled = True
+            sockets, self._sockets = self._sockets, []
+
+        for sock in sockets:
+            _shutdown(sock)
+
+
+_cancellation: contextvars.ContextVar[_Cancellation | None] = contextvars.ContextVar(
+    "cancellation", default=None
+)
+
+
+def _shutdown(sock: socket.socket) -> None:
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        # Already closed.
+        pass
+
+
+class _CancellableConnection(urllib3.connection.HTTPConnection):
+    def connect(self) -> None:
+        super().connect()
+
+        if (cancellation := _cancellation.get()) is not None:
+            cancellation.add(self.sock)
+
+
+class _CancellableHTTPSConnection(urllib3.connection.HTTPSConnection):
+    def connect(self) -> None:
+        super().connect()
+
+        if (cancellation := _cancellation.get()) is not None:
+            cancellation.add(self.sock)
+
+
+class _CancellableConnectionPool(urllib3.HTTPConnectionPool):
+    ConnectionCls = _CancellableConnection
+
+
+class _CancellableHTTPSConnectionPool(urllib3.HTTPSConnectionPool):
+    ConnectionCls = _CancellableHTTPSConnection
+
+
+class _CancellableAdapter(requests.adapters.HTTPAdapter):
+    """A `requests` adapter whose connections register with the active
+    `_Cancellation`."""
+
+    def init_poolmanager(self, *args: typing.Any, **kwargs: typing.Any) -> None:
+        super().init_poolmanager(*args, **kwargs)
+
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CancellableConnectionPool,
+            "https": _CancellableHTTPSConnectionPool,
+        }
+
+
+def _http_get(url: str, timeout: float | tuple[float, float]) -> requests.Response:
+    """Make a GET request that the active `_Cancellation` can abort.
+
+    Like `requests.get`, every request has its own session, so a connection is
+    never shared with another request and cancelling only aborts this one.
+    """
+    with requests.Session() as session:
+        adapter = _CancellableAdapter()
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+        return session.get(url, timeout=timeout)
+
+
+class _Scheduler:
+    """Runs callbacks after a delay on a single background thread.
+
+    Cheaper than a timer thread per call for hedges, which are cancelled
+    unless the call is slow.
+    """
+
+    def __init__(self) -> None:
+        self._heap: list[tuple[float, int, list[typing.Callable[[], None] | None]]] = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread: threading.Thread | None = None
+
+    def schedule(
+        self, delay: float, callback: typing.Callable[[], None]
+    ) -> typing.Callable[[], None]:
+        """Run a callback after a delay.
+
+        Args:
+            delay: The delay in seconds.
+            callback: The callback. It should return quickly.
+
+        Returns:
+            A function cancelling the callback, unless it already started.
+        """
+        entry: list[typing.Callable[[], None] | None] = [callback]
+
+        with self._condition:
+            heapq.heappush(
+                self._heap, (time.monotonic() + delay, next(self._counter), entry)
+            )
+
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="upstream-hedge-scheduler", daemon=True
+                )
+                self._thread.start()
+
+            self._condition.notify()
+
+        def cancel() -> None:
+            entry[0] = None
+
+        return cancel
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while (
+                    not self._heap
+                    or (remaining := self._heap[0][0] - time.monotonic()) > 0
+                ):
+                    self._condition.wait(remaining if self._heap else None)
+
+                _, _, entry = heapq.heappop(self._heap)
+
+            if (callback := entry[0]) is not None:
+                try:
+                    callback()
+                except Exception:
+                    logger.exception("Scheduled upstream callback failed")
+
+
+class _Race:
+    """The state of a hedged call, shared by the primary and the hedge."""
+
+    def __init__(self, primary: _Cancellation) -> None:
+        self.primary = primary
+        self.hedge: concurrent.futures.Future | None = None
+        self.hedge_cancellation: _Cancellation | None = None
+        # Set once a call won or the primary gave up, after which no hedge is
+        # started.
+        self.winner: str | None = None
+        self.settled = False
+        self.lock = threading.Lock()
+
+    def claim(self, call: str) -> bool:
+        """Claim the win for a call, unless the other call won already."""
+        with self.lock:
+            if self.winner is not None:
+                return False
+
+            self.winner = call
+            self.settled = True
+
+            return True
+
+    def settle(self) -> concurrent.futures.Future | None:
+        """Stop a hedge from starting and get the started hedge, if any."""
+        with self.lock:
+            self.settled = True
+
+            return self.hedge
+
+
+class Hedger:
+    """Hedges slow calls by making a duplicate call.
+
+    If a call hasn't answered after the `percentile` latency of recent
+    successful calls, a duplicate is made and whichever answers first is used.
+    Every call earns `budget` tokens and every hedge spends one, so hedges are
+    capped at a `budget` fraction of the calls.
+
+    The original call runs on the calling thread and only hedges run on a
+    shared thread pool, so calls never queue behind each other. The call
+    that loses the race is aborted.
+    """
+
+    _executor: concurrent.futures.ThreadPoolExecutor | None = None
+    _scheduler: _Scheduler | None = None
+    _executor_lock = threading.Lock()
+
+    def __init__(
+        self,
+        name: str,
+        percentile: float = 0.95,
+        initial_delay: float = 1,
+        minimum_delay: float = 0.05,
+        budget: float = 0.1,
+        window: int = 200,
+        minimum_samples: int = 20,
+    ) -> None:
+        """Initialize the hedger.
+
+        Args:
+            name: The name of the upstream, used as the metrics label.
+            percentile: The latency percentile after which a call is hedged.
+                Defaults to 0.95.
+            initial_delay: The delay in seconds used until enough latencies
+                are sampled. Defaults to 1.
+            minimum_delay: The lower bound of the delay in seconds.
+                Defaults to 0.05.
+            budget: The maximum fraction of calls that may be hedged.
+                Defaults to 0.1.
+            window: The number of recent latencies to sample. Defaults to 200.
+            minimum_samples: The number of latencies needed before the
+                percentile is used. Defaults to 20.
+        """
+        self.name = name
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.minimum_delay = minimum_delay
+        self.budget = budget
+        self.minimum_samples = minimum_samples
+
+        self._latencies: collections.deque[float] = collections.deque(maxlen=window)
+        self._tokens = 0.0
+        self._lock = threading.Lock()
+
+        HEDGE_DELAY.set(initial_delay, upstream=name)
+
+    def delay(self) -> float:
+        """Get the current hedging delay.
+
+        Returns:
+            The delay in seconds.
+        """
+        with self._lock:
+            if len(self._latencies) < self.minimum_samples:
+                return self.initial_delay
+
+            latencies = sorted(self._latencies)
+
+        index = min(len(latencies) - 1, int(len(latencies) * self.percentile))
+
+        return max(self.minimum_delay, latencies[index])
+
+    def call(
+        self,
+        function: typing.Callable[[], requests.Response],
+        limiter: ConcurrencyLimiter | None = None,
+    ) -> requests.Response:
+        """Call a function, hedging it if it is slow.
+
+        The function must be idempotent, as it may be called twice, and make
+        its requests with `_http_get`, so the losing call can be aborted.
+
+        Args:
+            function: The function making the upstream call.
+            limiter: The concurrency limiter of the upstream, if any. A hedge
+                takes a slot of its own and isn't made if none is free.
+
+        Returns:
+            The response of whichever call answered first.
+
+        Raises:
+            requests.RequestException: If every call failed.
+        """
+        with self._lock:
+            self._tokens = min(self._tokens + self.budget, 10)
+
+        delay = self.delay()
+        HEDGE_DELAY.set(delay, upstream=self.name)
+
+        # The hedge runs in the context of the caller, e.g. to trace it.
+        context = contextvars.copy_context()
+        race = _Race(_Cancellation())
+        cancel_hedge = self._get_scheduler().schedule(
+            delay, lambda: self._start_hedge(function, limiter, race, context)
+        )
+
+        try:
+            with race.primary.active():
+                response = self._timed(function)
+        except requests.RequestException:
+            if (hedge := race.settle()) is None:
+                raise
+
+            # The primary failed or was aborted because the hedge won.
+            return hedge.result()
+        finally:
+            cancel_hedge()
+
+        if not race.claim("primary"):
+            # The hedge answered first, as the primary was finishing.
+            response.close()
+
+            return race.hedge.result()
+
+        if race.hedge is not None:
+            race.hedge_cancellation.cancel()
+            race.hedge.add_done_callback(_close_response)
+
+        return response
+
+    def _start_hedge(
+        self,
+        function: typing.Callable[[], requests.Response],
+        limiter: ConcurrencyLimiter | None,
+        race: _Race,
+        context: contextvars.Context,
+    ) -> None:
+        """Start a hedge of a slow call, if the budget and a slot allow it."""
+        with race.lock:
+            if race.settled:
+                return
+
+            with self._lock:
+                if self._tokens < 1:
+                    return
+
+                self._tokens -= 1
+
+            if limiter is not None and not limiter.try_acquire():
+                with self._lock:
+                    self._tokens += 1
+
+                return
+
+            HEDGES.inc(upstream=self.name)
+            UPSTREAM_REQUESTS.inc(upstream=self.name)
+
+            race.hedge_cancellation = _Cancellation()
+            race.hedge = self._get_executor().submit(
+                context.run, self._hedge, function, limiter, race
+            )
+
+    def _hedge(
+        self,
+        function: typing.Callable[[], requests.Response],
+        limiter: ConcurrencyLimiter | None,
+        race: _Race,
+    ) -> requests.Response:
+        """Make the hedge of a call and abort the primary if it wins."""
+        start = time.monotonic()
+        success = False
+
+        try:
+            with race.hedge_cancellation.active():
+                response = self._timed(function)
+
+            success = response.status_code < 500 and response.status_code != 429
+        finally:
+            if limiter is not None and race.hedge_cancellation.cancelled:
+                # Aborted as the primary won, which says nothing of the load.
+                limiter.cancel()
+            elif limiter is not None:
+                limiter.release(time.monotonic() - start, success)
+
+        if race.claim("hedge"):
+            HEDGE_WINS.inc(upstream=self.name)
+            race.primary.cancel()
+
+        return response
+
+    def _timed(
+        self, function: typing.Callable[[], requests.Response]
+    ) -> requests.Response:
+        """Call a function and sample its latency if it succeeds."""
+        start = time.monotonic()
+        response = function()
+
+        with self._lock:
+            self._latencies.append(time.monotonic() - start)
+
+        return response
+
+    @classmethod
+    def _get_executor(cls) -> concurrent.futures.ThreadPoolExecutor:
+        """Get the thread pool running the hedges of all hedgers."""
+        if cls._executor is None:
+            with cls._executor_lock:
+                if cls._executor is None:
+                    cls._executor = concurrent.futures.ThreadPoolExecutor(
+                        max_workers=32, thread_name_prefix="upstream-hedge"
+                    )
+
+        return cls._executor
+
+    @classmethod
+    def _get_scheduler(cls) -> _Scheduler:
+        """Get the scheduler starting the hedges of all hedgers."""
+        if cls._scheduler is None:
+            with cls._executor_lock:
+                if cls._scheduler is None:
+                    cls._scheduler = _Scheduler()
+
+        return cls._scheduler
+
+
+def _close_response(future: concurrent.futures.Future) -> None:
+    """Close the response of a call that lost the hedging race."""
+    if future.exception() is None:
+        future.result().close()
+
+
+class Upstream:
+    """An external HTTP service guarded by a circuit breaker.
+
+    Successful responses are additionally stored in the cache for
+    `stale_timeout` seconds, so they can be served when the circuit is open or
+    the call fails.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        timeout: float | tuple[float, float] = 10,
+        stale_timeout: int | None = None,
+        circuit_breaker: dict[str, typing.Any] | None = None,
+        hedging: dict[str, typing.Any] | None = None,
+        concurrency: dict[str, typing.Any] | None = None,
+    ) -> None:
+        """Initialize the upstream.
+
+        Args:
+            name: The name of the upstream.
+            timeout: The `requests` timeout of a call. Defaults to 10 seconds.
+            stale_timeout: How long successful responses are kept as a stale
+                fallback, in seconds. Defaults to `None`, which disables the
+                fallback.
+            circuit_breaker: Keyword arguments for the `CircuitBreaker`.
+            hedging: Keyword arguments for the `Hedger`. Defaults to `None`,
+                which disables hedging. Only enable it for idempotent calls.
+            concurrency: Keyword arguments for the `ConcurrencyLimiter`.
+                Defaults to `None`, which disables the limit.
+        """
+        self.name = name
+        self.timeout = timeout
+        self.stale_timeout = stale_timeout
+        self.breaker = CircuitBreaker(name, **(circuit_breaker or {}))
+        self.hedger = Hedger(name, **hedging) if hedging is not None else None
+        self.limiter = (
+            ConcurrencyLimiter(name, **concurrency) if concurrency is not None else None
+        )
+
+    def get(
+        self,
+        url: str,
+        cacheable: typing.Callable[[UpstreamResponse], bool] | None = None,
+    ) -> UpstreamResponse:
+        """Make a GET request to the upstream.
+
+        Args:
+            url: The URL to request.
+            cacheable: If provided, only 200 responses for which it returns
+                `True` are kept as a stale fallback. Useful for APIs that
+                report errors in the body of a 200 response.
+
+        Returns:
+            The live response, or a stale one if the circuit is open, the call
+            was shed or failed and a stale response is cached.
+
+        Raises:
+            UpstreamUnavailableError: If the circuit is open or the call was
+                shed and there is no stale response.
+            requests.RequestException: If the call failed and there is no
+                stale response.
+        """
+        with tracing.span("upstream", upstream=self.name) as current:
+            response = self._get(url, cacheable)
+            current.set_attribute("stale", response.stale)
+
+        return response
+
+    def _get(
+        self,
+        url: str,
+        cacheable: typing.Callable[[UpstreamResponse], bool] | None = None,
+    ) -> UpstreamResponse:
+        """Make a GET request to the upstream, see `get`."""
+        if not self.breaker.allow():
+            if (response := self.get_stale(url)) is not None:
+                return response
+
+            raise UpstreamUnavailableError(
+                self.name, retry_after=self.breaker.retry_after()
+            )
+
+        start = time.monotonic()
+
+        try:
+            with span(self.name):
+                response = self._request(url)
+        except UpstreamUnavailableError:
+            self.breaker.cancel()
+
+            if (stale := self.get_stale(url)) is not None:
+                return stale
+
+            raise
+        except requests.RequestException:
+            self.breaker.record(time.monotonic() - start, success=False)
+
+            if (stale := self.get_stale(url)) is not None:
+                return stale
+
+            raise
+        except BaseException:
+            # Any other failure still ends the call, e.g. a half-open probe.
+            self.breaker.record(time.monotonic() - start, success=False)
+            raise
+
+        self.breaker.record(
+            time.monotonic() - start,
+            success=response.status_code < 500 and response.status_code != 429,
+        )
+
+        if response.status_code >= 500 and (stale := self.get_stale(url)):
+            return stale
+
+        result = UpstreamResponse(
+            status_code=response.status_code,
+            content=response.content,
+            content_type=response.headers.get("Content-Type"),
+        )
+
+        if (
+            response.status_code == 200
+            and self.stale_timeout is not None
+            and (cacheable is None or cacheable(result))
+        ):
+            store(
+                _stale_cache_key_for_url(self.name, url),
+                (result.content, result.content_type),
+                timeout=self.stale_timeout,
+            )
+
+        return result
+
+    def _request(self, url: str) -> requests.Response:
+        """Make the HTTP request within the concurrency limit, hedging it if
+        enabled.
+
+        Args:
+            url: The URL to request.
+
+        Returns:
+            The `requests` response.
+
+        Raises:
+            UpstreamUnavailableError: If the call was shed.
+        """
+        if self.limiter is not None:
+            self.limiter.acquire()
+
+        UPSTREAM_REQUESTS.inc(upstream=self.name)
+
+        start = time.monotonic()
+        success = False
+        status = "error"
+
+        try:
+            if self.hedger is None:
+                response = self._fetch(url)
+            else:
+                response = self.hedger.call(lambda: self._fetch(url), self.limiter)
+
+            success = response.status_code < 500 and response.status_code != 429
+            status = str(response.status_code)
+
+            return response
+        finally:
+            duration = time.monotonic() - start
+
+            UPSTREAM_RESPONSES.inc(upstream=self.name, status=status)
+            UPSTREAM_DURATION.observe(duration, upstream=self.name)
+
+            if self.limiter is not None:
+                self.limiter.release(duration, success)
+
+    def _fetch(self, url: str) -> requests.Response:
+        """Make the HTTP request, tracing it.
+
+        API keys and tokens in the query string aren't traced.
+
+        Args:
+            url: The URL to request.
+
+        Returns:
+            The `requests` response.
+        """
+        with tracing.span(
+            "GET",
+            kind="client",
+            upstream=self.name,
+            **{"http.method": "GET", "http.url": _redact(url)},
+        ) as current:
+            response = _http_get(url, self.timeout)
+            current.set_attribute("http.status_code", response.status_code)
+
+        return response
+
+    def get_stale(self, url: str) -> UpstreamResponse | None:
+        """Get a stale response for a URL from the cache.
+
+        Marks the current request as served with stale data if found.
+
+        Args:
+            url: The URL of the request.
+
+        Returns:
+            An `UpstreamResponse` with `stale` set if a response is cached,
+            else `None`.
+        """
+        if self.stale_timeout is None:
+            return None
+
+        if (stale := lookup(_stale_cache_key_for_url(self.name, url))) is None:
+            return None
+
+        content, content_type = stale
+
+        STALE_RESPONSES.inc(upstream=self.name)
+        _stale.set(True)
+
+        return UpstreamResponse(
+            status_code=200, content=content, content_type=content_type, stale=True
+        )
+
+
+def _redact(url: str) -> str:
+    """Redact the API keys and tokens in the query string of a URL."""
+    return _SECRET_PARAMETERS.sub(r"\1REDACTED", url)
+
+
+def _stale_cache_key_for_url(name: str, url: str) -> str:
+    """Generate a cache key for the stale response of a URL.
+
+    The URL is hashed, so API keys in the query string don't end up in the
+    cache.
+
+    Args:
+        name: The name of the upstream, so its responses can be given a cache
+            quota, e.g. `stale:places`.
+        url: The URL.
+    """
+    return f"stale:{name}:{hashlib.sha256(url.encode()).hexdigest()}"
+
+
+_upstreams: dict[str, Upstream] = {}
+_upstreams_lock = threading.Lock()
+
+
+def upstream(name: str) -> Upstream:
+    """Get the upstream with a given name.
+
+    Upstreams are configured by the `UPSTREAMS` setting and created on first
+    use.
+
+    Args:
+        name: The name of the upstream.
+
+    Returns:
+        The `Upstream` object.
+    """
+    if (instance := _upstreams.get(name)) is not None:
+        return instance
+
+    with _upstreams_lock:
+        if name not in _upstreams:
+            _upstreams[name] = Upstream(name, **settings.UPSTREAMS.get(name, {}))
+
+        return _upstreams[name]
+
+
+def get(
+    name: str,
+    url: str,
+    cacheable: typing.Callable[[UpstreamResponse], bool] | None = None,
+) -> UpstreamResponse:
+    """Make a GET request to an upstream.
+
+    See `Upstream.get`.
+
+    Args:
+        name: The name of the upstream.
+        url: The URL to request.
+        cacheable: See `Upstream.get`.
+
+    Returns:
+        The response.
+    """
+    return upstream(name).get(url, cacheable=cacheable)
+
+
+def reset_stale() -> contextvars.Token:
+    """Reset the stale marker for the current request.
+
+    Returns:
+        A token that can be passed to `restore_stale`.
+    """
+    return _stale.set(False)
+
+
+def restore_stale(token: contextvars.Token) -> None:
+    """Restore the stale marker to the state before `reset_stale`.
+
+    Args:
+        token: The token returned by `reset_stale`.
+    """
+    _stale.reset(token)
+
+
+def is_stale() -> bool:
+    """Check whether the current request was served with stale upstream data.
+
+    Returns:
+        `True` if any upstream call of the request was served from the stale
+        cache, else `False`.
+    """
+    return _stale.get()
@@ -0,0 +1,37 @@
+import hmac
+
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from drf_spectacular.utils import extend_schema
+from rest_framework import status, views
+
+from .metrics import registry
+from .responses import APIErrorResponse
+
+
+class MetricsView(views.APIView):
+    """GET metrics in the Prometheus text format.
+
+    The endpoint is only served with the `METRICS["endpoint"]` setting, and
+    with a `METRICS["token"]`, only to requests with the token as a bearer
+    token in their `Authorization` header.
+    """
+
+    @extend_schema(exclude=True)
+    def get(self, request: HttpRequest) -> HttpResponse:
+        if not settings.METRICS["endpoint"]:
+            return APIErrorResponse(
+                message="Not found", status=status.HTTP_404_NOT_FOUND
+            )
+
+        if (token := settings.METRICS["token"]) and not hmac.compare_digest(
+            request.headers.get("Authorization", "").encode(),
+            f"Bearer {token}".encode(),
+        ):
+            return APIErrorResponse(
+                message="Invalid metrics token", status=status.HTTP_401_UNAUTHORIZED
+            )
+
+        return HttpResponse(
+            registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+        )
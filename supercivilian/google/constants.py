@@ -1,2 +1,11 @@
 BASE_PLACES_API_URL = "https://maps.googleapis.com/maps/api/place"
 BASE_GEOCODING_API_URL = "https://maps.googleapis.com/maps/api/geocode"
+
+# The upstream (see `UPSTREAMS` setting) each Google Maps Platform endpoint is
+# called through.
+MAPS_PLATFORM_UPSTREAMS = {
+    "autocomplete": "places",
+    "details": "places",
+    "photos": "photos",
+    "geocode": "geocoding",
+}
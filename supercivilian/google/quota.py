@@ -0,0 +1,368 @@
+from __future__ import annotations
+
+import datetime
+import logging
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+from supercivilian.core.metrics import Counter, Gauge
+
+logger = logging.getLogger(__name__)
+
+QUOTA_REQUESTS = Counter(
+    "supercivilian_google_quota_requests_total",
+    "Number of Google Maps Platform requests paid for from the quota budget",
+)
+QUOTA_REJECTIONS = Counter(
+    "supercivilian_google_quota_rejections_total",
+    "Number of Google Maps Platform requests rejected by the quota budget",
+)
+QUOTA_BACKOFFS = Counter(
+    "supercivilian_google_quota_backoffs_total",
+    "Number of OVER_QUERY_LIMIT responses from the Google Maps Platform",
+)
+DAILY_SPEND = Gauge(
+    "supercivilian_google_quota_daily_spend",
+    "Number of Google Maps Platform requests made today (UTC)",
+)
+
+
+class TokenBucket:
+    """An in-process token bucket.
+
+    Holds up to `burst` tokens and refills at `rate` tokens per second.
+    """
+
+    def __init__(self, name: str, rate: float, burst: int) -> None:
+        """Initialize the bucket.
+
+        Args:
+            name: The name of the bucket.
+            rate: The refill rate in tokens per second.
+            burst: The capacity of the bucket.
+        """
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def level(self) -> float:
+        """Get the fill level of the bucket.
+
+        Returns:
+            The fraction of the capacity that is available, between 0 and 1.
+        """
+        with self._lock:
+            self._refill()
+
+            return max(0.0, self._tokens / self.burst)
+
+    def take(self, max_wait: float) -> float | None:
+        """Reserve a token.
+
+        Args:
+            max_wait: The maximum time in seconds the caller is willing to wait
+                for the token.
+
+        Returns:
+            The time in seconds the caller must wait before using the token,
+            or `None` if no token is available within `max_wait`.
+        """
+        with self._lock:
+            self._refill()
+
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+
+            if wait > max_wait:
+                return None
+
+            self._tokens -= 1
+
+            return wait
+
+    def _refill(self) -> None:
+        """Add the tokens earned since the last refill. Must be called with
+        the lock held.
+        """
+        now = time.monotonic()
+
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+class SharedTokenBucket:
+    """A token bucket shared by all workers through the cache.
+
+    Approximates a token bucket with one counter per second, so it allows at
+    most `rate` requests in every second across all processes using the same
+    cache.
+    """
+
+    def __init__(self, name: str, rate: float, burst: int) -> None:
+        """Initialize the bucket.
+
+        Args:
+            name: The name of the bucket.
+            rate: The allowed number of requests per second.
+            burst: Unused, accepted for compatibility with `TokenBucket`.
+        """
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+
+    def level(self) -> float:
+        """Get the fill level of the bucket.
+
+        Returns:
+            The fraction of the current second's requests that is available,
+            between 0 and 1.
+        """
+        used = cache.get(self._key(int(time.time())), 0)
+
+        return max(0.0, 1 - used / self.rate)
+
+    def take(self, max_wait: float) -> float | None:
+        """Reserve a token.
+
+        Args:
+            max_wait: The maximum time in seconds the caller is willing to wait
+                for the token.
+
+        Returns:
+            The time in seconds the caller must wait before using the token,
+            or `None` if no token is available within `max_wait`.
+        """
+        now = time.time()
+
+        for offset in range(math.ceil(max_wait) + 1):
+            second = int(now) + offset
+
+            if second - now > max_wait:
+                break
+
+            key = self._key(second)
+            cache.add(key, 0, timeout=offset + 2)
+
+            try:
+                used = cache.incr(key)
+            except ValueError:
+                return 0.0
+
+            if used <= self.rate:
+                return max(0.0, second - now)
+
+            # The second is full, so give back the token taken from it. Tokens
+            # of rejected requests must not use up the budget of others.
+            try:
+                cache.decr(key)
+            except ValueError:
+                pass
+
+        return None
+
+    def _key(self, second: int) -> str:
+        """Generate the cache key of the counter for a second."""
+        return f"quota:{self.name}:{second}"
+
+
+class QuotaBudget:
+    """The request budget of a Google Maps Platform endpoint.
+
+    Paces requests with a token bucket, counts the requests made per day and
+    backs off exponentially after `OVER_QUERY_LIMIT` responses.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: float = 10,
+        burst: int = 20,
+        max_wait: float = 0.25,
+        low_watermark: float = 0.25,
+        daily_limit: int | None = None,
+        shared: bool = False,
+    ) -> None:
+        """Initialize the budget.
+
+        Args:
+            name: The name of the endpoint.
+            rate: The allowed number of requests per second. Defaults to 10.
+            burst: The number of requests that may be made at once.
+                Defaults to 20.
+            max_wait: How long a request may wait for a token in seconds.
+                Defaults to 0.25.
+            low_watermark: The fill level of the bucket below which the budget
+                is considered low. Defaults to 0.25.
+            daily_limit: The maximum number of requests per day (UTC).
+                Defaults to `None`, which means no limit.
+            shared: Whether the bucket is shared by all workers through the
+                cache. Defaults to `False`.
+        """
+        self.name = name
+        self.max_wait = max_wait
+        self.low_watermark = low_watermark
+        self.daily_limit = daily_limit
+        self.bucket = (SharedTokenBucket if shared else TokenBucket)(name, rate, burst)
+
+        self._backoff = 0.0
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def is_low(self) -> bool:
+        """Check whether the budget is low.
+
+        Returns:
+            `True` if the endpoint is backing off, the daily limit is reached
+            or the bucket is below the low watermark, else `False`.
+        """
+        return (
+            self.retry_after() is not None
+            or self._daily_limit_reached()
+            or self.bucket.level() < self.low_watermark
+        )
+
+    def retry_after(self) -> int | None:
+        """Get the number of seconds until the endpoint stops backing off.
+
+        Returns:
+            The number of seconds, or `None` if it isn't backing off.
+        """
+        blocked_until = max(self._blocked_until, cache.get(self._backoff_key(), 0))
+
+        if (remaining := blocked_until - time.time()) <= 0:
+            return None
+
+        return max(1, math.ceil(remaining))
+
+    def acquire(self) -> int | None:
+        """Pay for a request, waiting for a token if needed.
+
+        Returns:
+            `None` if the request may be made, else the number of seconds
+            after which it should be retried.
+        """
+        if (retry_after := self.retry_after()) is not None:
+            QUOTA_REJECTIONS.inc(endpoint=self.name, reason="backoff")
+            return retry_after
+
+        if self._daily_limit_reached():
+            QUOTA_REJECTIONS.inc(endpoint=self.name, reason="daily_limit")
+            return _seconds_until_midnight()
+
+        if (wait := self.bucket.take(self.max_wait)) is None:
+            QUOTA_REJECTIONS.inc(endpoint=self.name, reason="rate")
+            return 1
+
+        if wait > 0:
+            time.sleep(wait)
+
+        QUOTA_REQUESTS.inc(endpoint=self.name)
+        self._spend()
+
+        return None
+
+    def succeeded(self) -> None:
+        """Report that a request was within the quota."""
+        with self._lock:
+            self._backoff = 0.0
+
+    def over_query_limit(self) -> int:
+        """Report an `OVER_QUERY_LIMIT` response and back off.
+
+        The backoff starts at 1 second and doubles with every consecutive
+        report, up to 60 seconds.
+
+        Returns:
+            The number of seconds to back off.
+        """
+        with self._lock:
+            self._backoff = min(60.0, max(1.0, self._backoff * 2))
+            self._blocked_until = time.time() + self._backoff
+            backoff = self._backoff
+
+        cache.set(self._backoff_key(), self._blocked_until, timeout=math.ceil(backoff))
+
+        QUOTA_BACKOFFS.inc(endpoint=self.name)
+        logger.warning(
+            "Google Maps Platform quota exceeded for %s, backing off for %ss",
+            self.name,
+            backoff,
+        )
+
+        return math.ceil(backoff)
+
+    def _spend(self) -> None:
+        """Count a request in today's spend."""
+        key = self._daily_spend_key()
+        cache.add(key, 0, timeout=2 * 24 * 60 * 60)
+
+        try:
+            spend = cache.incr(key)
+        except ValueError:
+            return
+
+        DAILY_SPEND.set(spend, endpoint=self.name)
+
+    def _daily_limit_reached(self) -> bool:
+        """Check whether today's spend reached the daily limit."""
+        if self.daily_limit is None:
+            return False
+
+        return cache.get(self._daily_spend_key(), 0) >= self.daily_limit
+
+    def _daily_spend_key(self) -> str:
+        """Generate the cache key of today's spend counter."""
+        today = datetime.datetime.now(datetime.timezone.utc).date()
+
+        return f"quota:spend:{self.name}:{today.isoformat()}"
+
+    def _backoff_key(self) -> str:
+        """Generate the cache key of the backoff deadline."""
+        return f"quota:backoff:{self.name}"
+
+
+def _seconds_until_midnight() -> int:
+    """Get the number of seconds until the next UTC midnight."""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    midnight = (now + datetime.timedelta(days=1)).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+
+    return math.ceil((midnight - now).total_seconds())
+
+
+_budgets: dict[str, QuotaBudget] = {}
+_budgets_lock = threading.Lock()
+
+
+def budget(endpoint: str) -> QuotaBudget:
+    """Get the quota budget of a Google Maps Platform endpoint.
+
+    Budgets are configured by the `GOOGLE_QUOTA` setting and created on first
+    use.
+
+    Args:
+        endpoint: The name of the endpoint.
+
+    Returns:
+        The `QuotaBudget` object.
+    """
+    if (instance := _budgets.get(endpoint)) is not None:
+        return instance
+
+    with _budgets_lock:
+        if endpoint not in _budgets:
+            _budgets[endpoint] = QuotaBudget(
+                endpoint,
+                shared=settings.GOOGLE_QUOTA.get("shared", False),
+                **settings.GOOGLE_QUOTA.get("endpoints", {}).get(endpoint, {}),
+            )
+
+        return _budgets[endpoint]
@@ -3,7 +3,15 @@ import urllib.parse
 
 from django.conf import settings
 
-from .constants import BASE_GEOCODING_API_URL, BASE_PLACES_API_URL
+from supercivilian.core import upstream
+from supercivilian.core.upstream import UpstreamResponse, UpstreamUnavailableError
+
+from . import quota
+from .constants import (
+    BASE_GEOCODING_API_URL,
+    BASE_PLACES_API_URL,
+    MAPS_PLATFORM_UPSTREAMS,
+)
 
 
 def generate_places_api_url(url: str, **params: dict[str, typing.Any]) -> str:
@@ -18,7 +26,13 @@ def generate_places_api_url(url: str, **params: dict[str, typing.Any]) -> str:
     Returns:
         The generated URL.
     """
-    return f"{BASE_PLACES_API_URL}{url}?{
+    base_url = (
+        f"{settings.MAPS_PLATFORM_API_URL}/place"
+        if settings.MAPS_PLATFORM_API_URL
+        else BASE_PLACES_API_URL
+    )
+
+    return f"{base_url}{url}?{
         urllib.parse.urlencode(
             {
                 **params,
@@ -40,7 +54,13 @@ def generate_geocoding_api_url(url: str, **params: dict[str, typing.Any]) -> str
     Returns:
         The generated URL.
     """
-    return f"{BASE_GEOCODING_API_URL}{url}?{
+    base_url = (
+        f"{settings.MAPS_PLATFORM_API_URL}/geocode"
+        if settings.MAPS_PLATFORM_API_URL
+        else BASE_GEOCODING_API_URL
+    )
+
+    return f"{base_url}{url}?{
         urllib.parse.urlencode(
             {
                 **params,
@@ -48,3 +68,93 @@ def generate_geocoding_api_url(url: str, **params: dict[str, typing.Any]) -> str
             }
         )
     }"
+
+
+def _is_ok(response: UpstreamResponse) -> bool:
+    """Check whether a 200 response of the Google Maps Platform is a result.
+
+    JSON responses report errors with their `status` field, so only those with
+    the `OK` status are results.
+
+    Args:
+        response: The response.
+    """
+    if not (response.content_type or "").startswith("application/json"):
+        return True
+
+    try:
+        return response.json().get("status") == "OK"
+    except ValueError:
+        return False
+
+
+def _is_over_query_limit(response: UpstreamResponse) -> bool:
+    """Check whether a response of the Google Maps Platform reports that the
+    quota is exceeded.
+
+    Args:
+        response: The response.
+    """
+    if response.status_code == 429:
+        return True
+
+    if not (response.content_type or "").startswith("application/json"):
+        return False
+
+    try:
+        return response.json().get("status") == "OVER_QUERY_LIMIT"
+    except ValueError:
+        return False
+
+
+def get_from_maps_platform(endpoint: str, url: str) -> UpstreamResponse:
+    """Make a GET request to a Google Maps Platform endpoint within its quota
+    budget.
+
+    When the budget is low, a stale cached response is preferred over spending
+    the budget. `OVER_QUERY_LIMIT` responses make the endpoint back off rather
+    than being returned.
+
+    Args:
+        endpoint: The name of the endpoint, see `MAPS_PLATFORM_UPSTREAMS`.
+        url: The URL to request.
+
+    Returns:
+        The response.
+
+    Raises:
+        UpstreamUnavailableError: If the budget is exhausted or the endpoint is
+            backing off and there is no stale response.
+    """
+    name = MAPS_PLATFORM_UPSTREAMS[endpoint]
+    maps_platform = upstream.upstream(name)
+    budget = quota.budget(endpoint)
+
+    if budget.is_low() and (stale := maps_platform.get_stale(url)) is not None:
+        return stale
+
+    if (retry_after := budget.acquire()) is not None:
+        raise UpstreamUnavailableError(
+            name,
+            message="Google Maps Platform quota exceeded",
+            retry_after=retry_after,
+        )
+
+    response = maps_platform.get(url, cacheable=_is_ok)
+
+    if _is_over_query_limit(response):
+        retry_after = budget.over_query_limit()
+
+        if (stale := maps_platform.get_stale(url)) is not None:
+            return stale
+
+        raise UpstreamUnavailableError(
+            name,
+            message="Google Maps Platform quota exceeded",
+            retry_after=retry_after,
+        )
+
+    if not response.stale:
+        budget.succeeded()
+
+    return response
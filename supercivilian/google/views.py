@@ -1,6 +1,5 @@
 import dataclasses
 
-import requests
 from django.http import HttpResponse
 from drf_spectacular.utils import (
     OpenApiParameter,
@@ -11,6 +10,7 @@ from drf_spectacular.utils import (
 from rest_framework import status, views
 from rest_framework.request import Request
 
+from supercivilian.core.compression import cache_compressed, response_cache_key
 from supercivilian.core.params import ParameterError, SearchParameters
 from supercivilian.core.responses import (
     APIErrorResponse,
@@ -26,7 +26,14 @@ from .serializers import (
     GeocodePlaceSerializer,
     PlaceDetailsSerializer,
 )
-from .utilities import generate_geocoding_api_url, generate_places_api_url
+from .utilities import (
+    generate_geocoding_api_url,
+    generate_places_api_url,
+    get_from_maps_platform,
+)
+
+# How long place details responses are cached for (in seconds).
+_PLACE_DETAILS_RESPONSE_TIMEOUT = 60 * 60
 
 
 class SearchAutoCompleteView(views.APIView):
@@ -68,6 +75,10 @@ class SearchAutoCompleteView(views.APIView):
                 response=ErrorWithMessageSerializer,
                 description="Internal server error",
             ),
+            status.HTTP_503_SERVICE_UNAVAILABLE: OpenApiResponse(
+                response=ErrorWithMessageSerializer,
+                description="Upstream service temporarily unavailable",
+            ),
         },
         auth=[],
     )
@@ -86,7 +97,7 @@ class SearchAutoCompleteView(views.APIView):
             components="country:pl",
         )
 
-        response = requests.get(url)
+        response = get_from_maps_platform("autocomplete", url)
         payload = response.json()
         status = payload.get("status")
 
@@ -136,9 +147,17 @@ class PlaceDetailsView(views.APIView):
                 response=ErrorWithMessageSerializer,
                 description="Internal server error",
             ),
+            status.HTTP_503_SERVICE_UNAVAILABLE: OpenApiResponse(
+                response=ErrorWithMessageSerializer,
+                description="Upstream service temporarily unavailable",
+            ),
         },
         auth=[],
     )
+    @cache_compressed(
+        lambda request, id: response_cache_key(request, "places"),
+        _PLACE_DETAILS_RESPONSE_TIMEOUT,
+    )
     def get(self, request: Request, id: str) -> APIResponse:
         url = generate_places_api_url(
             "/details/json",
@@ -146,7 +165,7 @@ class PlaceDetailsView(views.APIView):
             language="pl",
         )
 
-        response = requests.get(url)
+        response = get_from_maps_platform("details", url)
         payload = response.json()
         status = payload.get("status")
 
@@ -210,6 +229,10 @@ class PlacePhotoView(views.APIView):
                 response=ErrorWithMessageSerializer,
                 description="Internal server error",
             ),
+            status.HTTP_503_SERVICE_UNAVAILABLE: OpenApiResponse(
+                response=ErrorWithMessageSerializer,
+                description="Upstream service temporarily unavailable",
+            ),
         },
         auth=[],
     )
@@ -218,7 +241,7 @@ class PlacePhotoView(views.APIView):
             "/photo", photo_reference=reference, maxheight=1000
         )
 
-        response = requests.get(url)
+        response = get_from_maps_platform("photos", url)
 
         if response.status_code == 200:
             return HttpResponse(response.content, content_type="image/*")
@@ -256,6 +279,10 @@ class ReverseGeocodeView(views.APIView):
                 response=ErrorWithMessageSerializer,
                 description="Internal server error",
             ),
+            status.HTTP_503_SERVICE_UNAVAILABLE: OpenApiResponse(
+                response=ErrorWithMessageSerializer,
+                description="Upstream service temporarily unavailable",
+            ),
         },
         auth=[],
     )
@@ -274,7 +301,7 @@ class ReverseGeocodeView(views.APIView):
             language="pl",
         )
 
-        response = requests.get(url)
+        response = get_from_maps_platform("geocode", url)
         payload = response.json()
         status = payload.get("status")
 